@@ -1,2 +1,10 @@
-from .autoImageRenamer import AutoImageRenamer
-__all__ = ['autoImageRenamer']
\ No newline at end of file
+__all__ = ['autoImageRenamer']
+
+
+def __getattr__(name):
+    # AutoImageRenamer is imported on first use, so "python -m autoImageRenamer --help" does not load it
+    if name == "AutoImageRenamer":
+        from .autoImageRenamer import AutoImageRenamer
+
+        return AutoImageRenamer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
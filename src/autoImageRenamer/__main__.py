@@ -2,43 +2,116 @@
 Automatic image and video renaming targeting a filename with the date and time of the image taken.
 The strategy is first to figure out the date and time from filename, exif data and file creation date and 
 subsequently selecting the oldest of these datetimes. The file mode is then either to rename or copy the file
-from A to B.
+from A to B, or to link the file from A to B sharing its data.
 
 Usage:
-    autoImageRenamer.py rename [<source>] [<target>] [-i] [-a] [-l [<logfile>]]
-    autoImageRenamer.py copy [<source>] [<target>] [-i] [-a] [-l [<logfile>]]
-    autoImageRenamer.py dryrun [<source>] [<target>] [-i] [-a] [-l [<logfile>]]
+    autoImageRenamer.py rename [<source>] [<target>] [-i] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py copy [<source>] [<target>] [-i] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py dryrun [<source>] [<target>] [-i] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py link [<source>] [<target>] [-i] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py reflink [<source>] [<target>] [-i] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py merge (rename | copy | dryrun | link | reflink) <target> <sourcespec>... [-i] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py watch (rename | copy | dryrun | link | reflink) [<source>] [<target>] [-a] [-l [<logfile>]] [options]
+    autoImageRenamer.py apply (rename | copy | link | reflink) <planfile> [-l [<logfile>]] [options]
+    autoImageRenamer.py reindex [<target>] [-l [<logfile>]] [options]
+    autoImageRenamer.py resume <journal> [-l [<logfile>]] [options]
+    autoImageRenamer.py rollback <journal> [-l [<logfile>]] [options]
+    autoImageRenamer.py query <catalog> [--taken=<date>] [--imported=<date>] [--only=<method>] [--time=<date>] [--content=<hash>]
 
 Options:
     <source>            Source directory [default: .]
     <target>            Target directory [default: <source>]
+    <sourcespec>        merge: source directory with optional settings DIR[,offset=<offset>][,priority=<n>].
+                        offset (e.g. +1h, -1h30m, 2d) is added to the times of its files, files of a source
+                        with higher priority win name collisions and content duplicates [default priority: 0]
     -i --interactive    Ask for confirmation before action
     -a --append         Append current filename to date
     -l --logfile        Target logfile [default: ./autoImageRenamer.log]
+    --log-format=<fmt>  Logfile format, text or json with one structured event per line [default: text]
+    -j --jobs=<n>       Number of parallel metadata extraction workers [default: 1]
+    --executor=<kind>   Worker pool for --jobs, either thread or process [default: thread]
+    --cache=<file>      Metadata cache file, defaults to the per-user cache directory
+    --no-cache          Do not use the metadata cache
+    --rebuild-cache     Drop all cached metadata before running
+    -r --recursive      Also rename files in subdirectories, keeping the directory structure
+    --max-depth=<n>     Maximum subdirectory depth, implies --recursive
+    --include=<globs>   Comma separated glob patterns of files to process, e.g. "*.jpg,2021/*"
+    --exclude=<globs>   Comma separated glob patterns of files and directories to skip
+    --patterns=<file>   JSON file with additional named filename patterns {"name": "regex"}
+    --copy-jobs=<n>     Number of concurrent copies [default: 1]
+    --fsync=<policy>    Flush copied files to disk: none, file (each file) or end (all at the end) [default: none]
+    --settle=<seconds>  watch: time a new file must stay unchanged before it is processed [default: 2]
+    --poll=<seconds>    watch: polling interval if inotify is not available [default: 1]
+    --polling           watch: always poll instead of using inotify
+    --plan=<file>       Write the planned renames to a JSON lines file (or CSV for *.csv) for apply
+    --hash=<algorithm>  Content hash for duplicate detection, e.g. md5, blake2b or xxhash [default: md5]
+    --stats             Log time, calls, bytes read and failures per processing stage at the end
+    --metrics=<file>    Write the stage metrics as Prometheus textfile (*.prom) or JSON, implies --stats
+    --resolve=<policy>  Time selection: oldest (run all extractors), trusted (stop at a trusted method),
+                        first[:N] (stop after N full datetimes) or priority (first full datetime wins) [default: trusted]
+    --layout=<template> Target path below <target>, e.g. "{year}/{year}-{month}/{name}" to partition the library by
+                        month. Fields: year, month, day, hour, minute, second, date, datetime, stem, ext,
+                        folder (relative source folder) and name (default file name) [default: {folder}/{name}]
+    --journal=<file>    Write-ahead journal of all renames/copies, see resume and rollback
+    --catalog=<file>    Record every renamed/copied file with all its times, size and hash in a SQLite catalog for query
+    --taken=<date>      query: files whose selected time starts with date, e.g. 2024, 2024-07 or 2024-07-13
+    --imported=<date>   query: files processed by a run started on date
+    --only=<method>     query: files with times from this method only, e.g. filename
+    --time=<date>       query: files with any candidate time on date
+    --content=<hash>    query: files with this content hash (only known for files hashed due to a collision)
+    --dedup=<mode>      Check files against the content index of the target and skip, link or mark those already there
 """
 
 import os
 import sys
 from docopt import docopt
-from loguru import logger
-
-from . import AutoImageRenamer
 
 def main():
     arguments = docopt(__doc__, version='1.0.0')
 
+    if arguments['query']:
+        query(arguments)
+        return
+
+    # imported after parsing, --help and --version do not need them (see tests/test_startup.py)
+    from loguru import logger
+
+    from .autoImageRenamer import AutoImageRenamer, getHasher, setDebugLogging
+    from .filenameParser import FilenameParser
+    from .fileOps import FsyncPolicy
+    from .extractors import ResolutionPolicy
+    from .layout import OutputLayout
+    from .metrics import metrics
+
     if arguments['<source>'] is None:
         arguments['<source>'] = os.getcwd()
 
     if arguments['<target>'] is None:
         arguments['<target>'] = arguments['<source>']
 
+    sources = None
+    if arguments['merge']:
+        from .sources import parseSource
+
+        try:
+            sources = [parseSource(spec) for spec in arguments['<sourcespec>']]
+        except ValueError as e:
+            sys.exit(f"Invalid source: {e}")
+
     if arguments['copy']:
         action = AutoImageRenamer.Action.copy
     elif arguments['rename']:
         action = AutoImageRenamer.Action.rename
     elif arguments['dryrun']:
         action = AutoImageRenamer.Action.dryrun
+    elif arguments['link']:
+        # hard link, copy if source and target are on different devices
+        action = AutoImageRenamer.Action.link
+    elif arguments['reflink']:
+        # copy-on-write clone (btrfs, XFS), copy if not supported
+        action = AutoImageRenamer.Action.reflink
+    else:
+        action = None
 
     logger.remove(None)
     logger.add(sys.stdout, level="INFO")
@@ -47,10 +120,162 @@ def main():
             logfile = "autoImageRenamer.log"
         else:
             logfile = arguments['<logfile>']
-        logger.add(logfile, level="DEBUG")
+        if arguments['--log-format'] not in ["text", "json"]:
+            sys.exit("--log-format must be one of text or json")
+        # json: per-file messages carry event, file, target, methods and times as extra fields
+        logger.add(logfile, level="DEBUG", serialize=arguments['--log-format'] == "json")
+    else:
+        # nobody reads the per-file debug messages
+        setDebugLogging(False)
+
+    try:
+        jobs = int(arguments['--jobs'])
+        executor = AutoImageRenamer.Executor[arguments['--executor']]
+    except (ValueError, KeyError):
+        sys.exit("--jobs must be an integer and --executor one of thread or process")
+
+    try:
+        copyJobs = int(arguments['--copy-jobs'])
+        fsyncPolicy = FsyncPolicy[arguments['--fsync']]
+    except (ValueError, KeyError):
+        sys.exit("--copy-jobs must be an integer and --fsync one of none, file or end")
+
+    maxDepth = 0
+    try:
+        if arguments['--max-depth'] is not None:
+            maxDepth = int(arguments['--max-depth'])
+        elif arguments['--recursive']:
+            maxDepth = None
+    except ValueError:
+        sys.exit("--max-depth must be an integer")
+    include = arguments['--include'].split(",") if arguments['--include'] else None
+    exclude = arguments['--exclude'].split(",") if arguments['--exclude'] else None
+
+    try:
+        policy = ResolutionPolicy.parse(arguments['--resolve'])
+    except (ValueError, KeyError):
+        sys.exit("--resolve must be one of oldest, trusted, first[:N] or priority")
+
+    try:
+        layout = OutputLayout(arguments['--layout'])
+    except ValueError as e:
+        sys.exit(str(e))
+
+    filenameParser = None
+    if arguments['--patterns']:
+        filenameParser = FilenameParser()
+        filenameParser.loadConfig(arguments['--patterns'])
+
+    try:
+        getHasher(arguments['--hash'])
+    except (ValueError, ImportError):
+        sys.exit(f"Hash algorithm {arguments['--hash']} is not available")
+
+    if arguments['--stats'] or arguments['--metrics']:
+        metrics.enable()
+
+    if arguments['reindex']:
+        from .contentIndex import ContentIndex
+
+        ContentIndex(arguments['<target>'], hashAlgorithm=arguments['--hash'], rebuild=True).close()
+        return
+
+    if arguments['resume'] or arguments['rollback']:
+        from .journal import resumeJournal, rollbackJournal
+
+        if arguments['resume']:
+            n_files = resumeJournal(arguments['<journal>'], copyJobs, fsyncPolicy)
+            logger.info(f"All done! {n_files} files renamed/copied. Byebye!")
+        else:
+            rollbackJournal(arguments['<journal>'])
+        reportMetrics(arguments['--metrics'])
+        return
+
+    if arguments['apply']:
+        from .plan import applyPlan
+
+        n_files = applyPlan(arguments['<planfile>'], action, copyJobs, fsyncPolicy)
+        logger.info(f"All done! {n_files} files renamed/copied. Byebye!")
+        reportMetrics(arguments['--metrics'])
+        return
+
+    contentIndex = None
+    if arguments['--dedup']:
+        from .contentIndex import ContentIndex, DedupMode
+
+        try:
+            dedupMode = DedupMode[arguments['--dedup']]
+        except KeyError:
+            sys.exit("--dedup must be one of skip, link or mark")
+        contentIndex = ContentIndex(arguments['<target>'], dedupMode, arguments['--hash'])
+
+    catalog = None
+    if arguments['--catalog'] and action != AutoImageRenamer.Action.dryrun:
+        from .catalog import Catalog
+
+        catalog = Catalog(arguments['--catalog'])
+
+    journal = None
+    if arguments['--journal']:
+        from .journal import Journal
+
+        journal = Journal(arguments['--journal'])
+
+    cache = None
+    if not arguments['--no-cache']:
+        from .metadataCache import MetadataCache, getDefaultCacheFile
+
+        cacheFile = arguments['--cache']
+        if cacheFile is None:
+            cacheFile = getDefaultCacheFile()
+        cache = MetadataCache(cacheFile, rebuild=arguments['--rebuild-cache'])
+
+    try:
+        x = AutoImageRenamer( sources or arguments['<source>'], arguments['<target>'], action, arguments['--interactive'], arguments['--append'], jobs, executor, cache, arguments['--hash'], maxDepth, include, exclude, filenameParser, copyJobs, fsyncPolicy, arguments['--plan'], contentIndex=contentIndex, journal=journal, policy=policy, layout=layout, catalog=catalog)
+
+        if arguments['watch']:
+            from .watch import FolderWatcher
+
+            watcher = FolderWatcher(x, arguments['<source>'], arguments['<target>'], action,
+                                    float(arguments['--settle']), float(arguments['--poll']),
+                                    arguments['--polling'], arguments['--hash'])
+            watcher.run()
+    finally:
+        if cache is not None:
+            cache.close()
+        if contentIndex is not None:
+            contentIndex.close()
+        if journal is not None:
+            journal.close()
+        if catalog is not None:
+            catalog.close()
+        reportMetrics(arguments['--metrics'])
+
+def query(arguments):
+    ## Print the matching files of a catalog, one per line: selected time, source, target and the methods of the time
+    from .catalog import Catalog
+
+    if not os.path.exists(arguments['<catalog>']):
+        sys.exit(f"Catalog {arguments['<catalog>']} does not exist")
+    with Catalog(arguments['<catalog>']) as catalog:
+        rows = catalog.query(
+            taken=arguments['--taken'],
+            imported=arguments['--imported'],
+            only=arguments['--only'],
+            digest=arguments['--content'],
+            timeOf=arguments['--time'],
+        )
+        for row in rows:
+            print(f"{row['taken']}\t{row['source']}\t{row['target']}\t{row['methods']}")
 
+def reportMetrics(filename):
+    from .metrics import metrics
 
-    x = AutoImageRenamer( arguments['<source>'], arguments['<target>'], action, arguments['--interactive'], arguments['--append'])
+    if not metrics.enabled:
+        return
+    metrics.log()
+    if filename:
+        metrics.export(filename)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+from . import exifReader
+from .autoImageRenamer import AutoImageRenamer, performActions
+from .fileOps import FsyncPolicy, fsyncPath
+from .metrics import metrics
+from .plan import checkRecord, createPlanRecords
+
+# Progress callbacks are called as progress(stage, done, total) on the event loop thread.
+# Stages are "extract" (total is None, the folder is streamed), "collisions" and "apply".
+
+
+async def scan(inputFolder, outputFolder: str, append: bool = False, progress=None, **options):
+    ## Async counterpart of a dryrun: yields one plan record (see plan.createPlanRecords) per file with a suitable time.
+    # options are the keyword arguments of AutoImageRenamer, e.g. jobs, executor, cache or maxDepth. Metadata is
+    # extracted on the worker pool with at most jobs files in flight, the event loop only waits. Records are yielded
+    # once all files are known, since collisions can only be resolved then. Cancelling the consuming task stops
+    # the scan after the files in flight.
+    renamer = AutoImageRenamer(
+        inputFolder, outputFolder, AutoImageRenamer.Action.dryrun, False, append, run=False, **options
+    )
+    await scanRenamer(renamer, progress)
+    for record in createPlanRecords(renamer):
+        yield record
+
+
+async def scanRenamer(renamer: AutoImageRenamer, progress=None):
+    ## Fill the table of renamer like AutoImageRenamer.scan, without blocking the event loop
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(max(1, renamer.getJobs()))
+    candidates = renamer.listCandidates()
+    nDone = 0
+
+    exifReader.readStatistics.reset()
+    with renamer.createPool() as pool:
+        measured = isinstance(pool, ProcessPoolExecutor) and metrics.enabled
+
+        async def extract(filename: str, fileExt: str) -> dict:
+            async with slots:
+                if measured:
+                    # metrics recorded in the worker processes are returned along with the times
+                    (times, state) = await loop.run_in_executor(pool, renamer.getTimesMeasured, filename, fileExt)
+                    metrics.merge(state)
+                    return times
+                return await loop.run_in_executor(pool, renamer.getTimes, filename, fileExt)
+
+        while True:
+            item = await asyncio.to_thread(next, candidates, None)
+            if item is None:
+                break
+            (sourceId, batch) = item
+            # the metadata cache is bound to this thread, only extraction runs elsewhere
+            (allTimes, missing) = renamer.lookupCachedTimes([c.path for c in batch], [c.stat for c in batch])
+            extracted = await asyncio.gather(*[extract(batch[m[0]].path, batch[m[0]].ext) for m in missing])
+            renamer.storeCachedTimes(allTimes, missing, extracted)
+
+            for candidate, times in zip(batch, allTimes):
+                renamer.proposeRename(candidate.path, candidate.relDir, candidate.stem, candidate.ext, times, sourceId)
+            nDone += len(batch)
+            if progress is not None:
+                progress("extract", nDone, None)
+    exifReader.readStatistics.log()
+
+    # content hashing of colliding files
+    await asyncio.to_thread(renamer.fixTableCollisions)
+    if progress is not None:
+        progress("collisions", len(renamer.getTable()), len(renamer.getTable()))
+
+
+async def apply(plan, action, jobs: int = 1, fsyncPolicy=FsyncPolicy.none, progress=None) -> int:
+    ## Rename/copy/link the files of plan records, like plan.applyPlan, with at most jobs file operations in flight.
+    # plan is an iterable or async iterable of plan records, e.g. from scan or plan.readPlan. Records whose
+    # source changed since planning or whose target exists are skipped. Returns the number of files acted on.
+    # Cancelling stops starting new operations, the ones in flight are completed.
+    if hasattr(plan, "__aiter__"):
+        records = [record async for record in plan]
+    else:
+        records = list(plan)
+
+    # the end policy syncs all targets at once after the last operation
+    perFilePolicy = FsyncPolicy.none if fsyncPolicy == FsyncPolicy.end else fsyncPolicy
+    nDone = 0
+    acted = list()
+
+    def act(record: dict) -> int:
+        if not checkRecord(record):
+            return 0
+        item = (record["source"], record["target"], record["methods"])
+        return performActions([item], action, 1, perFilePolicy, report=False)
+
+    # jobs workers share one iterator, so at most jobs operations are in flight
+    pending = iter(records)
+
+    async def worker():
+        nonlocal nDone
+        for record in pending:
+            if await asyncio.to_thread(act, record):
+                acted.append(record["target"])
+            nDone += 1
+            if progress is not None:
+                progress("apply", nDone, len(records))
+
+    logger.info(f"Applying {len(records)} planned files with {action.name}")
+    await asyncio.gather(*[worker() for _ in range(max(1, jobs))])
+
+    if fsyncPolicy == FsyncPolicy.end and action != AutoImageRenamer.Action.dryrun:
+
+        def syncAll():
+            for target in acted:
+                fsyncPath(target)
+            for folder in {os.path.dirname(target) for target in acted}:
+                fsyncPath(folder)
+
+        await asyncio.to_thread(syncAll)
+    return len(acted)
@@ -1,129 +1,247 @@
 import os
-import shutil
+import queue
+import itertools
+import threading
+from contextlib import contextmanager
 from enum import Enum
 from datetime import datetime
 from loguru import logger
-import exifread
-import hachoir.parser
-import hachoir.metadata
-import re
-import hashlib
 import traceback as tb
+from . import exifReader
+from .fileWalker import walkFiles
+from .filenameParser import defaultParser
+from .extractors import dateOnly, defaultPolicy, defaultRegistry
+from .fileTable import FileTable
+from .sources import groupByDevice, shiftTimes, toSources
+from .layout import OutputLayout
+from .collisions import CollisionResolver
+from .hashing import PARTIAL_HASH_BYTES, getHasher, getFileHash, groupBy, findContentDuplicates
+from .fileOps import FolderCache, FsyncPolicy, TransferStatistics, copyFile, fsyncPath, linkFile, reflinkFile, runBounded
+from .metrics import metrics
+from concurrent.futures import ThreadPoolExecutor
 
 
 
-def getFileHash(filename: str):
-    BLOCKSIZE = 65536
-    hasher = hashlib.md5()
-    with open(filename, "rb") as afile:
-        buf = afile.read(BLOCKSIZE)
-        while len(buf) > 0:
-            hasher.update(buf)
-            buf = afile.read(BLOCKSIZE)
-    return hasher.hexdigest()
+def discardLog(*args, **kwargs):
+    pass
+
+
+# Per-file debug messages go through logDebug. Without a DEBUG sink, loguru still inspects the
+# call frame of every message before dropping it, which adds up on large folders
+logDebug = logger.debug
+
+
+def setDebugLogging(enabled: bool):
+    ## Send the per-file debug messages to loguru or discard them right away
+    global logDebug
+    logDebug = logger.debug if enabled else discardLog
 
 
 def findDuplicates(inputs: dict) -> dict:
     ## General duplicate finder. Input is a dictionary with keys and values.
     # Returns a dictionary having:
     # 1. keys that correspond to the duplicate values
-    # 2. set of values that contain the keys of the input dict
-
-    # find duplicate target names
-    seen = set()
-    duplicates = dict()
-    for value in inputs.values():
-        if value not in seen:
-            seen.add(value)
+    # 2. list of the keys of the input dict having this value, in input order
+    groups = dict()
+    for key, value in inputs.items():
+        groups.setdefault(value, list()).append(key)
+    return {value: keys for value, keys in groups.items() if len(keys) > 1}
+
+
+def performActions(items, action, copyJobs: int = 1, fsyncPolicy=FsyncPolicy.none, report: bool = True, contentIndex=None, onDone=None, folders=None, journal=None):
+    ## Rename, copy or propose (dryrun) all (old, new, methods) items.
+    # With a contentIndex, files already in the library are skipped, linked or marked and new targets are indexed.
+    # With a journal, the intents of the remaining items, with their final targets, are written before the first is acted on.
+    # onDone(old, new) is called after each completed rename/copy, possibly from several threads.
+    # Target folders are created through folders (a FolderCache), so each one only once.
+    # Returns the number of files acted on, without the duplicates skipped or linked by contentIndex.
+    if onDone is None:
+        onDone = discardLog
+    if folders is None:
+        folders = FolderCache()
+    statistics = TransferStatistics()
+    fsyncFile = fsyncPolicy == FsyncPolicy.file
+    touchedFolders = set()
+    copied = list()
+
+    # Setup action
+    if action == AutoImageRenamer.Action.rename:
+
+        def act(old, new, methods):
+            logger.info("Renaming {file} to {target} (methods {methods})", event="rename", file=old, target=new, methods=methods)
+            try:
+                folders.make(os.path.dirname(new))
+                os.rename(old, new)
+                statistics.add(0)
+                onDone(old, new)
+                touchedFolders.add(os.path.dirname(new))
+                if fsyncFile:
+                    fsyncPath(os.path.dirname(new))
+            except Exception as e:
+                logger.error(f"Renaming excepted with {''.join(tb.format_exception(type(e), e, None))}")
+
+    elif action == AutoImageRenamer.Action.copy:
+
+        def act(old, new, methods):
+            logger.info("Copying {file} to {target} (methods {methods})", event="copy", file=old, target=new, methods=methods)
+            folders.make(os.path.dirname(new))
+            statistics.add(copyFile(old, new, fsync=fsyncFile))
+            touchedFolders.add(os.path.dirname(new))
+            copied.append(new)
+            onDone(old, new)
+
+    elif action in [AutoImageRenamer.Action.link, AutoImageRenamer.Action.reflink]:
+        share = linkFile if action == AutoImageRenamer.Action.link else reflinkFile
+
+        def act(old, new, methods):
+            logger.info(
+                "{} {file} to {target} (methods {methods})",
+                action.name.capitalize() + "ing",
+                event=action.name,
+                file=old,
+                target=new,
+                methods=methods,
+            )
+            try:
+                folders.make(os.path.dirname(new))
+                if share(old, new):
+                    statistics.add(0)
+                    if action == AutoImageRenamer.Action.reflink:
+                        # a clone is a file of its own, its metadata has to be synced like a copy
+                        copied.append(new)
+                        if fsyncFile:
+                            fsyncPath(new)
+                else:
+                    # different devices or no support by the filesystem
+                    logDebug("Cannot {action} {file}, copying instead", action=action.name, file=old, target=new)
+                    statistics.add(copyFile(old, new, fsync=fsyncFile))
+                    copied.append(new)
+                onDone(old, new)
+                touchedFolders.add(os.path.dirname(new))
+                if fsyncFile:
+                    fsyncPath(os.path.dirname(new))
+            except Exception as e:
+                logger.error(f"{action.name} excepted with {''.join(tb.format_exception(type(e), e, None))}")
+
+    else:
+
+        def act(old, new, methods):
+            logger.info(
+                "Proposing {} to {} (methods {methods})",
+                os.path.basename(old),
+                os.path.basename(new),
+                event="dryrun",
+                file=old,
+                target=new,
+                methods=methods,
+            )
+            statistics.add(0)
+
+    if contentIndex is not None:
+        items = contentIndex.filterActions(items, action)
+    if journal is not None:
+        items = journal.begin(items, action)
+
+    # Act! Copies (and links which may fall back to copies) may run concurrently, renames are cheap metadata operations
+    if action in [AutoImageRenamer.Action.copy, AutoImageRenamer.Action.link, AutoImageRenamer.Action.reflink] and copyJobs > 1:
+        runBounded(act, items, copyJobs)
+    else:
+        for item in items:
+            act(*item)
+
+    if action != AutoImageRenamer.Action.dryrun:
+        if fsyncPolicy == FsyncPolicy.end:
+            logger.debug(f"Syncing {len(copied)} files and {len(touchedFolders)} folders to disk")
+            for new in copied:
+                fsyncPath(new)
+            for folder in touchedFolders:
+                fsyncPath(folder)
+        if report:
+            statistics.report(action.name)
+    if contentIndex is not None:
+        if action == AutoImageRenamer.Action.dryrun:
+            contentIndex.rollback()
         else:
-            duplicates[value] = list()
-
-    # now find the keys to the duplicate values
-    duplicateKeys = duplicates.keys()
-    for k, v in inputs.items():
-        if v in duplicateKeys:
-            duplicates[v].append(k)
-
-    return duplicates
+            contentIndex.commit()
+    metrics.addBytes("action", statistics.bytes)
+    return statistics.files
 
 
 class AutoImageRenamer:
-    # Set list of valid file extensions
-    __EXTENSIONS = [".jpg", ".jpeg", ".png", ".mov", ".mp4", ".arw"]
-    __DATE_FORMAT = "%Y-%m-%d"
-    __DATETIME_FORMAT = f"{__DATE_FORMAT}_%H-%M-%S"
+    # Number of files handed to metadata extraction at once while streaming the input folder
+    __BATCH_SIZE = 1024
 
     class Action(Enum):
         copy = 1
         rename = 2
         dryrun = 3
+        # copies sharing the data with the source: hard link or copy-on-write clone, copy across devices
+        link = 4
+        reflink = 5
+
+    class Executor(Enum):
+        thread = 1
+        process = 2
 
-    def __init__(self, inputFolder, outputFolder, action, interactive, append):
-        self.__inputFolder = inputFolder
+    def __init__(self, inputFolder, outputFolder, action, interactive, append, jobs=1, executor=Executor.thread, cache=None, hashAlgorithm="md5", maxDepth=0, include=None, exclude=None, filenameParser=None, copyJobs=1, fsyncPolicy=FsyncPolicy.none, planFile=None, extractors=None, contentIndex=None, journal=None, policy=None, layout=None, catalog=None, run=True):
+        # inputFolder is a folder, a sources.Source or a list of them merged into outputFolder
+        self.__sources = toSources(inputFolder)
         self.__outputFolder = outputFolder
         self.__action = action
         self.__interactive = interactive
         self.__append = append
+        self.__jobs = jobs
+        self.__executor = executor
+        self.__cache = cache
+        self.__hashAlgorithm = hashAlgorithm
+        self.__pool = None
+        self.__filenameParser = filenameParser or defaultParser
+        self.__copyJobs = copyJobs
+        self.__fsyncPolicy = fsyncPolicy
+        self.__contentIndex = contentIndex
+        self.__journal = journal
+        # records the completed operations for queries, see catalog.Catalog
+        self.__catalog = catalog
+        # Valid file extensions are those known to the extractors
+        self.__extractors = extractors or defaultRegistry
+        self.__extensions = self.__extractors.getExtensions()
+        # when extraction may stop and which time is selected
+        self.__policy = policy or defaultPolicy
+        # cached times are only valid for the same filename patterns, extractors and policy, as the policy
+        # may have stopped the extraction early, see MetadataCache
+        self.__cacheContext = ";".join(
+            [
+                f"patterns={self.__filenameParser.getFingerprint()}",
+                f"extractors={','.join(self.__extractors.getNames())}",
+                f"policy={self.__policy.mode.name}:{self.__policy.n}",
+            ]
+        )
+        # target paths below outputFolder, see layout.OutputLayout
+        self.__layout = layout or OutputLayout()
 
-        logger.info(f"Doing {action.name} from {inputFolder} to {outputFolder}")
-
-        # Get all files from folder
-        fileNames = os.listdir(self.__inputFolder)
-        fileNames.sort()
-
-        proposedRenames = dict()
-        self.__fromMethods = dict()
-
-        # For each file
-        for fileName in fileNames:
+        self.__maxDepth = maxDepth
+        self.__include = include
+        self.__exclude = exclude
 
-            # Get the file extension
-            filenameParts = os.path.splitext(fileName)
-            fileExt = filenameParts[1]
-            fileNoext = filenameParts[0]
+        # All proposed renames, see getFinalRenames for a dict view
+        self.__table = FileTable()
 
-            # If the file does not have a valid file extension
-            # then skip it
-            if fileExt.lower() not in self.__EXTENSIONS:
-                continue
+        # without run, the caller drives the steps, see asyncPipeline
+        if not run:
+            return
 
-            # Create the old file path
-            oldFilePath = os.path.normpath(os.path.join(self.__inputFolder, fileName))
+        logger.info(f"Doing {action.name} from {', '.join(s.folder for s in self.__sources)} to {outputFolder}")
+        self.scan()
 
-            # try various options
-            times = self.getTimes(oldFilePath, fileExt)
-            if len(times) < 1:
-                logger.warning(
-                    f"Found no suitable time to rename for file {oldFilePath}. Skipping this file."
-                )
-                continue
-
-            # Find oldest timestamp to select
-            (oldest, self.__fromMethods[oldFilePath]) = self.findOldestTime(times)
-
-            # Propose new file name and file extension in a mapping
-            if (
-                oldest.hour == 23
-                and oldest.minute == 59
-                and oldest.second == 59
-                and oldest.microsecond == 999
-            ):
-                format = self.__DATE_FORMAT
-            else:
-                format = self.__DATETIME_FORMAT
-            if self.__append:
-                append = f"-{fileNoext}"
-            else:
-                append = ""
-            newFilename = oldest.strftime(format) + append + fileExt.lower()
-            proposedRenames[oldFilePath] = os.path.join(outputFolder, newFilename)
+        # Machine readable plan for review and a later apply
+        if planFile is not None:
+            from .plan import writePlan
 
-        # Find collisions in proposal
-        self.__finalRenames = self.fixCollisions(proposedRenames)
+            writePlan(planFile, self)
 
         # Print interactively
         if self.__interactive:
-            n_files_renamed = self.takeAction(self.__finalRenames, self.Action.dryrun)
+            n_files_renamed = self.takeAction(None, self.Action.dryrun)
             if self.__action == self.Action.dryrun:
                 logger.info(
                     "Finished. If you're happy, rerun it with actual rename/copy command"
@@ -137,263 +255,449 @@ class AutoImageRenamer:
             logger.info("Continuing...")
 
         # Actual Renames
-        n_files_renamed = self.takeAction(self.__finalRenames, self.__action)
+        n_files_renamed = self.takeAction(None, self.__action)
         logger.info(f"All done! {n_files_renamed} files renamed/copied. Byebye!")
 
-    def findOldestTime(self, times):
-        if len(times) < 1:
-            logger.error("No times entry to select")
-            raise ValueError()
-
-        oldestValue = min(times.values())
-        methods = [key for key in times if times[key] == oldestValue]
-
-        # TODO: If oldestValue is date, then datetime is later and therefore not chosen. TO BE FIXED
-        logger.debug(
-            f"Oldest value ({oldestValue.strftime(self.__DATETIME_FORMAT)}) found by method(s) {methods}"
-        )
-        return (oldestValue, methods)
+    def listCandidates(self, sourceIds: list = None):
+        ## Stream all files with a valid file extension from the sources (and their subfolders) as (sourceId, batch)
+        for sourceId in range(len(self.__sources)) if sourceIds is None else sourceIds:
+            skipFolders = None
+            if self.__maxDepth != 0:
+                # nested sources are walked on their own, with their own settings
+                skipFolders = [self.__outputFolder] + [s.folder for i, s in enumerate(self.__sources) if i != sourceId]
+            candidates = walkFiles(
+                self.__sources[sourceId].folder,
+                self.__extensions,
+                self.__maxDepth,
+                self.__include,
+                self.__exclude,
+                skipFolders=skipFolders,
+            )
+            while True:
+                batch = list(itertools.islice(candidates, self.__BATCH_SIZE))
+                if len(batch) < 1:
+                    break
+                yield (sourceId, batch)
+
+    def scan(self):
+        ## Propose renames for all candidates and make them unique
+        # try various options, possibly in parallel. Results keep the order of candidates within a source
+        exifReader.readStatistics.reset()
+        with self.createPool():
+            for sourceId, batch, allTimes in self.extractCandidates():
+                # For each file
+                for candidate, times in zip(batch, allTimes):
+                    self.proposeRename(candidate.path, candidate.relDir, candidate.stem, candidate.ext, times, sourceId)
+        exifReader.readStatistics.log()
+
+        # Find collisions in proposal, over all sources at once
+        self.fixTableCollisions()
+
+    def extractCandidates(self):
+        ## Yield (sourceId, batch, allTimes) for all candidates, see listCandidates and getCachedTimes.
+        # Sources on different devices are walked and read concurrently by one worker thread per device.
+        # The metadata cache is only used from the calling thread.
+        devices = groupByDevice(self.__sources)
+        if len(devices) <= 1:
+            for sourceId, batch in self.listCandidates():
+                yield (sourceId, batch, self.getCachedTimes([c.path for c in batch], [c.ext for c in batch], [c.stat for c in batch]))
+            return
+
+        logger.debug(f"Reading {len(self.__sources)} sources with one worker for each of {len(devices)} devices")
+        # workers send (device, sourceId, batch) for a cache lookup, then (device, extracted times) and finally
+        # (device, None, error). They receive the missing files of their batch, None to stop early
+        outbox = queue.Queue()
+        inboxes = [queue.Queue() for _ in devices]
+
+        def work(device: int, sourceIds: list):
+            error = None
+            try:
+                for sourceId, batch in self.listCandidates(sourceIds):
+                    outbox.put((device, sourceId, batch))
+                    missing = inboxes[device].get()
+                    if missing is None:
+                        return
+                    outbox.put((device, self.extractAllTimes([batch[m[0]].path for m in missing], [batch[m[0]].ext for m in missing])))
+            except Exception as e:
+                error = e
+            finally:
+                outbox.put((device, None, error))
 
-    def fixCollisions(self, proposals: dict[str, str]):
-        ## Find collisions new filename and append incrementing number
-
-        # find duplicate target names
-        duplicatesNewFilenames = findDuplicates(proposals)
-
-        for newFilename, oldFilenames in duplicatesNewFilenames.items():
-            # find duplicate content per (duplicate) newFilename
-            hashes = dict()
-            for oldFilename in oldFilenames:
-                hashes[oldFilename] = getFileHash(oldFilename)
-
-            # and remove the duplicates from our local duplicate list
-            duplicatesOldFilenames = findDuplicates(hashes)
-            for sameHash in duplicatesOldFilenames.values():
-                isFirst = True
-                for oldFilename in sameHash:
-                    if isFirst:
-                        isFirst = False
-                        continue
-                    filepartsNew = os.path.split(proposals[oldFilename])
-                    filepartsOld = os.path.split(oldFilename)
-                    newFilename = os.path.join(
-                        filepartsNew[0], f"DUPLICATE_{filepartsOld[1]}"
-                    )
-                    proposals[oldFilename] = newFilename
-                    oldFilenames.remove(oldFilename)
-                    logger.debug(f"Removing {oldFilename} due to content duplicate")
-
-            # finally, rename remaining duplicates by adding a counter
-            nEntries = 1
-            for oldFilename in oldFilenames:
-                fileparts = os.path.splitext(proposals[oldFilename])
-                newFilename = fileparts[0] + "_" + str(nEntries).zfill(3) + fileparts[1]
-                nEntries += 1
-                proposals[oldFilename] = newFilename
-                logger.debug(
-                    f"Add duplicate-counter for oldFilename={oldFilename} to new={newFilename}"
-                )
+        for device, sourceIds in enumerate(devices):
+            threading.Thread(target=work, args=(device, sourceIds), name=f"device-{device}", daemon=True).start()
 
-        return proposals
+        pending = dict()
+        running = len(devices)
+        try:
+            while running > 0:
+                message = outbox.get()
+                device = message[0]
+                if len(message) == 2:
+                    (sourceId, batch, allTimes, missing) = pending.pop(device)
+                    self.storeCachedTimes(allTimes, missing, message[1])
+                    yield (sourceId, batch, allTimes)
+                elif message[1] is None:
+                    running -= 1
+                    if message[2] is not None:
+                        raise message[2]
+                else:
+                    (_, sourceId, batch) = message
+                    (allTimes, missing) = self.lookupCachedTimes([c.path for c in batch], [c.stat for c in batch])
+                    pending[device] = (sourceId, batch, allTimes, missing)
+                    inboxes[device].put(missing)
+        finally:
+            # stop the remaining workers after an error or when the caller stops early
+            for inbox in inboxes:
+                inbox.put(None)
+
+    def proposeRename(self, oldFilePath: str, relDir: str, fileNoext: str, fileExt: str, times: dict, sourceId: int = 0):
+        ## Return the proposed new path for a file from its extracted times, None if there is no suitable time.
+        # The file is added to the table of renames. The offset of its source is applied to the times.
+        times = shiftTimes(times, self.__sources[sourceId].offset)
+        if len(times) < 1:
+            logger.warning(
+                "Found no suitable time to rename for file {file}. Skipping this file.", event="skip", file=oldFilePath
+            )
+            return None
 
-    def takeAction(self, finalFilenames, action) -> int:
-        # Setup action
-        if action == self.Action.rename:
+        # Find oldest timestamp to select
+        (oldest, fromMethods) = self.findOldestTime(times)
 
-            def act(old, new, methods):
-                logger.info(f"Renaming {old} to {new} (methods {methods})")
-                try:
-                    os.rename(old, new)
-                except Exception as e:
-                    logger.error(f"Renaming excepted with {''.join(tb.format_exception(type(e), e, None))}")
+        # Propose new file name and folder
+        newFilePath = os.path.join(self.__outputFolder, self.__layout.format(oldest, fileNoext, fileExt, relDir, self.__append))
+        self.__table.add(oldFilePath, newFilePath, times, fromMethods, sourceId, oldest)
+        return newFilePath
 
-        elif action == self.Action.copy:
+    @contextmanager
+    def createPool(self):
+        ## Provide the worker pool used by extractAllTimes for the duration of a scan
+        if self.__jobs <= 1:
+            yield None
+            return
 
-            def act(old, new, methods):
-                logger.info(f"Copying {old} to {new} (methods {methods})")
-                shutil.copyfile(old, new)
+        if self.__executor == self.Executor.process:
+            # loads multiprocessing, only needed for process workers
+            from concurrent.futures import ProcessPoolExecutor
 
+            pool = ProcessPoolExecutor(max_workers=self.__jobs)
         else:
+            pool = ThreadPoolExecutor(max_workers=self.__jobs)
+        self.__pool = pool
+        try:
+            with pool:
+                yield pool
+        finally:
+            self.__pool = None
+
+    def getCachedTimes(self, filenames: list, fileExts: list, statFunctions: list = None) -> list:
+        ## Like extractAllTimes, but only files missing in the metadata cache are extracted.
+        # statFunctions optionally provide already cached stat results of the files
+        (allTimes, missing) = self.lookupCachedTimes(filenames, statFunctions)
+        extracted = self.extractAllTimes(
+            [filenames[m[0]] for m in missing], [fileExts[m[0]] for m in missing]
+        )
+        self.storeCachedTimes(allTimes, missing, extracted)
+        return allTimes
+
+    def lookupCachedTimes(self, filenames: list, statFunctions: list = None):
+        ## Return the cached times of filenames (None if missing) and the (index, key, stat) of the missing ones
+        if self.__cache is None:
+            return ([None] * len(filenames), [(index, None, None) for index in range(len(filenames))])
+
+        allTimes = list()
+        missing = list()
+        for index, filename in enumerate(filenames):
+            key = os.path.abspath(filename)
+            if statFunctions is None:
+                stat = os.stat(filename)
+            else:
+                stat = statFunctions[index]()
+            times = self.__cache.get(key, stat, self.__cacheContext)
+            if times is None:
+                missing.append((index, key, stat))
+            allTimes.append(times)
+        return (allTimes, missing)
+
+    def storeCachedTimes(self, allTimes: list, missing: list, extracted: list):
+        ## Fill in the times extracted for the missing files of lookupCachedTimes and cache them
+        for (index, key, stat), times in zip(missing, extracted):
+            if self.__cache is not None:
+                self.__cache.put(key, stat, times, self.__cacheContext)
+            allTimes[index] = times
+        if self.__cache is not None:
+            self.__cache.commit()
+
+    def extractAllTimes(self, filenames: list, fileExts: list) -> list:
+        ## Run getTimes for every file and return the times in the same order as the input.
+        # Within createPool and with more than one job, the files are distributed to the worker pool.
+        if self.__pool is None or len(filenames) <= 1:
+            return [self.getTimes(f, e) for f, e in zip(filenames, fileExts)]
 
-            def act(old, new, methods):
-                oldBasename = os.path.basename(old)
-                newBasename = os.path.basename(new)
-                logger.info(
-                    f"Proposing {oldBasename} to {newBasename} (methods {methods})"
-                )
+        logger.debug(
+            f"Extracting times of {len(filenames)} files with {self.__jobs} {self.__executor.name} workers"
+        )
+        if self.__executor == self.Executor.process:
+            # amortize the pickling of tasks across several files per worker round trip
+            chunksize = max(1, len(filenames) // (self.__jobs * 4))
+            if not metrics.enabled:
+                return list(self.__pool.map(self.getTimes, filenames, fileExts, chunksize=chunksize))
+
+            # metrics recorded in the worker processes are returned along with the times
+            allTimes = list()
+            for times, state in self.__pool.map(self.getTimesMeasured, filenames, fileExts, chunksize=chunksize):
+                metrics.merge(state)
+                allTimes.append(times)
+            return allTimes
+
+        return list(self.__pool.map(self.getTimes, filenames, fileExts))
+
+    def __getstate__(self):
+        ## Pool workers only need the configuration, open resources and results stay in this process
+        state = self.__dict__.copy()
+        for name in ["cache", "pool", "table", "contentIndex", "journal", "catalog"]:
+            state[f"_AutoImageRenamer__{name}"] = None
+        return state
 
-        # Act!
-        for old, new in finalFilenames.items():
-            act(old, new, self.__fromMethods[old])
+    def findOldestTime(self, times):
+        ## Select the time to rename to according to the resolution policy, see ResolutionPolicy.select
+        if len(times) < 1:
+            logger.error("No times entry to select")
+            raise ValueError()
 
-        return len(finalFilenames)
+        (oldestValue, methods) = self.__policy.select(times)
+        logDebug("Oldest value ({oldest}) found by method(s) {methods}", oldest=oldestValue, methods=methods)
+        return (oldestValue, methods)
 
-    def getTimes(self, filename : str, fileExt : str):
+    def fixCollisions(self, proposals: dict[str, str]):
+        ## Find collisions new filename and append incrementing number, see CollisionResolver
+        sources = list(proposals.keys())
+        resolver = CollisionResolver(self.__hashAlgorithm, logDebug)
+        for index, newFilename in resolver.resolve(
+            len(sources), sources.__getitem__, lambda i: os.path.split(proposals[sources[i]]), dict()
+        ):
+            proposals[sources[index]] = newFilename
+        return proposals
 
-        times = dict()
-        if fileExt.lower() == ".mov":
-            times["mov"] = self.getFileHachoir(filename)
+    def fixTableCollisions(self):
+        ## fixCollisions on the table of renames
+        table = self.__table
+        hashes = dict()
+        rank = None
+        if len(self.__sources) > 1:
+            # files of sources with higher priority come first, then in the order of the sources
+            priorities = [-s.priority for s in self.__sources]
+            rank = lambda index: (priorities[table.getSourceId(index)], table.getSourceId(index), index)
+        resolver = CollisionResolver(self.__hashAlgorithm, logDebug)
+        for index, newFilename in resolver.resolve(len(table), table.getSource, table.getTargetParts, hashes, rank):
+            table.setTarget(index, newFilename)
+        for index in range(len(table)):
+            digest = hashes.get(table.getSource(index)) if hashes else None
+            if digest is not None:
+                table.setHash(index, digest)
+
+    @metrics.measure("action")
+    def takeAction(self, finalFilenames, action, report: bool = True) -> int:
+        ## Act on the renames {old: new} of finalFilenames, on all renames of the table if None.
+        # Returns the number of files acted on, see performActions
+        table = self.__table
+        if finalFilenames is None:
+            items = table.items()
         else:
-            try:
-                exifTimes = self.getExifTimes(filename)
-                times.update(exifTimes)
-            except:
-                pass
+            items = ((old, new, self.getMethodsOf(old)) for old, new in finalFilenames.items())
+
+        onDone = None
+        journal = None
+        completed = list()
+        folders = FolderCache()
+        if action != self.Action.dryrun:
+            # all intents are on disk before the first file is touched, files skipped or linked as duplicates have none
+            journal = self.__journal
+            if self.__journal is not None or self.__catalog is not None:
+                onDone = self.onDone(completed)
+            if finalFilenames is None and self.__contentIndex is None:
+                # known from the table without touching the files, files skipped by a content index would leave empty folders
+                folders.makeAll(table.getTargetFolders())
+        nFiles = performActions(items, action, self.__copyJobs, self.__fsyncPolicy, report, self.__contentIndex, onDone, folders, journal)
+        if self.__catalog is not None and completed:
+            self.__catalog.addCompleted(self, completed, action)
+        return nFiles
+
+    def onDone(self, completed: list):
+        ## Callback of performActions for a completed operation: journal it and collect it for the catalog
+        journal = self.__journal
+        collect = self.__catalog is not None
+
+        def done(old, new):
+            if journal is not None:
+                journal.markDone(old, new)
+            if collect:
+                # list.append is atomic, copies may complete on several threads
+                completed.append((old, new))
+
+        return done
+
+    def getMethodsOf(self, filename: str) -> list:
+        index = self.__table.find(filename)
+        return list() if index is None else self.__table.getFromMethods(index)
+
+    def getTimesMeasured(self, filename: str, fileExt: str):
+        ## getTimes for pool processes, returning the metrics recorded in the worker as well
+        metrics.enable()
+        times = self.getTimes(filename, fileExt)
+        return (times, metrics.drain())
 
-        try:
-            times["filename"] = self.getFilenameTime(filename)
-        except:
-            pass
+    def getTimes(self, filename : str, fileExt : str):
+        ## All times found by the extractors registered for the file, see extractors.py
 
         # we could also take into account file creation date on filesystem. this seems very inaccurate though and we prefer no rename at all
-        # try:
-        #    times['creation'] = self.getFileCreated(filename)
-        # except:
-        #    pass
-
-        # Remove invalid entries
-        times = {k: v for k, v in times.items() if v is not None}
-
-        return times
+        return self.__extractors.extract(self, filename, fileExt, self.__policy)
 
+    @metrics.measure("exif")
     def getExifTimes(self, filename):
         ## Extract EXIF image taken from filename and return datetime object
-        # Open the image
+        tagIds = ["EXIF DateTimeOriginal", "EXIF DateTimeDigitized", "Image DateTime"]
+        # Fast path: walk the TIFF IFDs within a bounded header read
         try:
-            # Open image file for reading (binary mode)
-            with open(filename, "rb") as f:
-                # Return Exif tags
-                tags = exifread.process_file(f, details=False)
-        except:
-            logger.debug(f"Opening file {filename} failed")
-            raise ValueError()
-
-        debugExif = 0
-        if debugExif == 1:
-            for key, val in tags.items():
-                logger.debug(f"{key}: \t {repr(val)}")
+            tags = exifReader.readExifDates(filename)
+        except Exception as e:
+            logDebug("Fast EXIF read of {file} failed ({error}), falling back to exifread", file=filename, error=e)
+            tags = self.getExifreadTags(filename, tagIds)
 
-        tagIds = ["EXIF DateTimeOriginal", "EXIF DateTimeDigitized", "Image DateTime"]
         datetime_objs = dict.fromkeys(tagIds)
         for tagId in tagIds:
 
             try:
                 tagValue = tags[tagId]
             except:
-                logger.debug(f"EXIF tag ID {tagId} invalid for {filename}")
+                logDebug("EXIF tag ID {tag} invalid for {file}", tag=tagId, file=filename)
                 datetime_objs[tagId] = None
                 continue
 
             try:
                 # extract relevant part
-                datetime_str = tagValue.values
+                datetime_str = tagValue
                 datetime_objs[tagId] = datetime.strptime(
                     datetime_str, "%Y:%m:%d %H:%M:%S"
                 )
             except:
-                logger.debug(
-                    f"EXIF tag {tagId} string {datetime_str} not parsable in {filename}"
+                logDebug(
+                    "EXIF tag {tag} string {value} not parsable in {file}", tag=tagId, value=tagValue, file=filename
                 )
                 datetime_objs[tagId] = None
                 continue
 
-            logger.debug(f"EXIF tag {tagId} parsed to {datetime_objs} from {filename}")
+            logDebug("EXIF tag {tag} parsed to {time} from {file}", tag=tagId, time=datetime_objs[tagId], file=filename)
 
-        logger.debug(f"Extracted {datetime_objs} from {filename}")
+        logDebug("Extracted {times} from {file}", event="exif", times=datetime_objs, file=filename)
 
         return datetime_objs
 
+    def getExifreadTags(self, filename, tagIds):
+        ## Read tags with exifread and return the raw values of tagIds
+        # exifread is only loaded once the fast path failed for a file
+        import exifread
+
+        # Open the image
+        try:
+            # Open image file for reading (binary mode)
+            with open(filename, "rb") as f:
+                # Return Exif tags
+                reader = exifReader.CountingReader(
+                    f, (os.path.splitext(filename)[1].lower(), "exifread")
+                )
+                tags = exifread.process_file(reader, details=False)
+                reader.report()
+        except:
+            logDebug("Opening file {file} failed", file=filename)
+            raise ValueError()
+
+        debugExif = 0
+        if debugExif == 1:
+            for key, val in tags.items():
+                logger.debug(f"{key}: \t {repr(val)}")
+
+        return {tagId: tags[tagId].values for tagId in tagIds if tagId in tags}
+
+    @metrics.measure("filename")
     def getFilenameTime(self, filename : str) -> datetime:
         ## Extract date and time from file name and return datetime object
 
         filenameWithoutPath = os.path.basename(filename)
 
-        datePattern = "^.*?(\d{4})[-_ ]?(\d{2})[-_ ]?(\d{2}).*?"
-        timePattern = "(\d{2})[-_: ]?(\d{2})[-_: ]?(\d{2})"
-        datetimePattern = datePattern + "[-_ ]?" + timePattern
-
-        # try full match at first
-        reDateTime = re.match(datetimePattern, filenameWithoutPath)
-        if reDateTime is not None:
-            try:
-                year = int(reDateTime.group(1))
-                month = int(reDateTime.group(2))
-                day = int(reDateTime.group(3))
-                hour = int(reDateTime.group(4))
-                minute = int(reDateTime.group(5))
-                second = int(reDateTime.group(6))
-
-                datetime_obj = datetime(
-                    year=year,
-                    month=month,
-                    day=day,
-                    hour=hour,
-                    minute=minute,
-                    second=second,
-                )
-            except Exception as e:
-                logger.debug(f"Datetime creation of file {filename} (A) failed (extracted date would be {year}-{month}-{day} {hour}-{minute}-{second} (y-m-d h-m-s)) with {e}")
-        else:
-            # if not found everything, try day only
-            reDate = re.match(datePattern, filenameWithoutPath)
-            if reDate is not None:
-                try:
-                    year = int(reDate.group(1))
-                    month = int(reDate.group(2))
-                    day = int(reDate.group(3))
-                    # set datetime to end of day for later minimum usage. Mark microsecond to maximum to revert
-                    datetime_obj = datetime(
-                        year=year,
-                        month=month,
-                        day=day,
-                        hour=23,
-                        minute=59,
-                        second=59,
-                        microsecond=999,
-                    )
-                except Exception as e:
-                    logger.info(f"Datetime creation of file {filename} (B) failed (extracted date would be {year}-{month}-{day} (y-m-d)) with {e}")
-            else:
-                logger.debug(
-                    f"Neither datetime nor date pattern found in filename {filename}"
-                )
+        (date_obj, datetime_obj) = self.__filenameParser.parse(filenameWithoutPath)
+        if datetime_obj is None:
+            if date_obj is None:
+                logDebug("Neither datetime nor date pattern found in filename {file}", file=filename)
                 return None
+            # set datetime to end of day for later minimum usage, see dateOnly
+            datetime_obj = dateOnly(date_obj)
 
-        logger.debug(f"Filename date/time {datetime_obj} extracted from {filename}")
+        logDebug("Filename date/time {time} extracted from {file}", event="filename", time=datetime_obj, file=filename)
         return datetime_obj
 
     def getFileCreated(self, filename):
         ## Get file creation date and time and return datetime object
         creationTimestamp = os.stat(filename).st_ctime
         datetime_obj = datetime.fromtimestamp(creationTimestamp)
-        logger.debug(f"File creation time {datetime_obj} found from {filename}")
+        logDebug("File creation time {time} found from {file}", time=datetime_obj, file=filename)
         return datetime_obj
     
 
+    @metrics.measure("hachoir")
     def getFileHachoir(self, filename):
         """ Get hachcoir metadata for MOV files """
+        # hachoir loads parsers for all its formats, which takes longer than most runs need
+        import hachoir.parser
+        import hachoir.metadata
+
         try:
             parser = hachoir.parser.createParser(filename)
         except Exception as e:
-            logger.debug(f"Parser creation failed on file {filename} with hachoir.")
+            logDebug("Parser creation failed on file {file} with hachoir.", file=filename)
             return None
         if not parser:
-            logger.debug(f"Parsing of file {filename} failed with hachoir.")
+            logDebug("Parsing of file {file} failed with hachoir.", file=filename)
             return None
 
         with parser:
             try:
                 metadata = hachoir.metadata.extractMetadata(parser)
             except Exception as err:
-                logger.debug(f"Metadata extraction failed on file {filename} with hachoir.")
+                logDebug("Metadata extraction failed on file {file} with hachoir.", file=filename)
         
         try:
             datetime_obj = metadata.get('creation_date')
         except Exception as e:
-            logger.debug(f"creation_date extraction failed non file {filename} failed with hachoir.")
+            logDebug("creation_date extraction failed non file {file} failed with hachoir.", file=filename)
             datetime_obj = None
 
+        logDebug("hachoir creation date {time} extracted from {file}", event="hachoir", time=datetime_obj, file=filename)
         return datetime_obj
 
+    def getTable(self) -> FileTable:
+        return self.__table
+
     def getFinalRenames(self):
-        return self.__finalRenames
+        ## {old: new} of all renames, built from the table on every call
+        return {self.__table.getSource(i): self.__table.getTarget(i) for i in range(len(self.__table))}
+
+    def getFromMethods(self):
+        return {self.__table.getSource(i): self.__table.getFromMethods(i) for i in range(len(self.__table))}
+
+    def getAllTimes(self):
+        return {self.__table.getSource(i): self.__table.getTimes(i) for i in range(len(self.__table))}
+
+    def getHashes(self):
+        return self.__table.getHashes()
+
+    def getSources(self) -> list:
+        return self.__sources
+
+    def getJobs(self):
+        return self.__jobs
+
+    def getHashAlgorithm(self):
+        return self.__hashAlgorithm
+
+    def getExtensions(self):
+        return self.__extensions
@@ -0,0 +1,256 @@
+"""AutoImageRenamer benchmark:
+Creates a synthetic corpus of images and videos and measures the time of each processing stage.
+Results are written as JSON to compare versions.
+
+Usage:
+    bench.py [options]
+
+Options:
+    -n --files=<n>          Number of files in the corpus [default: 1000]
+    --mix=<formats>         Format mix as format:weight list [default: jpg:70,arw:10,mov:10,mp4:10]
+    --size-min=<kib>        Minimum file size in KiB [default: 16]
+    --size-max=<kib>        Maximum file size in KiB, sizes are log-uniform distributed [default: 4096]
+    --collisions=<rate>     Fraction of files sharing their timestamp with another file [default: 0.1]
+    --duplicates=<rate>     Fraction of files which are byte copies of another file [default: 0.02]
+    --named=<rate>          Fraction of files with a date in the file name [default: 0.3]
+    --seed=<seed>           Random seed of the corpus [default: 1]
+    --corpus=<dir>          Create (or reuse) the corpus in this folder instead of a temporary one
+    -o --output=<file>      Write the results to this JSON file instead of stdout
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import random
+import struct
+import shutil
+import platform
+import tempfile
+from datetime import datetime, timedelta
+from docopt import docopt
+from loguru import logger
+
+from .autoImageRenamer import AutoImageRenamer, getFileHash, performActions
+from .fileWalker import walkFiles
+from .videoReader import readMovieDates
+
+__version__ = "1.0.0"
+
+# seconds between 1904-01-01 (QuickTime epoch) and 1970-01-01
+_QUICKTIME_EPOCH_OFFSET = 2082844800
+
+
+def createTiff(dateTime: datetime, payload: int = 0) -> bytes:
+    ## Little endian TIFF with DateTime in IFD0 and DateTimeOriginal/DateTimeDigitized in the EXIF IFD
+    value = dateTime.strftime("%Y:%m:%d %H:%M:%S").encode("ascii") + b"\x00"
+    ifd0Offset = 8
+    exifOffset = ifd0Offset + 2 + 2 * 12 + 4
+    valuesOffset = exifOffset + 2 + 2 * 12 + 4
+    data = b"II*\x00" + struct.pack("<I", ifd0Offset)
+    data += struct.pack("<H", 2)
+    data += struct.pack("<HHII", 0x0132, 2, len(value), valuesOffset)
+    data += struct.pack("<HHII", 0x8769, 4, 1, exifOffset)
+    data += struct.pack("<I", 0)
+    data += struct.pack("<H", 2)
+    data += struct.pack("<HHII", 0x9003, 2, len(value), valuesOffset)
+    data += struct.pack("<HHII", 0x9004, 2, len(value), valuesOffset)
+    data += struct.pack("<I", 0)
+    data += value
+    return data + os.urandom(payload)
+
+
+def createJpeg(dateTime: datetime, size: int) -> bytes:
+    ## JPEG with an APP1 EXIF segment followed by random "scan" data
+    tiff = createTiff(dateTime)
+    app1 = b"\xff\xe1" + struct.pack(">H", len(tiff) + 8) + b"Exif\x00\x00" + tiff
+    header = b"\xff\xd8" + app1 + b"\xff\xda"
+    return header + os.urandom(max(0, size - len(header) - 2)) + b"\xff\xd9"
+
+
+def createIsoBmff(dateTime: datetime, size: int, brand: bytes) -> bytes:
+    ## MOV/MP4 with ftyp, moov/mvhd holding the creation time and an mdat box filling up to size
+    def box(boxType: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I", len(payload) + 8) + boxType + payload
+
+    seconds = int((dateTime - datetime(1970, 1, 1)).total_seconds()) + _QUICKTIME_EPOCH_OFFSET
+    matrix = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    mvhd = struct.pack(">B3xIIII", 0, seconds, seconds, 1000, 1000)
+    mvhd += struct.pack(">IH10x", 0x10000, 0x100) + matrix + bytes(24) + struct.pack(">I", 2)
+    data = box(b"ftyp", brand + struct.pack(">I", 0) + brand) + box(b"moov", box(b"mvhd", mvhd))
+    return data + box(b"mdat", os.urandom(max(0, size - len(data) - 8)))
+
+
+def createFile(fileFormat: str, dateTime: datetime, size: int) -> bytes:
+    if fileFormat == "jpg":
+        return createJpeg(dateTime, size)
+    if fileFormat == "arw":
+        return createTiff(dateTime, max(0, size - 128))
+    if fileFormat == "mov":
+        return createIsoBmff(dateTime, size, b"qt  ")
+    if fileFormat == "mp4":
+        return createIsoBmff(dateTime, size, b"isom")
+    raise ValueError(f"Unknown format {fileFormat}")
+
+
+def createCorpus(folder: str, config: dict) -> dict:
+    ## Create the synthetic corpus and return statistics about it
+    rng = random.Random(config["seed"])
+    formats = list(config["mix"].keys())
+    weights = list(config["mix"].values())
+    logMin = math.log(config["sizeMin"] * 1024)
+    logMax = math.log(config["sizeMax"] * 1024)
+
+    os.makedirs(folder, exist_ok=True)
+    created = list()
+    timestamps = list()
+    nBytes = 0
+    for index in range(config["files"]):
+        roll = rng.random()
+        if created and roll < config["duplicates"]:
+            # byte copy of an earlier file
+            (original, fileFormat) = rng.choice(created)
+            with open(original, "rb") as f:
+                content = f.read()
+            stem = f"copy_{index:07d}"
+        else:
+            fileFormat = rng.choices(formats, weights)[0]
+            if timestamps and roll < config["duplicates"] + config["collisions"]:
+                dateTime = rng.choice(timestamps)
+            else:
+                dateTime = datetime(2000, 1, 1) + timedelta(seconds=rng.randrange(20 * 365 * 24 * 3600))
+                timestamps.append(dateTime)
+            size = int(math.exp(rng.uniform(logMin, logMax)))
+            content = createFile(fileFormat, dateTime, size)
+            if rng.random() < config["named"]:
+                stem = dateTime.strftime("IMG_%Y%m%d_%H%M%S") + f"_{index:07d}"
+            else:
+                stem = f"DSC{index:07d}"
+        filename = os.path.join(folder, f"{stem}.{fileFormat}")
+        with open(filename, "wb") as f:
+            f.write(content)
+        nBytes += len(content)
+        created.append((filename, fileFormat))
+
+    return {"files": len(created), "bytes": nBytes}
+
+
+def timeStage(results: dict, name: str, function, nItems: int):
+    ## Run function once and store its wall time under name
+    start = time.perf_counter()
+    value = function()
+    seconds = time.perf_counter() - start
+    results[name] = {
+        "seconds": seconds,
+        "items": nItems,
+        "usPerItem": seconds / nItems * 1e6 if nItems > 0 else None,
+    }
+    return value
+
+
+def runBenchmark(corpus: str, workFolder: str) -> dict:
+    ## Time the processing stages on corpus, using workFolder for the action stage
+    stages = dict()
+    extensions = [".jpg", ".jpeg", ".png", ".mov", ".mp4", ".arw"]
+
+    entries = timeStage(stages, "listing", lambda: list(walkFiles(corpus, extensions)), 0)
+    stages["listing"]["items"] = len(entries)
+    stages["listing"]["usPerItem"] = stages["listing"]["seconds"] / max(len(entries), 1) * 1e6
+
+    # extraction methods on their own, on an otherwise idle renamer
+    emptyFolder = os.path.join(workFolder, "empty")
+    os.makedirs(emptyFolder, exist_ok=True)
+    renamer = AutoImageRenamer(emptyFolder, emptyFolder, AutoImageRenamer.Action.dryrun, False, False)
+    exifFiles = [e.path for e in entries if e.ext.lower() in (".jpg", ".arw")]
+    videoFiles = [e.path for e in entries if e.ext.lower() in (".mov", ".mp4")]
+    timeStage(stages, "extract.filename", lambda: [renamer.getFilenameTime(e.path) for e in entries], len(entries))
+    timeStage(stages, "extract.exif", lambda: [renamer.getExifTimes(f) for f in exifFiles], len(exifFiles))
+    # the box walker reads the movie times, hachoir only runs for files it cannot walk
+    timeStage(stages, "extract.movie", lambda: [readMovieDates(f) for f in videoFiles], len(videoFiles))
+    timeStage(stages, "extract.hachoir-fallback", lambda: [renamer.getFileHachoir(f) for f in videoFiles], len(videoFiles))
+
+    # complete scan including collision fixing, without action
+    scanned = timeStage(
+        stages,
+        "scan",
+        lambda: AutoImageRenamer(corpus, corpus, AutoImageRenamer.Action.dryrun, False, False),
+        len(entries),
+    )
+    proposals = scanned.getFinalRenames()
+
+    # collision fixing including the content comparison of colliding files
+    unresolved = dict()
+    for path, times in scanned.getAllTimes().items():
+        unresolved[path] = os.path.join(corpus, str(min(times.values())))
+    timeStage(stages, "collisions", lambda: renamer.fixCollisions(dict(unresolved)), len(unresolved))
+    timeStage(stages, "hash.full", lambda: [getFileHash(e.path) for e in entries], len(entries))
+
+    # copy action into a fresh folder
+    target = os.path.join(workFolder, "target")
+    shutil.rmtree(target, ignore_errors=True)
+    items = [(old, os.path.join(target, os.path.basename(new)), ["bench"]) for old, new in proposals.items()]
+    timeStage(
+        stages,
+        "action.copy",
+        lambda: performActions(items, AutoImageRenamer.Action.copy, report=False),
+        len(items),
+    )
+    shutil.rmtree(target, ignore_errors=True)
+    return stages
+
+
+def parseMix(mix: str) -> dict:
+    result = dict()
+    for part in mix.split(","):
+        (fileFormat, weight) = part.split(":")
+        result[fileFormat.strip().lower()] = float(weight)
+    return result
+
+
+def main():
+    arguments = docopt(__doc__, version=__version__)
+    logger.remove(None)
+    logger.add(sys.stderr, level="WARNING")
+
+    config = dict()
+    config["files"] = int(arguments["--files"])
+    config["mix"] = parseMix(arguments["--mix"])
+    config["sizeMin"] = float(arguments["--size-min"])
+    config["sizeMax"] = float(arguments["--size-max"])
+    config["collisions"] = float(arguments["--collisions"])
+    config["duplicates"] = float(arguments["--duplicates"])
+    config["named"] = float(arguments["--named"])
+    config["seed"] = int(arguments["--seed"])
+
+    workFolder = tempfile.mkdtemp(prefix="autoImageRenamerBench")
+    try:
+        corpus = arguments["--corpus"] or os.path.join(workFolder, "corpus")
+        start = time.perf_counter()
+        if os.path.isdir(corpus) and os.listdir(corpus):
+            corpusStats = {"files": len(os.listdir(corpus)), "reused": True}
+        else:
+            corpusStats = createCorpus(corpus, config)
+        corpusStats["createSeconds"] = time.perf_counter() - start
+
+        results = dict()
+        results["version"] = __version__
+        results["timestamp"] = datetime.now().isoformat(timespec="seconds")
+        results["python"] = platform.python_version()
+        results["platform"] = platform.platform()
+        results["config"] = config
+        results["corpus"] = corpusStats
+        results["stages"] = runBenchmark(corpus, workFolder)
+    finally:
+        shutil.rmtree(workFolder, ignore_errors=True)
+
+    output = json.dumps(results, indent=2)
+    if arguments["--output"]:
+        with open(arguments["--output"], "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import os
+import json
+import sqlite3
+from datetime import datetime
+from loguru import logger
+
+
+class Catalog:
+    """ SQLite record of all files processed by the runs of a library, for queries without rescanning.
+
+    One row per renamed/copied file with original and final path, the selected time (taken) and the methods
+    which found it, all candidate times as JSON object of method to time, the methods with a time (found), size
+    and the content hash if one was computed for collisions. Times are ISO strings, so a day, month or year is
+    a prefix range. taken and hash are indexed, all other filters scan the table. Rows are written in
+    transactions of BATCH_SIZE files.
+    """
+
+    # Increment whenever the meaning of the stored rows changes
+    __SCHEMA_VERSION = 1
+    BATCH_SIZE = 10000
+
+    def __init__(self, filename: str):
+        self.__filename = filename
+        # run id of each action written by this instance
+        self.__runs = dict()
+
+        folder = os.path.dirname(filename)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.__db = sqlite3.connect(filename)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+
+        version = self.__db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in [0, self.__SCHEMA_VERSION]:
+            logger.warning(f"Catalog {filename} has an unknown version {version}, recreating it")
+            self.__db.execute("DROP TABLE IF EXISTS runs")
+            self.__db.execute("DROP TABLE IF EXISTS files")
+        self.__db.execute(f"PRAGMA user_version={self.__SCHEMA_VERSION}")
+        self.__db.execute("CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, started TEXT NOT NULL, action TEXT NOT NULL)")
+        self.__db.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                run INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                taken TEXT NOT NULL,
+                methods TEXT NOT NULL,
+                found TEXT NOT NULL,
+                times TEXT NOT NULL,
+                size INTEGER,
+                hashAlgorithm TEXT,
+                hash TEXT
+            )"""
+        )
+        self.__db.execute("CREATE INDEX IF NOT EXISTS files_taken ON files(taken)")
+        self.__db.execute("CREATE INDEX IF NOT EXISTS files_hash ON files(hash)")
+        self.__db.commit()
+
+    def __startRun(self, action) -> int:
+        ## One run per action of a catalog opened for writing, created with its first file
+        if action not in self.__runs:
+            self.__runs[action] = self.__db.execute(
+                "INSERT INTO runs (started, action) VALUES (?, ?)", (datetime.now().isoformat(), action.name)
+            ).lastrowid
+        return self.__runs[action]
+
+    def addCompleted(self, renamer, completed: list, action) -> int:
+        ## Add the completed (old, new) operations of action, with the times and hashes of the table of renamer
+        table = renamer.getTable()
+        algorithm = renamer.getHashAlgorithm()
+        run = self.__startRun(action)
+        rows = list()
+        # absolute folders, most files share a few of them
+        folders = dict()
+
+        def absolute(path: str) -> str:
+            (folder, _, name) = path.rpartition(os.sep)
+            absoluteFolder = folders.get(folder)
+            if absoluteFolder is None:
+                absoluteFolder = folders[folder] = os.path.join(os.path.abspath(folder or os.curdir), "")
+            return absoluteFolder + name
+
+        for old, new in completed:
+            index = table.find(old)
+            if index is None:
+                continue
+            times = {method: value.isoformat() for method, value in table.getTimes(index).items()}
+            methods = table.getFromMethods(index)
+            try:
+                size = os.stat(new).st_size
+            except OSError:
+                size = None
+            digest = table.getHash(index)
+            rows.append(
+                (
+                    run,
+                    absolute(old),
+                    absolute(new),
+                    table.getSelected(index).isoformat(),
+                    ",".join(methods),
+                    ",".join(sorted(times)),
+                    json.dumps(times),
+                    size,
+                    None if digest is None else algorithm,
+                    digest,
+                )
+            )
+            if len(rows) >= self.BATCH_SIZE:
+                self.__write(rows)
+        self.__write(rows)
+        logger.debug(f"Cataloged {len(completed)} files in {self.__filename}")
+        return len(completed)
+
+    def __write(self, rows: list):
+        ## Insert and commit a batch of rows in one transaction, the list is emptied
+        with self.__db:
+            self.__db.executemany(
+                "INSERT INTO files (run, source, target, taken, methods, found, times, size, hashAlgorithm, hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        rows.clear()
+
+    def query(self, taken: str = None, imported: str = None, only: str = None, digest: str = None, timeOf: str = None):
+        ## Yield the file rows as dicts matching all given filters, in order of the selected time.
+        # taken: prefix of the selected time, e.g. 2024, 2024-07 or 2024-07-13.
+        # imported: prefix of the start of the run which processed the file.
+        # only: the file had times from this method only, e.g. filename.
+        # digest: content hash (hex).
+        # timeOf: prefix of any candidate time of the file, not only the selected one.
+        conditions = list()
+        parameters = list()
+        if taken is not None:
+            conditions.append("f.taken >= ? AND f.taken < ?")
+            parameters.extend(prefixRange(taken))
+        if imported is not None:
+            conditions.append("r.started >= ? AND r.started < ?")
+            parameters.extend(prefixRange(imported))
+        if only is not None:
+            conditions.append("f.found = ?")
+            parameters.append(only)
+        if digest is not None:
+            conditions.append("f.hash = ?")
+            # with or without the algorithm prefix of plan files
+            parameters.append(digest.split(":")[-1].lower())
+        if timeOf is not None:
+            conditions.append("EXISTS (SELECT 1 FROM json_each(f.times) WHERE value >= ? AND value < ?)")
+            parameters.extend(prefixRange(timeOf))
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        cursor = self.__db.execute(
+            "SELECT f.source, f.target, f.taken, f.methods, f.found, f.times, f.size, f.hash, r.action, r.started "
+            f"FROM files f JOIN runs r ON r.id = f.run{where} ORDER BY f.taken, f.id",
+            parameters,
+        )
+        names = [column[0] for column in cursor.description]
+        for row in cursor:
+            record = dict(zip(names, row))
+            record["times"] = json.loads(record["times"])
+            yield record
+
+    def close(self):
+        self.__db.commit()
+        self.__db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def prefixRange(prefix: str) -> tuple:
+    ## [low, high) of all ISO times starting with prefix, e.g. a day 2024-07-13
+    # "~" sorts after every character of an ISO time
+    return (prefix, prefix + "~")
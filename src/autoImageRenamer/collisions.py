@@ -0,0 +1,118 @@
+import os
+from loguru import logger
+
+from .hashing import findContentDuplicates
+
+
+class CollisionResolver:
+    """ Makes the proposed targets of a batch unique, in time linear in the number of files.
+
+    Files proposing the same target all get a counter suffix (_001, _002, ...), files with the
+    content of another one of them are marked DUPLICATE_. A claimed-name index per target folder
+    holds all proposals and the files already present in the folder, except the sources of the
+    batch themselves, so no new name ever clashes with either. A source with the content of the
+    file already holding its target keeps the target, overwriting an identical file.
+    """
+
+    def __init__(self, hashAlgorithm: str = "md5", logDebug=logger.debug):
+        self.__hashAlgorithm = hashAlgorithm
+        self.__logDebug = logDebug
+        # target folder -> normcase names in use
+        self.__claimed = dict()
+        # target folder -> normcase names of files present before the batch, excluding its sources
+        self.__existing = dict()
+        # (target folder, normcase base name) -> last counter used
+        self.__counters = dict()
+
+    def resolve(self, nFiles: int, getSource, getTargetParts, hashes: dict, rank=None):
+        ## Yield (index, new target) for every file whose proposal has to change.
+        # getSource(index) returns the source path, getTargetParts(index) the (folder, name) of the proposal.
+        # Content hashes computed on the way are added to hashes. Files proposing the same target are
+        # numbered in index order, or by the key rank(index) if given. Of equal content, the first is kept.
+        first = dict()
+        groups = dict()
+        for index in range(nFiles) if rank is None else sorted(range(nFiles), key=rank):
+            (folder, name) = getTargetParts(index)
+            key = (folder, os.path.normcase(name))
+            firstIndex = first.setdefault(key, index)
+            if firstIndex != index:
+                groups.setdefault(key, [firstIndex]).append(index)
+            self.__claimed.setdefault(folder, set()).add(key[1])
+
+        self.__indexExisting(nFiles, getSource)
+
+        for key, firstIndex in first.items():
+            members = groups.get(key)
+            existing = key[1] in self.__existing[key[0]]
+            if members is None and not existing:
+                continue
+            yield from self.__resolveGroup(key[0], getTargetParts(firstIndex)[1], members or [firstIndex], existing, getSource, hashes)
+
+    def __indexExisting(self, nFiles: int, getSource):
+        # files in the target folders which are not part of the batch
+        sources = dict()
+        for index in range(nFiles):
+            (folder, name) = os.path.split(getSource(index))
+            if folder in self.__claimed:
+                sources.setdefault(folder, set()).add(os.path.normcase(name))
+        for folder in self.__claimed:
+            if folder in self.__existing:
+                continue
+            try:
+                names = {os.path.normcase(name) for name in os.listdir(folder)} if folder else set()
+            except OSError:
+                names = set()
+            self.__existing[folder] = names - sources.get(folder, set())
+            self.__claimed[folder] |= self.__existing[folder]
+
+    def __resolveGroup(self, folder: str, name: str, members: list, existing: bool, getSource, hashes: dict):
+        target = os.path.join(folder, name)
+        sources = [getSource(index) for index in members]
+        candidates = sources + [target] if existing else sources
+
+        # find duplicate content within the group and with the file already holding the name
+        duplicates = set()
+        keeper = None
+        for sameContent in findContentDuplicates(candidates, self.__hashAlgorithm, hashes):
+            if existing and target in sameContent:
+                keeper = sameContent[0] if sameContent[0] != target else sameContent[1]
+                duplicates.update(s for s in sameContent if s != target and s != keeper)
+            else:
+                duplicates.update(sameContent[1:])
+
+        for index, source in zip(members, sources):
+            if source == keeper:
+                self.__logDebug("{file} has the content of {target}", event="duplicate", file=source, target=target)
+                continue
+            if source in duplicates:
+                newTarget = self.claim(folder, f"DUPLICATE_{os.path.basename(source)}")
+                self.__logDebug("Removing {file} due to content duplicate", event="duplicate", file=source, target=newTarget)
+            else:
+                newTarget = self.claimCounter(folder, name)
+                self.__logDebug(
+                    "Add duplicate-counter for oldFilename={file} to new={target}", event="collision", file=source, target=newTarget
+                )
+            yield (index, newTarget)
+
+    def claim(self, folder: str, name: str) -> str:
+        ## Claim name in folder, or the next free counter name if it is in use
+        claimed = self.__claimed.setdefault(folder, set())
+        if os.path.normcase(name) not in claimed:
+            claimed.add(os.path.normcase(name))
+            return os.path.join(folder, name)
+        return self.claimCounter(folder, name)
+
+    def claimCounter(self, folder: str, name: str) -> str:
+        ## Claim the next free name with counter suffix, the counter continues where the last call stopped
+        claimed = self.__claimed.setdefault(folder, set())
+        (base, ext) = os.path.splitext(name)
+        key = (folder, os.path.normcase(name))
+        counter = self.__counters.get(key, 0)
+        while True:
+            counter += 1
+            candidate = base + "_" + str(counter).zfill(3) + ext
+            if os.path.normcase(candidate) not in claimed:
+                break
+        self.__counters[key] = counter
+        claimed.add(os.path.normcase(candidate))
+        return os.path.join(folder, candidate)
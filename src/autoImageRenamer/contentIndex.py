@@ -0,0 +1,261 @@
+import os
+import sqlite3
+from enum import Enum
+from loguru import logger
+
+from .autoImageRenamer import AutoImageRenamer
+from .hashing import getFileHash
+
+INDEX_FILENAME = ".autoImageRenamer-index.sqlite"
+
+
+class DedupMode(Enum):
+    skip = 1
+    link = 2
+    mark = 3
+
+
+class ContentIndex:
+    """ Persistent index of the files in an output library by size and content hash.
+
+    Hashes are computed lazily: only when an incoming file has the size of an indexed file, both are
+    hashed and the hash of the indexed file is stored for later runs. An entry is rehashed if size or
+    mtime of its file have changed. Paths are stored relative to the library root, so the library
+    may be moved. Files about to be written by an action are added as pending entries and get their
+    mtime on commit, a dryrun rolls them back.
+    """
+
+    # Increment whenever the meaning of the stored entries changes
+    __SCHEMA_VERSION = 1
+
+    def __init__(self, root: str, mode: DedupMode = DedupMode.skip, hashAlgorithm: str = "md5", filename: str = None, rebuild: bool = False):
+        self.__root = os.path.abspath(root)
+        self.__mode = mode
+        self.__hashAlgorithm = hashAlgorithm
+        self.__filename = filename or os.path.join(self.__root, INDEX_FILENAME)
+        # relative path of a pending entry -> source path with the same content
+        self.__pending = dict()
+
+        os.makedirs(os.path.dirname(self.__filename), exist_ok=True)
+        self.__db = sqlite3.connect(self.__filename)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+
+        version = self.__db.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.__SCHEMA_VERSION:
+            self.__db.execute("DROP TABLE IF EXISTS files")
+            self.__db.execute(f"PRAGMA user_version={self.__SCHEMA_VERSION}")
+        self.__db.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER,
+                hash TEXT
+            )"""
+        )
+        self.__db.execute("CREATE INDEX IF NOT EXISTS files_size ON files(size)")
+        self.__db.commit()
+
+        if rebuild or version != self.__SCHEMA_VERSION:
+            logger.info(f"Building content index of {self.__root}")
+            self.reindex()
+
+    def getMode(self) -> DedupMode:
+        return self.__mode
+
+    def __relative(self, path: str) -> str:
+        ## Path relative to the root, None if path is outside of the library
+        relative = os.path.relpath(os.path.abspath(path), self.__root)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        return relative
+
+    def __isIndexFile(self, path: str) -> bool:
+        return os.path.abspath(path).startswith(os.path.abspath(self.__filename))
+
+    def __hash(self, filename: str) -> str:
+        return f"{self.__hashAlgorithm}:{getFileHash(filename, self.__hashAlgorithm)}"
+
+    def reindex(self) -> int:
+        ## Rebuild the index from the files in the library. Hashes of unchanged files are kept
+        known = {row[0]: row[1:] for row in self.__db.execute("SELECT path, size, mtime_ns, hash FROM files")}
+        rows = list()
+        for folder, folders, files in os.walk(self.__root):
+            folders[:] = [f for f in folders if not f.startswith(".")]
+            for name in files:
+                path = os.path.join(folder, name)
+                if self.__isIndexFile(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                relative = self.__relative(path)
+                previous = known.get(relative)
+                digest = previous[2] if previous is not None and previous[0:2] == (stat.st_size, stat.st_mtime_ns) else None
+                rows.append((relative, stat.st_size, stat.st_mtime_ns, digest))
+
+        self.__db.execute("DELETE FROM files")
+        self.__db.executemany("INSERT INTO files VALUES (?, ?, ?, ?)", rows)
+        self.__db.commit()
+        self.__pending.clear()
+        logger.info(f"Content index of {self.__root} has {len(rows)} files")
+        return len(rows)
+
+    def __getIndexedHash(self, relative: str, size: int, mtime: int, digest: str) -> str:
+        ## Hash of an indexed file, computed and stored if unknown or outdated. None if the file is gone or changed size
+        prefix = f"{self.__hashAlgorithm}:"
+        path = os.path.join(self.__root, relative)
+        if relative in self.__pending:
+            # being written right now, read the source instead
+            if digest is None or not digest.startswith(prefix):
+                source = self.__pending[relative]
+                digest = self.__hash(source if os.path.exists(source) else path)
+                self.__db.execute("UPDATE files SET hash=? WHERE path=?", (digest, relative))
+            return digest
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.__db.execute("DELETE FROM files WHERE path=?", (relative,))
+            return None
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+            self.__db.execute(
+                "UPDATE files SET size=?, mtime_ns=?, hash=NULL WHERE path=?", (stat.st_size, stat.st_mtime_ns, relative)
+            )
+            if stat.st_size != size:
+                return None
+            digest = None
+        if digest is None or not digest.startswith(prefix):
+            digest = self.__hash(path)
+            self.__db.execute("UPDATE files SET hash=? WHERE path=?", (digest, relative))
+        return digest
+
+    def find(self, source: str, size: int, ignore: set = frozenset()):
+        ## Return (path of a library file with the content of source or None, hash of source or None).
+        # Source is only hashed if a library file has the same size. Library files with a relative path
+        # in ignore are not considered, e.g. sources not acted on yet.
+        rows = self.__db.execute("SELECT path, mtime_ns, hash FROM files WHERE size=?", (size,)).fetchall()
+        sourceRelative = self.__relative(source)
+        rows = [row for row in rows if row[0] != sourceRelative and row[0] not in ignore]
+        if not rows:
+            return (None, None)
+
+        sourceHash = self.__hash(source)
+        for relative, mtime, digest in rows:
+            if self.__getIndexedHash(relative, size, mtime, digest) == sourceHash:
+                return (os.path.join(self.__root, relative), sourceHash)
+        return (None, sourceHash)
+
+    def add(self, path: str, source: str, size: int, digest: str = None):
+        ## Add a file about to be written with the content of source, it is completed by commit
+        relative = self.__relative(path)
+        if relative is None:
+            return
+        self.__db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, NULL, ?)", (relative, size, digest))
+        self.__pending[relative] = source
+
+    def remove(self, path: str):
+        relative = self.__relative(path)
+        if relative is not None:
+            self.__db.execute("DELETE FROM files WHERE path=?", (relative,))
+
+    def commit(self):
+        ## Store the mtime of all files written since the last commit, drop those which have not been written
+        for relative in self.__pending:
+            try:
+                stat = os.stat(os.path.join(self.__root, relative))
+            except OSError:
+                self.__db.execute("DELETE FROM files WHERE path=?", (relative,))
+                continue
+            self.__db.execute(
+                "UPDATE files SET size=?, mtime_ns=? WHERE path=?", (stat.st_size, stat.st_mtime_ns, relative)
+            )
+        self.__pending.clear()
+        self.__db.commit()
+
+    def rollback(self):
+        self.__pending.clear()
+        self.__db.rollback()
+
+    def filterActions(self, items, action):
+        ## Yield the (old, new, methods) items which still have to be renamed/copied, see DedupMode.
+        # Linking is done right here, duplicates marked get a DUPLICATE_ target. New targets are added to the index.
+        # duplicates by what happened to them
+        nDuplicates = {"skipped": 0, "linked": 0, "marked": 0}
+        # sources inside the library (e.g. renamed in place) are no library files until acted on
+        items = list(items)
+        unprocessed = {self.__relative(old) for old, _, _ in items} - {None}
+        for old, new, methods in items:
+            unprocessed.discard(self.__relative(old))
+            try:
+                size = os.stat(old).st_size
+            except OSError:
+                yield (old, new, methods)
+                continue
+            (existing, digest) = self.find(old, size, unprocessed)
+            if existing is None:
+                self.__moved(old, new, size, digest, action)
+                yield (old, new, methods)
+                continue
+
+            if self.__mode == DedupMode.skip:
+                nDuplicates["skipped"] += 1
+                logger.info("Skipping {file}, same content as {target}", event="skip", file=old, target=existing)
+            elif self.__mode == DedupMode.mark:
+                nDuplicates["marked"] += 1
+                new = self.__claimDuplicateName(new)
+                logger.debug("{file} has the content of {existing}", event="duplicate", file=old, existing=existing, target=new)
+                self.__moved(old, new, size, digest, action)
+                yield (old, new, methods)
+            elif self.__link(old, new, existing, action):
+                nDuplicates["linked"] += 1
+                self.__moved(old, new, size, digest, action)
+            else:
+                # acted on like any other file
+                self.__moved(old, new, size, digest, action)
+                yield (old, new, methods)
+        if any(nDuplicates.values()):
+            counts = ", ".join(f"{n} {what}" for what, n in nDuplicates.items() if n > 0)
+            logger.info(f"{sum(nDuplicates.values())} files already in the library: {counts}")
+
+    def __moved(self, old: str, new: str, size: int, digest: str, action):
+        if action == AutoImageRenamer.Action.rename:
+            self.remove(old)
+        self.add(new, old, size, digest)
+
+    def __link(self, old: str, new: str, existing: str, action) -> bool:
+        ## Hard link new to existing instead of copying old, a rename removes old afterwards. False if not possible
+        if action == AutoImageRenamer.Action.dryrun:
+            logger.info("Proposing link {file} to {target}", event="dryrun", file=old, target=new, existing=existing)
+            return True
+        try:
+            os.makedirs(os.path.dirname(new), exist_ok=True)
+            os.link(existing, new)
+        except OSError as e:
+            logger.warning(f"Linking {new} to {existing} failed ({e}), falling back to {action.name}")
+            return False
+        logger.info("Linked {target} to {existing}", event="link", file=old, target=new, existing=existing)
+        if action == AutoImageRenamer.Action.rename:
+            os.remove(old)
+        return True
+
+    def __claimDuplicateName(self, new: str) -> str:
+        (folder, name) = os.path.split(new)
+        (base, ext) = os.path.splitext(f"DUPLICATE_{name}")
+        target = os.path.join(folder, base + ext)
+        counter = 0
+        while os.path.exists(target) or self.__relative(target) in self.__pending:
+            counter += 1
+            target = os.path.join(folder, base + "_" + str(counter).zfill(3) + ext)
+        return target
+
+    def close(self):
+        self.commit()
+        self.__db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
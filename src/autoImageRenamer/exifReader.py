@@ -0,0 +1,175 @@
+import os
+import struct
+import threading
+from collections import Counter
+from loguru import logger
+
+from .metrics import metrics
+
+# Only the date tags are of interest. IFD0 holds DateTime and the pointer to the EXIF IFD
+_IFD0_TAGS = {0x0132: "Image DateTime"}
+_EXIF_TAGS = {0x9003: "EXIF DateTimeOriginal", 0x9004: "EXIF DateTimeDigitized"}
+_EXIF_IFD_POINTER = 0x8769
+_ASCII = 2
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# JPEG APP1 segments are limited to 64 KiB, TIFF based RAW files keep IFD0 and the EXIF IFD
+# close to the start. A single read of this size covers both.
+MAX_HEADER_BYTES = 128 * 1024
+
+
+class ExifHeaderError(Exception):
+    pass
+
+
+class ReadStatistics:
+    """ Counts files and bytes read per file extension, separately for the fast path and the exifread fallback """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.files = Counter()
+        self.bytes = Counter()
+
+    def add(self, key: tuple, nBytes: int, nFiles: int = 1):
+        with self.__lock:
+            self.files[key] += nFiles
+            self.bytes[key] += nBytes
+        metrics.addBytes("exif", nBytes)
+
+    def reset(self):
+        with self.__lock:
+            self.files.clear()
+            self.bytes.clear()
+
+    def log(self):
+        for (ext, path), nFiles in sorted(self.files.items()):
+            nBytes = self.bytes[(ext, path)]
+            logger.debug(
+                f"EXIF {path} read {nBytes} bytes from {nFiles} {ext} files ({nBytes // max(nFiles, 1)} bytes/file)"
+            )
+
+
+readStatistics = ReadStatistics()
+
+
+class CountingReader:
+    """ File handle wrapper counting the bytes exifread actually reads """
+
+    def __init__(self, handle, key: tuple):
+        self.__handle = handle
+        self.__key = key
+        self.__bytes = 0
+
+    def read(self, *args):
+        data = self.__handle.read(*args)
+        self.__bytes += len(data)
+        return data
+
+    def report(self):
+        readStatistics.add(self.__key, self.__bytes)
+
+    def __getattr__(self, name):
+        return getattr(self.__handle, name)
+
+
+def findTiffHeader(data: bytes) -> int:
+    ## Return the offset of the TIFF header in data, for JPEGs inside the APP1 Exif segment, for PNGs in the eXIf chunk
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return 0
+    if data[:8] == PNG_SIGNATURE:
+        return findPngExif(data)
+    if data[:2] != b"\xff\xd8":
+        raise ExifHeaderError("neither JPEG, PNG nor TIFF")
+
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ExifHeaderError(f"invalid JPEG marker at {pos}")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # fill byte
+            pos += 1
+            continue
+        if marker == 0xDA or marker == 0xD9:
+            # start of scan or end of image, no more metadata segments
+            return None
+        length = struct.unpack(">H", data[pos + 2 : pos + 4])[0]
+        if marker == 0xE1 and data[pos + 4 : pos + 10] == b"Exif\x00\x00":
+            return pos + 10
+        pos += 2 + length
+    raise ExifHeaderError("JPEG metadata segments exceed header size")
+
+
+def findPngExif(data: bytes) -> int:
+    ## Return the offset of the eXIf chunk data in a PNG, None if there is none before the image data
+    pos = 8
+    while pos + 8 <= len(data):
+        (length, chunkType) = struct.unpack(">I4s", data[pos : pos + 8])
+        if chunkType == b"eXIf":
+            return pos + 8
+        if chunkType in (b"IDAT", b"IEND"):
+            return None
+        pos += 12 + length
+    raise ExifHeaderError("PNG chunks exceed header size")
+
+
+def readIfd(data: bytes, base: int, offset: int, endian: str, wanted: dict, values: dict) -> int:
+    ## Read the wanted ASCII tags of the IFD at offset into values and return the EXIF IFD pointer if any
+    start = base + offset
+    if start + 2 > len(data):
+        raise ExifHeaderError("IFD outside of header")
+    nEntries = struct.unpack(endian + "H", data[start : start + 2])[0]
+    if start + 2 + 12 * nEntries > len(data):
+        raise ExifHeaderError("IFD entries outside of header")
+
+    exifPointer = None
+    for entry in range(nEntries):
+        pos = start + 2 + 12 * entry
+        tag, fieldType, count = struct.unpack(endian + "HHI", data[pos : pos + 8])
+        if tag == _EXIF_IFD_POINTER:
+            exifPointer = struct.unpack(endian + "I", data[pos + 8 : pos + 12])[0]
+        elif tag in wanted and fieldType == _ASCII:
+            if count <= 4:
+                valuePos = pos + 8
+            else:
+                valuePos = base + struct.unpack(endian + "I", data[pos + 8 : pos + 12])[0]
+            if valuePos + count > len(data):
+                raise ExifHeaderError(f"value of tag {tag:#06x} outside of header")
+            raw = data[valuePos : valuePos + count].split(b"\x00", 1)[0]
+            values[wanted[tag]] = raw.decode("ascii", errors="replace")
+    return exifPointer
+
+
+def readExifDates(filename: str) -> dict:
+    ## Read the EXIF date tags from a bounded prefix of a JPEG, PNG or TIFF based (e.g. ARW) file.
+    # Returns a dict of tag name to the raw date string. Raises ExifHeaderError if the file
+    # cannot be handled without parsing more than the header, the caller should fall back then.
+    with open(filename, "rb") as f:
+        data = f.read(MAX_HEADER_BYTES)
+    readStatistics.add((os.path.splitext(filename)[1].lower(), "fast path"), len(data))
+
+    base = findTiffHeader(data)
+    if base is None:
+        # valid JPEG or PNG without EXIF
+        return dict()
+    return readTiffDates(data, base)
+
+
+def readTiffDates(data: bytes, base: int = 0) -> dict:
+    ## Read the EXIF date tags of the TIFF structure starting at base in data
+    values = dict()
+    byteOrder = data[base : base + 2]
+    if byteOrder == b"II":
+        endian = "<"
+    elif byteOrder == b"MM":
+        endian = ">"
+    else:
+        raise ExifHeaderError("invalid TIFF byte order")
+    if base + 8 > len(data):
+        raise ExifHeaderError("TIFF header outside of header")
+    ifd0 = struct.unpack(endian + "I", data[base + 4 : base + 8])[0]
+
+    exifPointer = readIfd(data, base, ifd0, endian, _IFD0_TAGS, values)
+    if exifPointer is not None:
+        readIfd(data, base, exifPointer, endian, _EXIF_TAGS, values)
+    return values
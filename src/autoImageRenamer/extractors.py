@@ -0,0 +1,237 @@
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Callable, NamedTuple
+from loguru import logger
+
+from . import videoReader
+from .metrics import metrics
+
+# A date without time of day is represented by the end of that day, see dateOnly
+_DATE_ONLY_TIME = time(23, 59, 59, 999)
+
+
+def dateOnly(day: date) -> datetime:
+    ## datetime standing for a date without time of day. Any real time of the same day is older
+    return datetime.combine(day, _DATE_ONLY_TIME)
+
+
+def isDateOnly(value: datetime) -> bool:
+    return value.time() == _DATE_ONLY_TIME
+
+
+class Extractor(NamedTuple):
+    """ A source of capture times.
+
+    function(renamer, filename) returns a dict of method name to datetime (or None). It must be a module
+    level function to be usable with process workers.
+    extensions are lower case with dot, None means every file. magics are (offset, bytes) pairs
+    identifying the format by content. Extractors run in order of increasing cost. Once one of
+    the trusted methods has answered, the remaining (more expensive) extractors are skipped.
+    produces are the method names function may return, None if not declared. The trusted methods
+    must be among them.
+    """
+
+    name: str
+    function: Callable
+    extensions: frozenset = None
+    magics: tuple = ()
+    cost: int = 10
+    trusted: frozenset = frozenset()
+    produces: frozenset = None
+
+
+def extractFilename(renamer, filename: str) -> dict:
+    return {"filename": renamer.getFilenameTime(filename)}
+
+
+def extractExif(renamer, filename: str) -> dict:
+    return renamer.getExifTimes(filename)
+
+
+def extractHachoir(renamer, filename: str) -> dict:
+    return {"mov": renamer.getFileHachoir(filename)}
+
+
+def extractMovie(renamer, filename: str) -> dict:
+    ## Creation date from moov/mvhd, the Apple creationdate key only if mvhd has none. hachoir is the fallback
+    try:
+        dates = videoReader.readMovieDates(filename)
+        found = dates["mvhd"] or dates["creationdate"]
+    except Exception as e:
+        logger.debug("Box walk of {file} failed ({error}), falling back to hachoir", file=filename, error=e)
+        found = None
+    if found is None:
+        return extractHachoir(renamer, filename)
+    return {"mov": found}
+
+
+class ResolutionPolicy:
+    """ Decides how long the extractors of a file run and which of the times found is selected.
+
+    oldest: run all extractors, select the oldest time.
+    trusted: run the extractors in order of increasing cost until a trusted method has answered, select the oldest time.
+    first: run the extractors in order of increasing cost until n of them found a full datetime, select the oldest time.
+    priority: run the extractors in registration order until one found a full datetime, select its time.
+    A date without time of day (see dateOnly) never ends the search and loses against a datetime of the same day.
+    """
+
+    class Mode(Enum):
+        oldest = 1
+        trusted = 2
+        first = 3
+        priority = 4
+
+    def __init__(self, mode=Mode.trusted, n: int = 1):
+        self.mode = mode
+        self.n = n
+
+    @classmethod
+    def parse(cls, text: str):
+        ## Policy from its name, first may be followed by the number of extractors, e.g. first:2
+        (name, _, n) = text.partition(":")
+        return cls(cls.Mode[name], int(n) if n else 1)
+
+    def isResolved(self, extractor: Extractor, results: dict) -> bool:
+        ## Whether the extractors after extractor can be skipped, given the results so far {extractor name: times}
+        if self.mode == self.Mode.trusted:
+            return any(method in results[extractor.name] for method in extractor.trusted)
+        if self.mode == self.Mode.first:
+            nFull = sum(1 for times in results.values() if any(not isDateOnly(v) for v in times.values()))
+            return nFull >= self.n
+        if self.mode == self.Mode.priority:
+            return any(not isDateOnly(v) for v in results[extractor.name].values())
+        return False
+
+    def select(self, times: dict):
+        ## Return the selected time and the methods which found it. times are in registration order
+        if self.mode == self.Mode.priority:
+            for value in times.values():
+                if not isDateOnly(value):
+                    return (value, [method for method in times if times[method] == value])
+
+        # a date stands for its whole day: it is only selected without a datetime of that day or before,
+        # and it confirms a datetime of its day
+        oldest = min(times.values(), key=lambda v: (v.date(), isDateOnly(v), v))
+        methods = [
+            method for method, value in times.items()
+            if value == oldest or (isDateOnly(value) and value.date() == oldest.date())
+        ]
+        return (oldest, methods)
+
+
+defaultPolicy = ResolutionPolicy()
+
+
+class ExtractorRegistry:
+    """ Routes files to extractors by extension and, if those find nothing, by magic bytes """
+
+    def __init__(self, extractors: list = ()):
+        self.__extractors = list()
+        for extractor in extractors:
+            self.register(extractor)
+
+    def register(self, extractor: Extractor):
+        ## Add an extractor, replacing one with the same name
+        if extractor.produces is not None and not extractor.trusted <= extractor.produces:
+            raise ValueError(
+                f"Extractor {extractor.name} trusts {sorted(extractor.trusted - extractor.produces)}, which it does not produce"
+            )
+        self.__extractors = [e for e in self.__extractors if e.name != extractor.name]
+        self.__extractors.append(extractor)
+        self.__update()
+
+    def unregister(self, name: str):
+        self.__extractors = [e for e in self.__extractors if e.name != name]
+        self.__update()
+
+    def __update(self):
+        # registration order decides the order of the methods in the result
+        self.__priority = {e.name: index for index, e in enumerate(self.__extractors)}
+        self.__universal = {e.name for e in self.__extractors if e.extensions is None}
+        self.__byCost = sorted(self.__extractors, key=lambda e: e.cost)
+        self.__byExtension = dict()
+        self.__magicBytes = max((offset + len(magic) for e in self.__extractors for offset, magic in e.magics), default=0)
+
+    def getNames(self) -> list:
+        return [e.name for e in self.__extractors]
+
+    def getMethods(self) -> list:
+        ## Method names the extractors declare to produce, in registration order
+        return [method for e in self.__extractors for method in sorted(e.produces or ())]
+
+    def getExtensions(self) -> list:
+        ## All extensions with at least one extractor specific to them
+        return sorted({ext for e in self.__extractors if e.extensions is not None for ext in e.extensions})
+
+    def select(self, fileExt: str, byPriority: bool = False) -> list:
+        ## Extractors for fileExt in order of increasing cost, or in registration order byPriority
+        key = (fileExt.lower(), byPriority)
+        selected = self.__byExtension.get(key)
+        if selected is None:
+            ordered = self.__extractors if byPriority else self.__byCost
+            selected = [e for e in ordered if e.extensions is None or key[0] in e.extensions]
+            self.__byExtension[key] = selected
+        return selected
+
+    def selectByMagic(self, filename: str) -> list:
+        ## Extractors recognizing the first bytes of filename in order of increasing cost
+        if self.__magicBytes == 0:
+            return list()
+        try:
+            with open(filename, "rb") as f:
+                header = f.read(self.__magicBytes)
+        except OSError:
+            return list()
+        return [
+            e for e in self.__byCost
+            if any(header[offset : offset + len(magic)] == magic for offset, magic in e.magics)
+        ]
+
+    def extract(self, renamer, filename: str, fileExt: str, policy: ResolutionPolicy = defaultPolicy) -> dict:
+        ## Run the extractors for filename until policy is satisfied and return all times found, None values removed
+        results = dict()
+        resolved = self.__run(self.select(fileExt, policy.mode == policy.Mode.priority), renamer, filename, results, policy)
+
+        # content not matching the extension: try the extractors recognizing its magic bytes
+        if not resolved and not any(results[name] for name in results if name not in self.__universal):
+            byMagic = [e for e in self.selectByMagic(filename) if e.name not in results]
+            if byMagic:
+                logger.debug("Trying {extractors} on {file} by content", extractors=[e.name for e in byMagic], file=filename)
+                self.__run(byMagic, renamer, filename, results, policy)
+
+        times = dict()
+        for name in sorted(results, key=self.__priority.get):
+            times.update(results[name])
+        return times
+
+    def __run(self, extractors: list, renamer, filename: str, results: dict, policy: ResolutionPolicy) -> bool:
+        ## Run extractors in order and add their times to results, return whether policy is satisfied
+        for position, extractor in enumerate(extractors):
+            try:
+                found = extractor.function(renamer, filename)
+            except Exception:
+                found = dict()
+            results[extractor.name] = {k: v for k, v in found.items() if v is not None}
+            if policy.isResolved(extractor, results):
+                # good enough, the remaining extractors cannot change the selection under this policy
+                for skipped in extractors[position + 1 :]:
+                    metrics.addSkipped(skipped.name)
+                return True
+        return False
+
+
+_JPEG = ((0, b"\xff\xd8\xff"),)
+_TIFF = ((0, b"II*\x00"), (0, b"MM\x00*"))
+_PNG = ((0, b"\x89PNG\r\n\x1a\n"),)
+_ISO_BMFF = ((4, b"ftyp"), (4, b"moov"), (4, b"mdat"), (4, b"wide"))
+
+defaultRegistry = ExtractorRegistry(
+    [
+        Extractor(
+            "exif", extractExif, frozenset([".jpg", ".jpeg", ".png", ".arw"]), _JPEG + _TIFF + _PNG, 10, frozenset(["EXIF DateTimeOriginal"]),
+            frozenset(["EXIF DateTimeOriginal", "EXIF DateTimeDigitized", "Image DateTime"]),
+        ),
+        Extractor("movie", extractMovie, frozenset([".mov", ".mp4"]), _ISO_BMFF, 20, frozenset(["mov"]), frozenset(["mov"])),
+        Extractor("filename", extractFilename, None, (), 1, produces=frozenset(["filename"])),
+    ]
+)
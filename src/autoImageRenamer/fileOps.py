@@ -0,0 +1,193 @@
+import os
+import time
+import errno
+import shutil
+import threading
+from enum import Enum
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from loguru import logger
+
+# errors of copy_file_range/sendfile telling that the kernel or filesystem does not support them
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+_CHUNK = 64 * 1024 * 1024
+# errors of link/FICLONE telling that source and target cannot share their data, a copy is needed then
+_NOT_SHAREABLE = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EBADF, errno.ENOSYS}
+# ioctl request of Linux to share the extents of a file with another (btrfs, XFS, ...), _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+class FsyncPolicy(Enum):
+    none = 1
+    file = 2
+    end = 3
+
+
+def copyRange(fdIn: int, fdOut: int, size: int) -> bool:
+    ## Copy with os.copy_file_range (in-kernel, server side on NFS 4.2/SMB3), fall back to os.sendfile.
+    # Returns False if neither is supported for these files and nothing has been written.
+    copied = 0
+    for name in ["copy_file_range", "sendfile"]:
+        function = getattr(os, name, None)
+        if function is None:
+            continue
+        try:
+            while copied < size:
+                if name == "copy_file_range":
+                    n = function(fdIn, fdOut, min(_CHUNK, size - copied))
+                else:
+                    n = function(fdOut, fdIn, copied, min(_CHUNK, size - copied))
+                if n == 0:
+                    break
+                copied += n
+            return copied == size
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED or copied > 0:
+                raise
+    return False
+
+
+def copyFile(src: str, dst: str, fsync: bool = False) -> int:
+    ## Copy the content of src to dst (like shutil.copyfile) with zero-copy system calls where available.
+    # Returns the number of bytes copied.
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        if not copyRange(fsrc.fileno(), fdst.fileno(), size):
+            fsrc.seek(0)
+            fdst.seek(0)
+            fdst.truncate()
+            shutil.copyfileobj(fsrc, fdst)
+        if fsync:
+            fdst.flush()
+            os.fsync(fdst.fileno())
+    return size
+
+
+def replaceShared(share, src: str, dst: str) -> bool:
+    ## Share src under a temporary name next to the existing dst and move it over dst, like a copy overwriting it.
+    # share is linkFile or reflinkFile, returns its result
+    temporary = f"{dst}.{os.getpid()}-{threading.get_ident()}.tmp"
+    if os.path.lexists(temporary):
+        # left over by an interrupted run
+        os.remove(temporary)
+    if not share(src, temporary):
+        return False
+    try:
+        os.replace(temporary, dst)
+    except OSError:
+        os.remove(temporary)
+        raise
+    return True
+
+
+def linkFile(src: str, dst: str) -> bool:
+    ## Hard link dst to src. Returns False if the filesystem cannot do it (e.g. across devices) and nothing has been created.
+    # An existing dst is replaced, unless it already is a link to src
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        if os.path.samefile(src, dst):
+            return True
+        return replaceShared(linkFile, src, dst)
+    except OSError as e:
+        if e.errno not in _NOT_SHAREABLE:
+            raise
+        return False
+    return True
+
+
+def reflinkFile(src: str, dst: str) -> bool:
+    ## Create dst sharing the data blocks of src (copy on write) with the FICLONE ioctl.
+    # Returns False if not supported by platform or filesystem, or across devices, dst is unchanged then.
+    # An existing dst is replaced, unless it is src itself
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fsrc:
+        try:
+            fdst = open(dst, "xb")
+        except FileExistsError:
+            if os.path.samefile(src, dst):
+                return True
+            return replaceShared(reflinkFile, src, dst)
+        try:
+            with fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError as e:
+            os.remove(dst)
+            if e.errno not in _NOT_SHAREABLE:
+                raise
+            return False
+    return True
+
+
+def fsyncPath(path: str):
+    ## fsync a file or directory, directories are not supported on all platforms
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError as e:
+        logger.debug(f"Cannot open {path} for fsync: {e}")
+        return
+    try:
+        os.fsync(fd)
+    except OSError as e:
+        logger.debug(f"fsync of {path} failed: {e}")
+    finally:
+        os.close(fd)
+
+
+def runBounded(function, items, jobs: int):
+    ## Call function(*item) for all items on jobs threads with at most 2 * jobs items in flight.
+    # The first exception is raised after the running calls have finished, remaining items are not started.
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        pending = set()
+        for item in items:
+            if len(pending) >= 2 * jobs:
+                (done, pending) = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+            pending.add(pool.submit(function, *item))
+        for future in wait(pending)[0]:
+            future.result()
+
+
+class FolderCache:
+    """ Creates the target folders of a run, each one only once, thread safe """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__made = set()
+
+    def make(self, folder: str):
+        if folder in self.__made:
+            return
+        os.makedirs(folder, exist_ok=True)
+        with self.__lock:
+            self.__made.add(folder)
+
+    def makeAll(self, folders):
+        ## Create all folders up front, parents before their subfolders
+        for folder in sorted(set(folders)):
+            self.make(folder)
+
+
+class TransferStatistics:
+    """ Aggregated files and bytes of an action, thread safe """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__start = time.perf_counter()
+        self.files = 0
+        self.bytes = 0
+
+    def add(self, nBytes: int):
+        with self.__lock:
+            self.files += 1
+            self.bytes += nBytes
+
+    def report(self, actionName: str):
+        seconds = max(time.perf_counter() - self.__start, 1e-9)
+        logger.info(
+            f"{actionName}: {self.files} files, {self.bytes / 1e6:.1f} MB in {seconds:.2f} s "
+            f"({self.files / seconds:.1f} files/s, {self.bytes / 1e6 / seconds:.1f} MB/s)"
+        )
@@ -0,0 +1,163 @@
+import os
+from array import array
+from datetime import datetime, timedelta
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def toEpochMicroseconds(value: datetime) -> int:
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def fromEpochMicroseconds(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=value)
+
+
+class FileTable:
+    """ Compact column store of the files of a run and their proposed targets.
+
+    Folders are interned and referenced by index, only base names are kept per file. Times are
+    int64 microseconds since 1970 and method sets are bit flags, one bit per method name.
+    Records are addressed by their index in insertion order.
+    """
+
+    def __init__(self):
+        self.__folders = list()
+        self.__folderIndex = dict()
+        self.__methods = list()
+        self.__methodIndex = dict()
+
+        self.__sourceFolders = array("I")
+        self.__sourceNames = list()
+        self.__targetFolders = array("I")
+        self.__targetNames = list()
+        # bits of all methods with a time, times of these methods in bit order starting at timeStart
+        self.__methodBits = array("Q")
+        self.__timeStart = array("Q", [0])
+        self.__times = array("q")
+        # bits of the methods which found the selected (oldest) time, and the selected time itself
+        self.__fromBits = array("Q")
+        self.__selected = array("q")
+        # index of the input source of each record, see sources.Source
+        self.__sourceIds = array("H")
+        # content hashes computed for collision handling, record index -> digest
+        self.__hashes = dict()
+        # (source folder, source name) -> record index, only built on demand
+        self.__lookup = None
+
+    def __len__(self) -> int:
+        return len(self.__sourceNames)
+
+    def __internFolder(self, folder: str) -> int:
+        index = self.__folderIndex.get(folder)
+        if index is None:
+            index = len(self.__folders)
+            self.__folders.append(folder)
+            self.__folderIndex[folder] = index
+        return index
+
+    def __methodBit(self, method: str) -> int:
+        bit = self.__methodIndex.get(method)
+        if bit is None:
+            bit = len(self.__methods)
+            if bit >= 64:
+                raise ValueError("FileTable supports at most 64 different methods")
+            self.__methods.append(method)
+            self.__methodIndex[method] = bit
+        return bit
+
+    def __bitsToMethods(self, bits: int) -> list:
+        return [method for bit, method in enumerate(self.__methods) if bits >> bit & 1]
+
+    def add(self, source: str, target: str, times: dict, fromMethods: list, sourceId: int = 0, selected: datetime = None) -> int:
+        ## Append a file with its extracted times and return the record index.
+        # selected is the time the target is named after, by default the oldest time of fromMethods
+        (folder, name) = os.path.split(source)
+        index = len(self.__sourceNames)
+        self.__sourceFolders.append(self.__internFolder(folder))
+        self.__sourceNames.append(name)
+        (folder, name) = os.path.split(target)
+        self.__targetFolders.append(self.__internFolder(folder))
+        self.__targetNames.append(name)
+
+        bitTimes = sorted((self.__methodBit(method), value) for method, value in times.items())
+        bits = 0
+        for bit, value in bitTimes:
+            bits |= 1 << bit
+            self.__times.append(toEpochMicroseconds(value))
+        self.__methodBits.append(bits)
+        self.__timeStart.append(len(self.__times))
+
+        fromBits = 0
+        for method in fromMethods:
+            fromBits |= 1 << self.__methodBit(method)
+        self.__fromBits.append(fromBits)
+        if selected is None:
+            selected = min(times[method] for method in fromMethods)
+        self.__selected.append(toEpochMicroseconds(selected))
+        self.__sourceIds.append(sourceId)
+
+        if self.__lookup is not None:
+            self.__lookup[(self.__sourceFolders[index], self.__sourceNames[index])] = index
+        return index
+
+    def find(self, source: str) -> int:
+        ## Record index of source, None if unknown
+        if self.__lookup is None:
+            self.__lookup = {key: index for index, key in enumerate(zip(self.__sourceFolders, self.__sourceNames))}
+        (folder, name) = os.path.split(source)
+        folderIndex = self.__folderIndex.get(folder)
+        return self.__lookup.get((folderIndex, name))
+
+    def getSource(self, index: int) -> str:
+        return os.path.join(self.__folders[self.__sourceFolders[index]], self.__sourceNames[index])
+
+    def getTarget(self, index: int) -> str:
+        return os.path.join(self.__folders[self.__targetFolders[index]], self.__targetNames[index])
+
+    def getTargetKey(self, index: int) -> tuple:
+        ## Comparable key of the target, equal keys mean equal target paths
+        return (self.__targetFolders[index], self.__targetNames[index])
+
+    def getTargetParts(self, index: int) -> tuple:
+        ## (folder, name) of the target
+        return (self.__folders[self.__targetFolders[index]], self.__targetNames[index])
+
+    def getTargetFolders(self) -> set:
+        ## Distinct folders of all targets
+        return {self.__folders[index] for index in set(self.__targetFolders)}
+
+    def setTarget(self, index: int, target: str):
+        (folder, name) = os.path.split(target)
+        self.__targetFolders[index] = self.__internFolder(folder)
+        self.__targetNames[index] = name
+
+    def getSourceId(self, index: int) -> int:
+        return self.__sourceIds[index]
+
+    def getFromMethods(self, index: int) -> list:
+        return self.__bitsToMethods(self.__fromBits[index])
+
+    def getSelected(self, index: int) -> datetime:
+        return fromEpochMicroseconds(self.__selected[index])
+
+    def getTimes(self, index: int) -> dict:
+        methods = self.__bitsToMethods(self.__methodBits[index])
+        values = self.__times[self.__timeStart[index] : self.__timeStart[index + 1]]
+        return {method: fromEpochMicroseconds(value) for method, value in zip(methods, values)}
+
+    def setHash(self, index: int, digest: str):
+        self.__hashes[index] = bytes.fromhex(digest)
+
+    def getHash(self, index: int) -> str:
+        digest = self.__hashes.get(index)
+        return None if digest is None else digest.hex()
+
+    def getHashes(self) -> dict:
+        return {self.getSource(index): digest.hex() for index, digest in self.__hashes.items()}
+
+    def items(self):
+        ## Yield (source, target, fromMethods) of all records
+        for index in range(len(self)):
+            yield (self.getSource(index), self.getTarget(index), self.getFromMethods(index))
@@ -0,0 +1,82 @@
+import os
+from fnmatch import fnmatch
+from loguru import logger
+
+
+class WalkEntry:
+    """ A file found by walkFiles. The stat result of the directory scan is kept to avoid a second stat call """
+
+    __slots__ = ("path", "relDir", "name", "stem", "ext", "entry")
+
+    def __init__(self, path: str, relDir: str, entry: os.DirEntry):
+        self.path = path
+        self.relDir = relDir
+        self.name = entry.name
+        (self.stem, self.ext) = os.path.splitext(entry.name)
+        self.entry = entry
+
+    def stat(self) -> os.stat_result:
+        return self.entry.stat(follow_symlinks=True)
+
+
+def matchesAny(relPath: str, name: str, patterns: list) -> bool:
+    return any(fnmatch(relPath, p) or fnmatch(name, p) for p in patterns)
+
+
+def walkFiles(
+    folder: str,
+    extensions: list,
+    maxDepth: int = 0,
+    include: list = None,
+    exclude: list = None,
+    skipFolders: list = None,
+):
+    ## Stream all files below folder with one of the given (lower case) extensions.
+    # Directories are visited depth first, files and subdirectories each sorted by name, so the
+    # order is deterministic. Only a single directory listing is held in memory at a time.
+    # maxDepth 0 only lists folder itself, None does not limit the depth.
+    # include/exclude are glob patterns matched against the relative path and the file name,
+    # exclude patterns also prune directories. skipFolders are never entered (e.g. the output folder).
+    include = include or list()
+    exclude = exclude or list()
+    skipFolders = {os.path.normcase(os.path.abspath(f)) for f in (skipFolders or list())}
+
+    # stack of (directory, relative directory, depth), popped from the end
+    pending = [(folder, "", 0)]
+    while pending:
+        (directory, relDir, depth) = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            if depth == 0:
+                raise
+            logger.warning(f"Cannot list {directory}: {e}")
+            continue
+
+        subdirs = list()
+        for entry in entries:
+            relPath = os.path.join(relDir, entry.name)
+            if exclude and matchesAny(relPath, entry.name, exclude):
+                continue
+
+            if entry.is_dir(follow_symlinks=False):
+                if maxDepth is not None and depth >= maxDepth:
+                    continue
+                if os.path.normcase(os.path.abspath(entry.path)) in skipFolders:
+                    logger.debug(f"Not descending into {entry.path}")
+                    continue
+                subdirs.append((os.path.normpath(entry.path), relPath, depth + 1))
+                continue
+
+            if os.path.splitext(entry.name)[1].lower() not in extensions:
+                continue
+            if include and not matchesAny(relPath, entry.name, include):
+                continue
+            if not entry.is_file():
+                continue
+
+            yield WalkEntry(os.path.normpath(entry.path), relDir, entry)
+
+        # reversed so that the alphabetically first directory is popped first
+        pending.extend(reversed(subdirs))
@@ -0,0 +1,133 @@
+import re
+import json
+import hashlib
+from datetime import date, datetime
+from typing import NamedTuple
+from loguru import logger
+
+
+class FilenameTime(NamedTuple):
+    date: date
+    datetime: datetime
+
+
+# Generic pattern: first try a date followed by a time anywhere in the name, only then a date alone.
+# Both alternatives are part of one expression, so a name is matched only once.
+_DATE = r"(\d{4})[-_ ]?(\d{2})[-_ ]?(\d{2})"
+_TIME = r"(\d{2})[-_: ]?(\d{2})[-_: ]?(\d{2})"
+GENERIC_PATTERN = re.compile(f"^(?:.*?{_DATE}.*?[-_ ]?{_TIME}|.*?{_DATE})")
+
+# Vendor patterns are anchored and therefore much cheaper than the generic pattern. They use the
+# named groups year, month, day and optionally hour, minute and second. A pattern without groups
+# marks names which are known to contain no date at all.
+VENDOR_PATTERNS = {
+    "whatsapp": r"^(?:IMG|VID)-(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})-WA\d+",
+    "iphone": r"^(?:Photo|Video)-(?P<year>\d{4})-(?P<month>\d{2})-(?P<day>\d{2})-(?P<hour>\d{2})-(?P<minute>\d{2})-(?P<second>\d{2})",
+    "android": r"^(?:IMG|VID|PXL)_(?P<year>\d{4})(?P<month>\d{2})(?P<day>\d{2})_(?P<hour>\d{2})(?P<minute>\d{2})(?P<second>\d{2})",
+    "sony": r"^DSC\d{5}(?:\.\w+)?$",
+}
+
+
+class FilenameParser:
+    """ Extracts date and time from file names.
+
+    Named patterns are tried in registration order, the generic pattern is used if none of them matches.
+    All named patterns are compiled into one alternation, so a name is matched at most twice.
+    """
+
+    __FIELDS = ["year", "month", "day", "hour", "minute", "second"]
+
+    def __init__(self, patterns: dict = VENDOR_PATTERNS):
+        self.__patterns = list()
+        self.__combined = None
+        for name, pattern in patterns.items():
+            self.register(name, pattern)
+
+    def register(self, name: str, pattern: str, first: bool = False):
+        ## Add a named pattern, either in front of or after the already registered ones
+        entry = (name, pattern)
+        if first:
+            self.__patterns.insert(0, entry)
+        else:
+            self.__patterns.append(entry)
+        try:
+            self.__compile()
+        except (re.error, ValueError):
+            self.__patterns.remove(entry)
+            self.__compile()
+            raise
+
+    def __compile(self):
+        # Each pattern becomes the group p<index> with its named groups prefixed the same way
+        alternatives = list()
+        for index, (name, pattern) in enumerate(self.__patterns):
+            prefixed = re.sub(r"\(\?P([<=])(\w+)", rf"(?P\1p{index}_\2", pattern)
+            alternatives.append(f"(?P<p{index}>{prefixed})")
+        if not alternatives:
+            self.__combined = None
+            return
+        self.__combined = re.compile("|".join(alternatives))
+
+        # Map the outer group number to the pattern name and the group numbers of its fields
+        self.__lookup = dict()
+        groupIndex = self.__combined.groupindex
+        for index, (name, pattern) in enumerate(self.__patterns):
+            fieldGroups = [
+                groupIndex[f"p{index}_{field}"]
+                for field in self.__FIELDS
+                if f"p{index}_{field}" in groupIndex
+            ]
+            if len(fieldGroups) not in (0, 3, 6):
+                raise ValueError(
+                    f"Pattern {name} needs the groups year, month, day and optionally hour, minute, second"
+                )
+            self.__lookup[groupIndex[f"p{index}"]] = (name, tuple(fieldGroups))
+
+    def loadConfig(self, filename: str):
+        ## Register the patterns of a JSON file {"name": "regex", ...} in front of the existing ones
+        with open(filename, "r") as f:
+            patterns = json.load(f)
+        for name, pattern in reversed(list(patterns.items())):
+            self.register(name, pattern, first=True)
+
+    def getPatternNames(self) -> list:
+        return [name for name, _ in self.__patterns]
+
+    def getFingerprint(self) -> str:
+        ## Short digest of the registered patterns in their order, changes whenever a name may parse differently
+        return hashlib.sha1(json.dumps(self.__patterns).encode()).hexdigest()[:16]
+
+    def parse(self, filename: str) -> FilenameTime:
+        ## Return date and, if available, datetime contained in filename (without path).
+        # Both are None if there is no valid date in the name.
+        if self.__combined is not None:
+            match = self.__combined.match(filename)
+            if match is not None:
+                (patternName, fieldGroups) = self.__lookup[match.lastindex]
+                if len(fieldGroups) == 0:
+                    # pattern of names known to contain no date
+                    return FilenameTime(None, None)
+                if len(fieldGroups) == 3:
+                    return self.__build(filename, patternName, *match.group(*fieldGroups), None, None, None)
+                return self.__build(filename, patternName, *match.group(*fieldGroups))
+
+        match = GENERIC_PATTERN.match(filename)
+        if match is None:
+            return FilenameTime(None, None)
+        groups = match.groups()
+        if groups[0] is not None:
+            return self.__build(filename, "generic", *groups[0:6])
+        return self.__build(filename, "generic", *groups[6:9], None, None, None)
+
+    def __build(self, filename, patternName, year, month, day, hour, minute, second) -> FilenameTime:
+        try:
+            if hour is None:
+                return FilenameTime(date(int(year), int(month), int(day)), None)
+            datetimeObj = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second))
+            return FilenameTime(datetimeObj.date(), datetimeObj)
+        except ValueError as e:
+            logger.debug("Invalid date/time in {file} found by pattern {pattern}: {error}", file=filename, pattern=patternName, error=e)
+            return FilenameTime(None, None)
+
+
+defaultParser = FilenameParser()
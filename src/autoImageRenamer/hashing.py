@@ -0,0 +1,85 @@
+import os
+import hashlib
+
+from .metrics import metrics
+
+# Size of the head and of the tail hashed before hashing the full content of a file
+PARTIAL_HASH_BYTES = 4 * 1024 * 1024
+
+
+def getHasher(algorithm: str = "md5"):
+    ## Return a new hash object. Besides the hashlib algorithms, xxhash is supported if installed
+    if algorithm == "xxhash":
+        import xxhash
+
+        return xxhash.xxh64()
+    return hashlib.new(algorithm)
+
+
+@metrics.measure("hash")
+def getFileHash(filename: str, algorithm: str = "md5", partial: bool = False):
+    ## Hash the full file content or, if partial, only its first and last PARTIAL_HASH_BYTES
+    BLOCKSIZE = 65536
+    hasher = getHasher(algorithm)
+    nBytes = 0
+    with open(filename, "rb") as afile:
+        if partial:
+            buf = afile.read(PARTIAL_HASH_BYTES)
+            hasher.update(buf)
+            nBytes += len(buf)
+            afile.seek(0, os.SEEK_END)
+            size = afile.tell()
+            if size > PARTIAL_HASH_BYTES:
+                afile.seek(max(PARTIAL_HASH_BYTES, size - PARTIAL_HASH_BYTES))
+                buf = afile.read(PARTIAL_HASH_BYTES)
+                hasher.update(buf)
+                nBytes += len(buf)
+            metrics.addBytes("hash", nBytes)
+            return hasher.hexdigest()
+
+        buf = afile.read(BLOCKSIZE)
+        while len(buf) > 0:
+            hasher.update(buf)
+            nBytes += len(buf)
+            buf = afile.read(BLOCKSIZE)
+    metrics.addBytes("hash", nBytes)
+    return hasher.hexdigest()
+
+
+def groupBy(filenames: list, keyFunction) -> list:
+    ## Group filenames by keyFunction and return only groups with more than one member, keeping the input order
+    groups = dict()
+    for filename in filenames:
+        groups.setdefault(keyFunction(filename), list()).append(filename)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def findContentDuplicates(filenames: list, algorithm: str = "md5", hashes: dict = None) -> list:
+    ## Return groups of files with identical content, each in the order of filenames.
+    # Works in stages so that most files are never read completely:
+    # 1. files of different size cannot be equal
+    # 2. hash of head and tail of the file
+    # 3. full content hash, only if the file is larger than what the partial hash covered
+    # Every full content hash computed on the way is stored in hashes if given.
+    if hashes is None:
+        hashes = dict()
+
+    def partialHash(filename):
+        digest = getFileHash(filename, algorithm, partial=True)
+        if os.path.getsize(filename) <= 2 * PARTIAL_HASH_BYTES:
+            # head and tail cover the whole file
+            hashes[filename] = digest
+        return digest
+
+    def fullHash(filename):
+        hashes[filename] = getFileHash(filename, algorithm)
+        return hashes[filename]
+
+    duplicates = list()
+    for sameSize in groupBy(filenames, os.path.getsize):
+        for samePartial in groupBy(sameSize, partialHash):
+            if os.path.getsize(samePartial[0]) <= 2 * PARTIAL_HASH_BYTES:
+                duplicates.append(samePartial)
+            else:
+                duplicates.extend(groupBy(samePartial, fullHash))
+    return duplicates
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import threading
+from loguru import logger
+
+from .autoImageRenamer import AutoImageRenamer, performActions
+from .fileOps import FsyncPolicy, fsyncPath
+
+
+class Journal:
+    """ Write-ahead journal of the file operations of a run, one JSON object per line.
+
+    All intended operations of a takeAction are written and synced before the first one starts, so an
+    interrupted run can be resumed with the very same targets. Completed operations are marked done,
+    these markers are only synced every syncEvery entries or syncSeconds. They are hints: resume and
+    rollback check the file system, e.g. a rename is done once its source is gone and its target exists.
+    """
+
+    def __init__(self, filename: str, syncEvery: int = 1000, syncSeconds: float = 1.0):
+        self.__filename = filename
+        self.__syncEvery = syncEvery
+        self.__syncSeconds = syncSeconds
+        self.__lock = threading.Lock()
+        self.__unsynced = 0
+        self.__lastSync = time.monotonic()
+
+        self.__nextId = 0
+        if os.path.exists(filename):
+            self.__nextId = len(readJournal(filename)[0])
+        folder = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(folder, exist_ok=True)
+        self.__file = open(filename, "a", encoding="utf-8")
+        fsyncPath(folder)
+        if self.__file.tell() > 0:
+            # terminate a line torn by an interrupted run, so it does not swallow the next record
+            with open(filename, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.__file.write("\n")
+        # source -> id of its intent
+        self.__ids = dict()
+
+    def begin(self, items, action) -> list:
+        ## Write the intents of all (old, new, methods) items and sync them. Returns the items as list
+        items = list(items)
+        with self.__lock:
+            for old, new, methods in items:
+                record = {
+                    "type": "intent",
+                    "id": self.__nextId,
+                    "action": action.name,
+                    "source": os.path.abspath(old),
+                    "target": os.path.abspath(new),
+                    "methods": methods,
+                }
+                self.__ids[os.path.abspath(old)] = self.__nextId
+                self.__nextId += 1
+                self.__file.write(json.dumps(record) + "\n")
+            self.__sync()
+        logger.debug(f"Journaled {len(items)} {action.name} operations in {self.__filename}")
+        return items
+
+    def adopt(self, intents: list) -> list:
+        ## Track already journaled intents, so completing them marks them done. Returns their items
+        with self.__lock:
+            for intent in intents:
+                self.__ids[intent["source"]] = intent["id"]
+        return [(i["source"], i["target"], i["methods"]) for i in intents]
+
+    def markDone(self, old: str, new: str):
+        ## Mark the operation of old as completed, thread safe. Synced in batches
+        with self.__lock:
+            intentId = self.__ids.pop(os.path.abspath(old), None)
+            if intentId is None:
+                return
+            self.__file.write(json.dumps({"type": "done", "id": intentId}) + "\n")
+            self.__unsynced += 1
+            if self.__unsynced >= self.__syncEvery or time.monotonic() - self.__lastSync >= self.__syncSeconds:
+                self.__sync()
+
+    def markUndone(self, intentId: int):
+        with self.__lock:
+            self.__file.write(json.dumps({"type": "undone", "id": intentId}) + "\n")
+            self.__unsynced += 1
+
+    def __sync(self):
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__unsynced = 0
+        self.__lastSync = time.monotonic()
+
+    def close(self):
+        with self.__lock:
+            self.__sync()
+            self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def readJournal(filename: str):
+    ## Return the intents in journal order and the sets of the ids marked done and undone.
+    # A torn last line of an interrupted run is ignored.
+    intents = list()
+    done = set()
+    undone = set()
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.debug(f"Ignoring incomplete journal line {line!r}")
+                continue
+            if record["type"] == "intent":
+                intents.append(record)
+            elif record["type"] == "done":
+                done.add(record["id"])
+            elif record["type"] == "undone":
+                undone.add(record["id"])
+    return (intents, done, undone)
+
+
+def isDone(intent: dict, markedDone: bool) -> bool:
+    ## Whether the operation of an intent has been completed, judged by the file system
+    (source, target) = (intent["source"], intent["target"])
+    if not os.path.exists(target):
+        return False
+    if intent["action"] == AutoImageRenamer.Action.rename.name:
+        return not os.path.exists(source)
+    if not markedDone or not os.path.exists(source):
+        # the copy may have been interrupted, or there is nothing to compare with
+        return markedDone
+    if intent["action"] == AutoImageRenamer.Action.link.name and os.path.samefile(source, target):
+        return True
+    return os.path.getsize(source) == os.path.getsize(target)
+
+
+def resumeJournal(filename: str, copyJobs: int = 1, fsyncPolicy=FsyncPolicy.none) -> int:
+    ## Carry out all journaled operations which have not been completed, without scanning again
+    (intents, done, undone) = readJournal(filename)
+    pending = dict()
+    for intent in intents:
+        if intent["id"] in undone or isDone(intent, intent["id"] in done):
+            continue
+        if not os.path.exists(intent["source"]):
+            logger.warning(f"Skipping {intent['source']}: file no longer exists")
+            continue
+        pending.setdefault(intent["action"], list()).append(intent)
+
+    logger.info(f"Resuming {sum(len(p) for p in pending.values())} of {len(intents)} journaled operations")
+    nFiles = 0
+    with Journal(filename) as journal:
+        for actionName, actionIntents in pending.items():
+            action = AutoImageRenamer.Action[actionName]
+            items = journal.adopt(actionIntents)
+            nFiles += performActions(items, action, copyJobs, fsyncPolicy, onDone=journal.markDone)
+    return nFiles
+
+
+def rollbackJournal(filename: str) -> int:
+    ## Reverse all completed operations, newest first: renames are moved back, copies and links are removed
+    (intents, done, undone) = readJournal(filename)
+    nFiles = 0
+    with Journal(filename) as journal:
+        for intent in reversed(intents):
+            if intent["id"] in undone or not isDone(intent, intent["id"] in done):
+                continue
+            (source, target) = (intent["source"], intent["target"])
+            try:
+                if intent["action"] == AutoImageRenamer.Action.rename.name:
+                    logger.info("Renaming {target} back to {file}", event="rollback", file=source, target=target)
+                    os.makedirs(os.path.dirname(source), exist_ok=True)
+                    os.rename(target, source)
+                elif not os.path.exists(source):
+                    logger.warning(f"Keeping {target}: its source {source} no longer exists")
+                    continue
+                else:
+                    logger.info("Removing {target}, copy of {file}", event="rollback", file=source, target=target)
+                    os.remove(target)
+            except OSError as e:
+                logger.error(f"Rollback of {target} failed: {e}")
+                continue
+            journal.markUndone(intent["id"])
+            nFiles += 1
+    logger.info(f"Rolled back {nFiles} operations")
+    return nFiles
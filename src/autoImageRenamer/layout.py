@@ -0,0 +1,59 @@
+import os
+from datetime import datetime
+
+from .extractors import isDateOnly
+
+_DATE_FORMAT = "%Y-%m-%d"
+_DATETIME_FORMAT = f"{_DATE_FORMAT}_%H-%M-%S"
+
+# target folder relative to the source folder, file name from the time (see OutputLayout)
+DEFAULT_LAYOUT = "{folder}/{name}"
+
+
+class OutputLayout:
+    """ Template of the target path of a file relative to the output folder, folders separated by "/".
+
+    Fields are {year}, {month}, {day}, {hour}, {minute}, {second} of the selected time, {date} (2021-12-31),
+    {datetime} (2021-12-31_23-59-59, only the date if the time of day is unknown), {stem} and {ext} (lower case)
+    of the source file, {folder}, the folder of the source file relative to its source folder, and {name}, the
+    default file name {datetime}{ext} or {datetime}-{stem}{ext} with append. Empty folder levels are left out,
+    e.g. "{year}/{year}-{month}/{name}" partitions the library by month.
+    """
+
+    def __init__(self, template: str = DEFAULT_LAYOUT):
+        self.__template = template
+        self.__parts = template.split("/")
+        self.__isDefault = template == DEFAULT_LAYOUT
+        if template.startswith("/") or self.__parts[-1].strip() in ["", "{folder}"]:
+            raise ValueError(f"Invalid output layout {template!r}: must be relative and end with a file name")
+        try:
+            self.format(datetime(2000, 1, 2, 3, 4, 5), "stem", ".jpg", "", False)
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"Invalid output layout {template!r}: {e!r}")
+
+    def getTemplate(self) -> str:
+        return self.__template
+
+    def format(self, value: datetime, stem: str, ext: str, relDir: str, append: bool) -> str:
+        ## Target path of a file relative to the output folder
+        if isDateOnly(value):
+            name = value.strftime(_DATE_FORMAT)
+        else:
+            name = value.strftime(_DATETIME_FORMAT)
+        fields = {"datetime": name, "stem": stem, "ext": ext.lower(), "folder": relDir}
+        if append:
+            name += f"-{stem}"
+        fields["name"] = name + fields["ext"]
+        if self.__isDefault:
+            # the common case without any formatting
+            return os.path.join(relDir, fields["name"])
+
+        fields["year"] = f"{value.year:04d}"
+        fields["month"] = f"{value.month:02d}"
+        fields["day"] = f"{value.day:02d}"
+        fields["hour"] = f"{value.hour:02d}"
+        fields["minute"] = f"{value.minute:02d}"
+        fields["second"] = f"{value.second:02d}"
+        fields["date"] = value.strftime(_DATE_FORMAT)
+        parts = [part.format(**fields) for part in self.__parts]
+        return os.path.join(*[part for part in parts if part])
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from loguru import logger
+
+
+def getDefaultCacheFile() -> str:
+    ## Per-user cache location, following XDG on unix and LOCALAPPDATA on Windows
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(base, "autoImageRenamer", "metadata.sqlite")
+
+
+class MetadataCache:
+    """ On-disk cache of extracted times per file.
+
+    An entry is only valid as long as size, mtime and inode of the file are unchanged and it has been
+    extracted in the same context, a fingerprint of the configuration the times depend on (e.g. the
+    filename patterns, extractors and resolution policy).
+    Entries which have not been seen for maxAgeDays are evicted when the cache is closed.
+    The database is opened with the first lookup, so a run without files does not touch it.
+    """
+
+    # Increment whenever the meaning of the stored times changes
+    __SCHEMA_VERSION = 3
+
+    def __init__(self, filename: str, maxAgeDays: float = 90, rebuild: bool = False):
+        self.__filename = filename
+        self.__maxAge = maxAgeDays * 24 * 3600
+        self.__now = int(time.time())
+        self.__rebuild = rebuild
+        self.__db = None
+        self.__seen = list()
+        self.__hits = 0
+        self.__misses = 0
+        if rebuild:
+            # rebuilt even if no file is looked up
+            self.__open()
+
+    def __open(self):
+        ## Connect to the database and create or rebuild the table, once
+        if self.__db is not None:
+            return self.__db
+        # sqlite3 is only imported once a file is looked up
+        import sqlite3
+
+        folder = os.path.dirname(self.__filename)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.__db = sqlite3.connect(self.__filename)
+        self.__db.execute("PRAGMA journal_mode=WAL")
+        self.__db.execute("PRAGMA synchronous=NORMAL")
+
+        version = self.__db.execute("PRAGMA user_version").fetchone()[0]
+        if self.__rebuild or version != self.__SCHEMA_VERSION:
+            if version != 0:
+                logger.info(f"Rebuilding metadata cache {self.__filename}")
+            self.__db.execute("DROP TABLE IF EXISTS files")
+            self.__db.execute(f"PRAGMA user_version={self.__SCHEMA_VERSION}")
+        self.__db.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                context TEXT NOT NULL,
+                times TEXT NOT NULL,
+                lastSeen INTEGER NOT NULL
+            )"""
+        )
+        self.__db.commit()
+        return self.__db
+
+    def get(self, path: str, stat: os.stat_result, context: str = ""):
+        ## Return the cached times dict of path or None if unknown, the file has changed or it was cached in another context
+        row = self.__open().execute(
+            "SELECT size, mtime_ns, inode, context, times FROM files WHERE path=?", (path,)
+        ).fetchone()
+        if row is None or row[0:4] != (stat.st_size, stat.st_mtime_ns, stat.st_ino, context):
+            self.__misses += 1
+            return None
+
+        self.__hits += 1
+        self.__seen.append((self.__now, path))
+        return {k: datetime.fromisoformat(v) for k, v in json.loads(row[4]).items()}
+
+    def put(self, path: str, stat: os.stat_result, times: dict, context: str = ""):
+        serialized = json.dumps({k: v.isoformat() for k, v in times.items()})
+        self.__open().execute(
+            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, context, serialized, self.__now),
+        )
+
+    def commit(self):
+        ## Write pending entries and refresh the last seen timestamp of all hits in one transaction
+        if self.__db is None:
+            return
+        self.__db.executemany("UPDATE files SET lastSeen=? WHERE path=?", self.__seen)
+        self.__seen.clear()
+        self.__db.commit()
+
+    def compact(self):
+        ## Evict entries not seen for maxAge and give the space back if a lot has been freed
+        if self.__db is None:
+            return
+        evicted = self.__db.execute(
+            "DELETE FROM files WHERE lastSeen < ?", (self.__now - self.__maxAge,)
+        ).rowcount
+        self.__db.commit()
+        if evicted > 0:
+            logger.debug(f"Evicted {evicted} entries from metadata cache")
+            pageCount = self.__db.execute("PRAGMA page_count").fetchone()[0]
+            freeCount = self.__db.execute("PRAGMA freelist_count").fetchone()[0]
+            if freeCount > pageCount // 4:
+                self.__db.execute("VACUUM")
+
+    def close(self):
+        if self.__db is None:
+            return
+        logger.debug(f"Metadata cache: {self.__hits} hits, {self.__misses} misses")
+        self.commit()
+        self.compact()
+        self.__db.close()
+        self.__db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import functools
+import threading
+from collections import Counter
+from loguru import logger
+
+_FIELDS = ["calls", "seconds", "bytes", "failures", "skipped"]
+
+
+def isEmptyResult(result) -> bool:
+    ## Results without any time count as failed extractions
+    if result is None:
+        return True
+    if isinstance(result, dict):
+        return not any(v is not None for v in result.values())
+    return False
+
+
+class StageMetrics:
+    """ Time, calls, bytes read and failures per processing stage, thread safe.
+
+    Disabled by default: measured functions then only pay for one attribute check.
+    Time is summed over all calls, with parallel workers it can exceed the wall time of the run.
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.enabled = False
+        self.__values = {field: Counter() for field in _FIELDS}
+
+    def enable(self, enabled: bool = True):
+        self.enabled = enabled
+
+    def measure(self, stage: str, failed=isEmptyResult):
+        ## Decorator recording every call of the decorated function under stage.
+        # Exceptions and results for which failed returns True are counted as failures.
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                isFailure = True
+                try:
+                    result = function(*args, **kwargs)
+                    isFailure = failed(result)
+                    return result
+                finally:
+                    self.add(stage, time.perf_counter() - start, isFailure)
+
+            return wrapper
+
+        return decorator
+
+    def add(self, stage: str, seconds: float, failure: bool = False):
+        with self.__lock:
+            self.__values["calls"][stage] += 1
+            self.__values["seconds"][stage] += seconds
+            if failure:
+                self.__values["failures"][stage] += 1
+
+    def addBytes(self, stage: str, nBytes: int):
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__values["bytes"][stage] += nBytes
+
+    def addSkipped(self, stage: str, nCalls: int = 1):
+        ## Count calls of stage which were not necessary, e.g. extractors skipped by the resolution policy
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__values["skipped"][stage] += nCalls
+
+    def reset(self):
+        with self.__lock:
+            for values in self.__values.values():
+                values.clear()
+
+    def drain(self) -> dict:
+        ## Return all values recorded so far and reset them, used to hand results from pool processes back
+        with self.__lock:
+            state = {field: dict(values) for field, values in self.__values.items()}
+            for values in self.__values.values():
+                values.clear()
+        return state
+
+    def merge(self, state: dict):
+        with self.__lock:
+            for field, values in state.items():
+                self.__values[field].update(values)
+
+    def getStages(self) -> dict:
+        ## Return {stage: {"calls": .., "seconds": .., "bytes": .., "failures": .., "skipped": ..}} sorted by stage
+        with self.__lock:
+            stages = sorted(self.__values["calls"].keys() | self.__values["bytes"].keys() | self.__values["skipped"].keys())
+            return {s: {field: self.__values[field][s] for field in _FIELDS} for s in stages}
+
+    def log(self):
+        ## Log a summary table of all stages
+        stages = self.getStages()
+        if not stages:
+            return
+        lines = [f"{'stage':<10} {'calls':>8} {'failures':>8} {'skipped':>8} {'seconds':>9} {'ms/call':>8} {'MB':>9}"]
+        for stage, v in stages.items():
+            msPerCall = v["seconds"] / v["calls"] * 1e3 if v["calls"] else 0.0
+            lines.append(
+                f"{stage:<10} {v['calls']:>8} {v['failures']:>8} {v['skipped']:>8} {v['seconds']:>9.3f} {msPerCall:>8.3f} {v['bytes'] / 1e6:>9.1f}"
+            )
+        logger.info("Stage metrics:\n" + "\n".join(lines))
+
+    def export(self, filename: str):
+        ## Write the metrics as Prometheus textfile (*.prom) or JSON (any other extension).
+        # The file is replaced atomically, as required by the node exporter textfile collector.
+        stages = self.getStages()
+        if os.path.splitext(filename)[1].lower() == ".prom":
+            content = self.__toPrometheus(stages)
+        else:
+            content = json.dumps({"stages": stages}, indent=2) + "\n"
+        temporary = f"{filename}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write(content)
+        os.replace(temporary, filename)
+        logger.debug(f"Wrote metrics to {filename}")
+
+    def __toPrometheus(self, stages: dict) -> str:
+        descriptions = {
+            "calls": "Number of calls of a processing stage",
+            "seconds": "Time spent in a processing stage",
+            "bytes": "Bytes read by a processing stage",
+            "failures": "Failed calls of a processing stage",
+            "skipped": "Calls of a processing stage skipped as unnecessary",
+        }
+        lines = list()
+        for field in _FIELDS:
+            name = f"autoimagerenamer_stage_{field}_total"
+            lines.append(f"# HELP {name} {descriptions[field]}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, v in stages.items():
+                lines.append(f'{name}{{stage="{stage}"}} {v[field]}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = StageMetrics()
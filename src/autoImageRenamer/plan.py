@@ -0,0 +1,98 @@
+import os
+import csv
+import json
+from loguru import logger
+
+from .autoImageRenamer import AutoImageRenamer, performActions
+from .fileOps import FsyncPolicy
+
+_CSV_FIELDS = ["source", "target", "methods", "times", "size", "mtime_ns", "hash"]
+
+
+def isCsv(filename: str) -> bool:
+    return os.path.splitext(filename)[1].lower() == ".csv"
+
+
+def createPlanRecords(renamer: AutoImageRenamer):
+    ## Yield one plan record per final rename of renamer
+    table = renamer.getTable()
+    algorithm = renamer.getHashAlgorithm()
+    for index in range(len(table)):
+        source = table.getSource(index)
+        stat = os.stat(source)
+        record = dict()
+        # absolute paths, so the plan can be applied from any working directory
+        record["source"] = os.path.abspath(source)
+        record["target"] = os.path.abspath(table.getTarget(index))
+        record["methods"] = table.getFromMethods(index)
+        record["times"] = {k: v.isoformat() for k, v in table.getTimes(index).items()}
+        record["size"] = stat.st_size
+        record["mtime_ns"] = stat.st_mtime_ns
+        digest = table.getHash(index)
+        record["hash"] = f"{algorithm}:{digest}" if digest is not None else None
+        yield record
+
+
+def writePlan(filename: str, renamer: AutoImageRenamer) -> int:
+    ## Write the plan of renamer as JSON lines or, for .csv files, as CSV. Returns the number of records
+    nRecords = 0
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        if isCsv(filename):
+            writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS)
+            writer.writeheader()
+        for record in createPlanRecords(renamer):
+            if isCsv(filename):
+                record["methods"] = ";".join(record["methods"])
+                record["times"] = json.dumps(record["times"])
+                record["hash"] = record["hash"] or ""
+                writer.writerow(record)
+            else:
+                f.write(json.dumps(record) + "\n")
+            nRecords += 1
+    logger.info(f"Wrote plan with {nRecords} entries to {filename}")
+    return nRecords
+
+
+def readPlan(filename: str):
+    ## Yield the records of a plan written by writePlan
+    with open(filename, "r", newline="", encoding="utf-8") as f:
+        if isCsv(filename):
+            for record in csv.DictReader(f):
+                record["methods"] = record["methods"].split(";") if record["methods"] else list()
+                record["times"] = json.loads(record["times"])
+                record["size"] = int(record["size"])
+                record["mtime_ns"] = int(record["mtime_ns"])
+                record["hash"] = record["hash"] or None
+                yield record
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def checkRecord(record: dict) -> bool:
+    ## A record may only be applied if its source is unchanged since planning and the target is free
+    source = record["source"]
+    try:
+        stat = os.stat(source)
+    except FileNotFoundError:
+        logger.warning(f"Skipping {source}: file no longer exists")
+        return False
+    if (stat.st_size, stat.st_mtime_ns) != (record["size"], record["mtime_ns"]):
+        logger.warning(f"Skipping {source}: file changed since the plan was created")
+        return False
+    if os.path.exists(record["target"]) and not os.path.samefile(source, record["target"]):
+        logger.warning(f"Skipping {source}: target {record['target']} already exists")
+        return False
+    return True
+
+
+def applyPlan(filename: str, action, copyJobs: int = 1, fsyncPolicy=FsyncPolicy.none) -> int:
+    ## Rename/copy all unchanged files of a plan without extracting any metadata again
+    logger.info(f"Applying plan {filename} with {action.name}")
+    items = (
+        (record["source"], record["target"], record["methods"])
+        for record in readPlan(filename)
+        if checkRecord(record)
+    )
+    return performActions(items, action, copyJobs, fsyncPolicy)
@@ -0,0 +1,88 @@
+import os
+import re
+from datetime import timedelta
+from typing import NamedTuple
+
+from .extractors import isDateOnly
+
+# e.g. +1h, -1h30m, 2d, 90s or plain seconds
+_OFFSET_PATTERN = re.compile(r"([+-]?)(?:(\d+)d)?(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?")
+_SOURCE_KEYS = {"offset", "priority"}
+
+
+class Source(NamedTuple):
+    """ An input folder of a run.
+
+    offset is added to all times found for its files, e.g. for a camera with a wrong clock. Dates
+    without time of day are kept. Files of a source with higher priority win collisions with files of
+    other sources: they get the lower counters and are kept when the content is the same.
+    """
+
+    folder: str
+    offset: timedelta = timedelta(0)
+    priority: int = 0
+
+
+def parseOffset(text: str) -> timedelta:
+    ## Parse an offset like +1h, -1h30m, 2d, 90s or -3600
+    match = _OFFSET_PATTERN.fullmatch(text.strip())
+    if match is None or not any(match.groups()[1:]):
+        raise ValueError(f"Invalid time offset {text!r}")
+    (sign, days, hours, minutes, seconds) = match.groups()
+    offset = timedelta(days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -offset if sign == "-" else offset
+
+
+def parseSource(spec: str) -> Source:
+    ## Parse DIR[,offset=<offset>][,priority=<n>]. Commas not followed by a known key are part of DIR
+    parts = spec.split(",")
+    settings = dict()
+    while len(parts) > 1 and parts[-1].split("=", 1)[0].strip() in _SOURCE_KEYS and "=" in parts[-1]:
+        (key, value) = parts.pop().split("=", 1)
+        settings[key.strip()] = value.strip()
+    source = Source(",".join(parts))
+    if "offset" in settings:
+        source = source._replace(offset=parseOffset(settings["offset"]))
+    if "priority" in settings:
+        source = source._replace(priority=int(settings["priority"]))
+    return source
+
+
+def toSources(inputFolder) -> list:
+    ## Sources of a folder, a Source or a list of them. A folder listed twice is only kept once
+    if isinstance(inputFolder, (str, os.PathLike, Source)):
+        inputFolder = [inputFolder]
+    sources = list()
+    seen = set()
+    for source in inputFolder:
+        if not isinstance(source, Source):
+            source = Source(os.fspath(source))
+        key = os.path.normcase(os.path.abspath(source.folder))
+        if key in seen:
+            continue
+        seen.add(key)
+        sources.append(source)
+    return sources
+
+
+def shiftTimes(times: dict, offset: timedelta) -> dict:
+    ## times with offset added, dates without time of day are kept
+    if not offset:
+        return times
+    return {method: value if isDateOnly(value) else value + offset for method, value in times.items()}
+
+
+def getDevice(folder: str):
+    ## Device of folder, the folder itself if it cannot be accessed (the walk reports the error)
+    try:
+        return os.stat(folder).st_dev
+    except OSError:
+        return folder
+
+
+def groupByDevice(sources: list) -> list:
+    ## Indices of sources grouped by the device (disk, mount) they are on, in order of first appearance
+    groups = dict()
+    for sourceId, source in enumerate(sources):
+        groups.setdefault(getDevice(source.folder), list()).append(sourceId)
+    return list(groups.values())
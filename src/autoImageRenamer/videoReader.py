@@ -0,0 +1,157 @@
+import os
+import struct
+from datetime import datetime, timedelta
+
+from .metrics import metrics
+
+# mvhd times count seconds since 1904-01-01 (UTC)
+_EPOCH = datetime(1904, 1, 1)
+_APPLE_CREATIONDATE = b"com.apple.quicktime.creationdate"
+
+# Metadata boxes are tiny, a larger one is not read at all
+MAX_META_BYTES = 1024 * 1024
+
+
+class VideoHeaderError(Exception):
+    pass
+
+
+class _CountingFile:
+    """ Seekable file counting the bytes read """
+
+    def __init__(self, handle):
+        self.__handle = handle
+        self.bytes = 0
+
+    def readAt(self, pos: int, size: int) -> bytes:
+        self.__handle.seek(pos)
+        data = self.__handle.read(size)
+        self.bytes += len(data)
+        return data
+
+
+def iterBoxes(f: _CountingFile, start: int, end: int):
+    ## Yield (type, payload start, box end) of the ISO BMFF boxes between start and end, reading only box headers.
+    # Boxes are skipped with a seek, so e.g. a multi-GB mdat in front of moov costs nothing.
+    pos = start
+    while pos + 8 <= end:
+        header = f.readAt(pos, 16)
+        if len(header) < 8:
+            return
+        (size, boxType) = struct.unpack(">I4s", header[0:8])
+        headerSize = 8
+        if size == 1:
+            if len(header) < 16:
+                raise VideoHeaderError(f"truncated 64 bit size of box {boxType} at {pos}")
+            size = struct.unpack(">Q", header[8:16])[0]
+            headerSize = 16
+        elif size == 0:
+            # box extends to the end of its parent
+            size = end - pos
+        if size < headerSize or pos + size > end:
+            raise VideoHeaderError(f"invalid size {size} of box {boxType} at {pos}")
+        yield (boxType, pos + headerSize, pos + size)
+        pos += size
+
+
+def parseMvhd(payload: bytes) -> datetime:
+    ## Creation time of a movie header box, None if not set
+    if len(payload) < 8:
+        raise VideoHeaderError("truncated mvhd")
+    if payload[0] == 1:
+        if len(payload) < 12:
+            raise VideoHeaderError("truncated mvhd")
+        seconds = struct.unpack(">Q", payload[4:12])[0]
+    else:
+        seconds = struct.unpack(">I", payload[4:8])[0]
+    if seconds == 0:
+        return None
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+def parseAppleCreationDate(payload: bytes) -> datetime:
+    ## Value of com.apple.quicktime.creationdate in the payload of a mdta meta box, None if missing.
+    # The value is local time with UTC offset, e.g. 2021-06-22T10:12:58+0200. The local time is returned.
+    pos = 0
+    if payload[4:8] != b"hdlr":
+        # ISO full box: version and flags in front of the children
+        pos = 4
+
+    children = dict()
+    while pos + 8 <= len(payload):
+        (size, boxType) = struct.unpack(">I4s", payload[pos : pos + 8])
+        if size < 8:
+            break
+        children[boxType] = payload[pos + 8 : pos + size]
+        pos += size
+    if b"keys" not in children or b"ilst" not in children:
+        return None
+
+    # keys: version/flags, count, then (size, namespace, name) entries with 1 based indices
+    keys = children[b"keys"]
+    index = None
+    pos = 8
+    for keyIndex in range(1, struct.unpack(">I", keys[4:8])[0] + 1):
+        size = struct.unpack(">I", keys[pos : pos + 4])[0]
+        if size < 8:
+            break
+        if keys[pos + 8 : pos + size] == _APPLE_CREATIONDATE:
+            index = keyIndex
+            break
+        pos += size
+    if index is None:
+        return None
+
+    # ilst: one box per key index, containing a data box (type, locale, value)
+    ilst = children[b"ilst"]
+    pos = 0
+    while pos + 8 <= len(ilst):
+        (size, itemIndex) = struct.unpack(">II", ilst[pos : pos + 8])
+        if size < 8:
+            break
+        if itemIndex == index and ilst[pos + 12 : pos + 16] == b"data":
+            value = ilst[pos + 24 : pos + size].decode("utf-8", errors="replace")
+            try:
+                return datetime.strptime(value[0:19], "%Y-%m-%dT%H:%M:%S")
+            except ValueError:
+                return None
+        pos += size
+    return None
+
+
+def readMetaBox(f: _CountingFile, start: int, end: int) -> datetime:
+    if end - start > MAX_META_BYTES:
+        return None
+    return parseAppleCreationDate(f.readAt(start, end - start))
+
+
+@metrics.measure("movie")
+def readMovieDates(filename: str) -> dict:
+    ## Read the creation dates of a MOV/MP4 by walking its boxes to moov/mvhd and the Apple metadata.
+    # Returns {"mvhd": datetime or None, "creationdate": datetime or None}. Raises VideoHeaderError
+    # if the file is no ISO BMFF file or has no moov box, the caller should fall back then.
+    with open(filename, "rb") as handle:
+        f = _CountingFile(handle)
+        try:
+            fileSize = os.fstat(handle.fileno()).st_size
+            moov = None
+            for boxType, start, end in iterBoxes(f, 0, fileSize):
+                if boxType == b"moov":
+                    moov = (start, end)
+                    break
+            if moov is None:
+                raise VideoHeaderError("no moov box")
+
+            dates = {"mvhd": None, "creationdate": None}
+            for boxType, start, end in iterBoxes(f, *moov):
+                if boxType == b"mvhd":
+                    dates["mvhd"] = parseMvhd(f.readAt(start, min(end - start, 32)))
+                elif boxType == b"meta":
+                    dates["creationdate"] = dates["creationdate"] or readMetaBox(f, start, end)
+                elif boxType == b"udta":
+                    for childType, childStart, childEnd in iterBoxes(f, start, end):
+                        if childType == b"meta":
+                            dates["creationdate"] = dates["creationdate"] or readMetaBox(f, childStart, childEnd)
+            return dates
+        finally:
+            metrics.addBytes("movie", f.bytes)
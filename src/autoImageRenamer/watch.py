@@ -0,0 +1,289 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from loguru import logger
+
+from .autoImageRenamer import AutoImageRenamer, findContentDuplicates
+
+# inotify event masks, see inotify(7)
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class InotifySource:
+    """ Reports files closed after writing or moved into a folder, Linux only """
+
+    def __init__(self, folder: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.__fd = libc.inotify_init1(_IN_NONBLOCK)
+        if self.__fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.__fd, os.fsencode(folder), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            error = ctypes.get_errno()
+            os.close(self.__fd)
+            raise OSError(error, f"inotify_add_watch on {folder} failed")
+        self.__folder = folder
+
+    def poll(self, timeout: float) -> list:
+        ## Wait up to timeout seconds and return the paths of all files reported in the meantime.
+        # None means events were lost and the folder has to be listed again.
+        (readable, _, _) = select.select([self.__fd], [], [], timeout)
+        if not readable:
+            return list()
+        try:
+            data = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return list()
+
+        paths = list()
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            (_, mask, _, length) = _EVENT_HEADER.unpack_from(data, pos)
+            pos += _EVENT_HEADER.size
+            name = data[pos : pos + length].rstrip(b"\0")
+            pos += length
+            if mask & _IN_Q_OVERFLOW:
+                return None
+            if name:
+                paths.append(os.path.join(self.__folder, os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.__fd)
+
+
+class PollingSource:
+    """ Reports files which are new or changed since the last listing of the folder """
+
+    def __init__(self, folder: str, interval: float):
+        self.__folder = folder
+        self.__interval = interval
+        self.__known = self.__list()
+
+    def __list(self) -> dict:
+        known = dict()
+        with os.scandir(self.__folder) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    known[os.path.normpath(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+        return known
+
+    def poll(self, timeout: float) -> list:
+        time.sleep(min(timeout, self.__interval))
+        current = self.__list()
+        changed = [path for path, state in current.items() if self.__known.get(path) != state]
+        self.__known = current
+        return changed
+
+    def close(self):
+        pass
+
+
+class FolderWatcher:
+    """ Hot folder mode: processes files arriving in inputFolder one by one.
+
+    A file is only processed once its size and modification time have not changed for settleSeconds.
+    All target names in use are kept in memory, so a new file needs no full collision pass. Like
+    collisions.CollisionResolver, a target folder is listed on its first use, a name is only free
+    if no file holds it either.
+    """
+
+    def __init__(
+        self,
+        renamer: AutoImageRenamer,
+        inputFolder: str,
+        outputFolder: str,
+        action,
+        settleSeconds: float = 2.0,
+        pollInterval: float = 1.0,
+        usePolling: bool = False,
+        hashAlgorithm: str = "md5",
+    ):
+        self.__renamer = renamer
+        self.__inputFolder = os.path.normpath(inputFolder)
+        self.__outputFolder = outputFolder
+        self.__action = action
+        self.__settle = settleSeconds
+        self.__hashAlgorithm = hashAlgorithm
+        self.__extensions = renamer.getExtensions()
+
+        # path -> (size, mtime_ns, time of last change)
+        self.__pending = dict()
+        # files written by ourselves, their events must not be processed again
+        self.__produced = set()
+        # claimed target path (normcase) -> source of the claim
+        self.__claimed = dict()
+        # base target path -> last used counter
+        self.__counters = dict()
+        # base target path -> targets with this base name, including counters
+        self.__families = dict()
+        # target folders whose files are claimed
+        self.__listed = set()
+
+        for old, new in renamer.getFinalRenames().items():
+            self.__claimed[os.path.normcase(new)] = old
+            self.__produced.add(os.path.normcase(new))
+        for key in self.__claimed:
+            self.__families[key] = [key]
+
+        self.__source = None
+        if not usePolling and sys.platform.startswith("linux"):
+            try:
+                self.__source = InotifySource(self.__inputFolder)
+                logger.debug(f"Watching {self.__inputFolder} with inotify")
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify not available ({e}), falling back to polling")
+        if self.__source is None:
+            self.__source = PollingSource(self.__inputFolder, pollInterval)
+            logger.debug(f"Watching {self.__inputFolder} by polling every {pollInterval} s")
+
+    def run(self, stopEvent: threading.Event = None):
+        ## Process arriving files until stopEvent is set or the process is interrupted
+        logger.info(f"Watching {self.__inputFolder} for new files, press Ctrl+C to stop")
+        try:
+            while stopEvent is None or not stopEvent.is_set():
+                paths = self.__source.poll(min(self.__settle, 1.0))
+                if paths is None:
+                    logger.warning("Watch events lost, listing the folder again")
+                    paths = [e.path for e in os.scandir(self.__inputFolder) if e.is_file()]
+                for path in paths:
+                    self.__observe(os.path.normpath(path))
+                self.__processSettled()
+        except KeyboardInterrupt:
+            logger.info("Stopped watching")
+        finally:
+            self.__source.close()
+
+    def __observe(self, path: str):
+        if os.path.normcase(path) in self.__produced:
+            return
+        if os.path.splitext(path)[1].lower() not in self.__extensions:
+            return
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.__pending.pop(path, None)
+            return
+        state = self.__pending.get(path)
+        if state is None or state[0:2] != (stat.st_size, stat.st_mtime_ns):
+            self.__pending[path] = (stat.st_size, stat.st_mtime_ns, time.monotonic())
+
+    def __processSettled(self):
+        now = time.monotonic()
+        for path, (size, mtime, changed) in sorted(self.__pending.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self.__pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                # still being written
+                self.__pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+                continue
+            if now - changed < self.__settle:
+                continue
+            del self.__pending[path]
+            self.processFile(path, stat)
+
+    def processFile(self, path: str, stat: os.stat_result = None):
+        ## Rename/copy a single settled file
+        (stem, ext) = os.path.splitext(os.path.basename(path))
+        statFunctions = None if stat is None else [lambda: stat]
+        times = self.__renamer.getCachedTimes([path], [ext], statFunctions)[0]
+        proposal = self.__renamer.proposeRename(path, "", stem, ext, times)
+        if proposal is None:
+            return None
+
+        target = self.claim(path, proposal)
+        if os.path.normcase(target) == os.path.normcase(path):
+            logger.debug(f"{path} already has its target name")
+            self.__produced.add(os.path.normcase(target))
+            return target
+        self.__renamer.takeAction({path: target}, self.__action, report=False)
+        self.__produced.add(os.path.normcase(target))
+        return target
+
+    def claim(self, source: str, proposal: str) -> str:
+        ## Return a free target name for proposal and mark it as used, in O(1) per file
+        self.__indexFolder(os.path.dirname(proposal))
+        key = os.path.normcase(proposal)
+        family = self.__families.setdefault(key, list())
+        if self.__isFree(proposal, source):
+            self.__claimed[key] = source
+            family.append(proposal)
+            return proposal
+
+        # same content as a file already holding this name or one of its counters: mark as duplicate
+        if self.isDuplicate(source, family):
+            (folder, _) = os.path.split(proposal)
+            target = os.path.join(folder, f"DUPLICATE_{os.path.basename(source)}")
+            logger.debug(f"{source} has the same content as a file named like {proposal}")
+            if self.__isFree(target, source):
+                self.__claimed[os.path.normcase(target)] = source
+                return target
+            proposal = target
+            key = os.path.normcase(proposal)
+
+        (base, ext) = os.path.splitext(proposal)
+        counter = self.__counters.get(key, 0)
+        while True:
+            counter += 1
+            target = f"{base}_{counter:03d}{ext}"
+            if self.__isFree(target, source):
+                break
+        self.__counters[key] = counter
+        self.__claimed[os.path.normcase(target)] = source
+        family.append(target)
+        return target
+
+    def __indexFolder(self, folder: str):
+        ## Claim the names of the files in a target folder, once
+        if folder in self.__listed:
+            return
+        self.__listed.add(folder)
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if os.path.normpath(entry.path) in self.__pending:
+                        # an unprocessed source, not a target. Its name is still taken as long as it exists, see __isFree
+                        continue
+                    key = os.path.normcase(os.path.normpath(entry.path))
+                    if key not in self.__claimed:
+                        self.__claimed[key] = entry.path
+                        self.__families[key] = [key]
+        except OSError:
+            # not created yet
+            pass
+
+    def __isFree(self, target: str, source: str) -> bool:
+        # like the sources of a batch in CollisionResolver, the file being processed does not hold its own name
+        key = os.path.normcase(os.path.normpath(target))
+        if key == os.path.normcase(os.path.normpath(source)):
+            return True
+        # a file may have been written by someone else since its folder was listed
+        return key not in self.__claimed and not os.path.exists(target)
+
+    def isDuplicate(self, source: str, family: list) -> bool:
+        # targets do not exist in dryrun, compare with their sources then
+        existing = list()
+        for target in family:
+            if os.path.normcase(os.path.normpath(target)) == os.path.normcase(os.path.normpath(source)):
+                # the file itself, e.g. processed in place
+                continue
+            if os.path.isfile(target):
+                existing.append(target)
+            elif os.path.isfile(self.__claimed[os.path.normcase(target)]):
+                existing.append(self.__claimed[os.path.normcase(target)])
+        for group in findContentDuplicates(existing + [source], self.__hashAlgorithm):
+            if source in group:
+                return True
+        return False
@@ -0,0 +1,60 @@
+## Micro-benchmark of the filename parser, run with: python tests/bench_filenameParser.py
+import sys
+import os
+import re
+import timeit
+from datetime import datetime
+
+sys.path.append(os.path.abspath("./tests"))
+from test_filenameParser import FILENAME_CORPUS
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer.filenameParser import FilenameParser
+from loguru import logger
+
+
+def legacyGetFilenameTime(filenameWithoutPath: str):
+    ## Matching part of getFilenameTime before the parser existed: patterns built per call, up to two matches
+    datePattern = r"^.*?(\d{4})[-_ ]?(\d{2})[-_ ]?(\d{2}).*?"
+    timePattern = r"(\d{2})[-_: ]?(\d{2})[-_: ]?(\d{2})"
+    datetimePattern = datePattern + "[-_ ]?" + timePattern
+    reDateTime = re.match(datetimePattern, filenameWithoutPath)
+    try:
+        if reDateTime is not None:
+            return datetime(*[int(g) for g in reDateTime.groups()])
+        reDate = re.match(datePattern, filenameWithoutPath)
+        if reDate is not None:
+            return datetime(*[int(g) for g in reDate.groups()], 23, 59, 59, 999)
+    except ValueError:
+        pass
+    return None
+
+
+def parserGetFilenameTime(parser):
+    def getFilenameTime(filenameWithoutPath: str):
+        (dateObj, datetimeObj) = parser.parse(filenameWithoutPath)
+        if datetimeObj is None and dateObj is not None:
+            return datetime(dateObj.year, dateObj.month, dateObj.day, 23, 59, 59, 999)
+        return datetimeObj
+
+    return getFilenameTime
+
+
+def main():
+    logger.remove()
+    repeat = 2000
+    candidates = dict()
+    candidates["legacy (two re.match)"] = legacyGetFilenameTime
+    candidates["parser, generic only"] = parserGetFilenameTime(FilenameParser(dict()))
+    candidates["parser, vendor patterns"] = parserGetFilenameTime(FilenameParser())
+
+    nNames = repeat * len(FILENAME_CORPUS)
+    for name, function in candidates.items():
+        seconds = min(
+            timeit.repeat(lambda: [function(f) for f in FILENAME_CORPUS], number=repeat, repeat=5)
+        )
+        print(f"{name:25s} {seconds / nNames * 1e6:7.2f} us/name")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+## Micro-benchmark of the per-file logging overhead, run with: python tests/bench_logging.py
+# Measures extraction and collision fixing of a synthetic corpus with the console at INFO (the default),
+# without any sink and with a DEBUG logfile, so the cost of unread debug messages becomes visible.
+import sys
+import os
+import shutil
+import tempfile
+import timeit
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.bench import createCorpus
+from loguru import logger
+
+
+def main():
+    workFolder = tempfile.mkdtemp(prefix="autoImageRenamerLogging")
+    try:
+        corpus = os.path.join(workFolder, "corpus")
+        config = {
+            "files": 500,
+            "mix": {"jpg": 80.0, "arw": 10.0, "mov": 10.0},
+            "sizeMin": 4,
+            "sizeMax": 16,
+            "collisions": 0.3,
+            "duplicates": 0.05,
+            "named": 0.5,
+            "seed": 1,
+        }
+        createCorpus(corpus, config)
+        files = sorted(os.listdir(corpus))
+        paths = [os.path.join(corpus, f) for f in files]
+        exts = [os.path.splitext(f)[1] for f in files]
+
+        logger.remove()
+        x = autoImageRenamer.AutoImageRenamer(
+            corpus, corpus, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False
+        )
+        proposals = {p: os.path.join(corpus, str(min(t.values()))) for p, t in x.getAllTimes().items()}
+
+        def perFile():
+            x.extractAllTimes(paths, exts)
+            x.fixCollisions(dict(proposals))
+
+        def consoleOnly(discardDebug):
+            logger.add(lambda m: None, level="INFO")
+            autoImageRenamer.setDebugLogging(not discardDebug)
+
+        sinks = dict()
+        sinks["no sink"] = lambda: None
+        sinks["console INFO"] = lambda: consoleOnly(False)
+        sinks["console INFO, gated"] = lambda: consoleOnly(True)
+        sinks["logfile DEBUG"] = lambda: logger.add(os.path.join(workFolder, "log.txt"), level="DEBUG")
+        sinks["logfile DEBUG json"] = lambda: logger.add(
+            os.path.join(workFolder, "log.json"), level="DEBUG", serialize=True
+        )
+        for name, addSink in sinks.items():
+            logger.remove()
+            autoImageRenamer.setDebugLogging(True)
+            addSink()
+            seconds = min(timeit.repeat(perFile, number=3, repeat=10)) / 3
+            print(f"{name:20s} {seconds / len(paths) * 1e6:8.1f} us/file")
+        logger.remove()
+    finally:
+        shutil.rmtree(workFolder, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,20 @@
 import unittest
 import sys
 import os
+import errno
+from datetime import datetime
 from pathlib import Path
 import shutil
+from unittest import mock
 
 sys.path.append(os.path.abspath("./tests"))
 import TestHelpers
 
 sys.path.append(os.path.abspath("./src"))
 from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.metadataCache import MetadataCache
+from autoImageRenamer.filenameParser import FilenameParser
+from autoImageRenamer.extractors import ResolutionPolicy
 
 
 class Test_ArtificialDatasets(unittest.TestCase):
@@ -275,6 +281,224 @@ class Test_ArtificialDatasets(unittest.TestCase):
         for sourceFile, targetFile in expected.items():
             self.assertEqual(actual[sourceFile], targetFile)
 
+    def test_parallelExtraction_sameAsSerial(self):
+        # mix of exif and filename based files including a collision
+        nFiles = 20
+        for f in range(0, nFiles):
+            tagDict = dict()
+            tagDict["datetime_original"] = TestHelpers.getRandomDatetime(1900)
+            TestHelpers.FileCreator(os.path.join(self.__source, f"f{f}.jpg"), tagDict)
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).touch()
+        Path(os.path.join(self.__source, "20000930_153455.png")).touch()
+
+        # run DUT serially and with both pool kinds
+        serial = autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__target, self.__action, self.__interactive, self.__append
+        )
+        for executor in autoImageRenamer.AutoImageRenamer.Executor:
+            parallel = autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, self.__action, self.__interactive, self.__append,
+                jobs=4, executor=executor
+            )
+
+            # Compare including order
+            self.assertEqual(list(parallel.getFinalRenames().items()), list(serial.getFinalRenames().items()))
+            self.assertEqual(list(parallel.getFromMethods().items()), list(serial.getFromMethods().items()))
+
+    def test_metadataCache_warmRunDoesNotExtract(self):
+        for f in range(0, 5):
+            tagDict = dict()
+            tagDict["datetime_original"] = TestHelpers.getRandomDatetime(1900)
+            TestHelpers.FileCreator(os.path.join(self.__source, f"f{f}.jpg"), tagDict)
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).touch()
+        cacheFile = os.path.join(self.__source, "cache.sqlite")
+
+        # cold run fills the cache
+        with MetadataCache(cacheFile) as cache:
+            cold = autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, self.__action, self.__interactive, self.__append, cache=cache
+            )
+
+        # warm run must not parse any file
+        with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getTimes", side_effect=AssertionError):
+            with MetadataCache(cacheFile) as cache:
+                warm = autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, self.__action, self.__interactive, self.__append, cache=cache
+                )
+        self.assertEqual(warm.getFinalRenames(), cold.getFinalRenames())
+        self.assertEqual(warm.getFromMethods(), cold.getFromMethods())
+
+        # a changed file is extracted again
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"changed")
+        with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getTimes", return_value=dict()) as getTimes:
+            with MetadataCache(cacheFile) as cache:
+                autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, self.__action, self.__interactive, self.__append, cache=cache
+                )
+        self.assertEqual(getTimes.call_count, 1)
+
+    def test_metadataCache_newPatterns(self):
+        # times cached with other filename patterns are extracted again
+        Path(os.path.join(self.__source, "scan_30.09.2000.jpg")).touch()
+        cacheFile = os.path.join(self.__source, "cache.sqlite")
+        with MetadataCache(cacheFile) as cache:
+            cold = autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, self.__action, self.__interactive, self.__append, cache=cache
+            )
+        # no time found in the name
+        self.assertEqual(cold.getFinalRenames(), dict())
+
+        parser = FilenameParser()
+        parser.register("scan", r"^scan_(?P<day>\d{2})\.(?P<month>\d{2})\.(?P<year>\d{4})", first=True)
+        with MetadataCache(cacheFile) as cache:
+            warm = autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, self.__action, self.__interactive, self.__append, cache=cache, filenameParser=parser
+            )
+        self.assertEqual(list(warm.getFinalRenames().values()), [os.path.join(self.__target, "2000-09-30.jpg")])
+
+    def test_metadataCache_otherPolicy(self):
+        # priority stops after EXIF, the times cached by it are incomplete for oldest
+        tagDict = dict()
+        tagDict["datetime_original"] = datetime(2010, 1, 1, 10, 0, 0)
+        TestHelpers.FileCreator(os.path.join(self.__source, "2000 09 30 15 34 55.jpg"), tagDict)
+        cacheFile = os.path.join(self.__source, "cache.sqlite")
+        for policy, expected in [("priority", "2010-01-01_10-00-00.jpg"), ("oldest", "2000-09-30_15-34-55.jpg")]:
+            with MetadataCache(cacheFile) as cache:
+                x = autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, self.__action, self.__interactive, self.__append, cache=cache,
+                    policy=ResolutionPolicy.parse(policy)
+                )
+            self.assertEqual(list(x.getFinalRenames().values()), [os.path.join(self.__target, expected)])
+
+    def test_findContentDuplicates_stages(self):
+        # large files with same head and tail, differing only in the middle
+        size = 3 * autoImageRenamer.PARTIAL_HASH_BYTES
+        contents = dict()
+        contents["a"] = bytes(size)
+        contents["b"] = bytes(size)
+        contents["c"] = bytes(size // 2) + b"x" + bytes(size - size // 2 - 1)
+        contents["d"] = bytes(size - 1)
+        contents["e"] = b"small"
+        contents["f"] = b"small"
+        filenames = list()
+        for name, content in contents.items():
+            filename = os.path.join(self.__source, name)
+            Path(filename).write_bytes(content)
+            filenames.append(filename)
+
+        for algorithm in ["md5", "blake2b"]:
+            duplicates = autoImageRenamer.findContentDuplicates(filenames, algorithm)
+            self.assertEqual(
+                sorted(duplicates),
+                sorted([[filenames[0], filenames[1]], [filenames[4], filenames[5]]]),
+            )
+
+    def test_recursive(self):
+        files = [
+            "2000 09 30 15 34 55.jpg",
+            os.path.join("a", "2001 01 01 01 01 01.jpg"),
+            os.path.join("a", "b", "2002 02 02 02 02 02.jpg"),
+            os.path.join("a", "b", "2003 03 03 03 03 03.png"),
+            os.path.join("a-c", "2004 04 04 04 04 04.jpg"),
+            os.path.join("skip", "2005 05 05 05 05 05.jpg"),
+        ]
+        for f in files:
+            os.makedirs(os.path.dirname(os.path.join(self.__source, f)), exist_ok=True)
+            Path(os.path.join(self.__source, f)).touch()
+
+        def run(**kwargs):
+            ir = autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, self.__action, self.__interactive, self.__append, **kwargs
+            )
+            actual = ir.getFinalRenames()
+            return [os.path.relpath(k, self.__source) for k in actual.keys()], [
+                os.path.relpath(v, self.__target) for v in actual.values()
+            ]
+
+        # flat run is unchanged
+        self.assertEqual(run(), ([files[0]], ["2000-09-30_15-34-55.jpg"]))
+
+        # full depth keeps the structure in deterministic order
+        (sources, targets) = run(maxDepth=None)
+        self.assertEqual(sources, files)
+        self.assertEqual(targets[2], os.path.join("a", "b", "2002-02-02_02-02-02.jpg"))
+
+        # depth limit, include and exclude patterns
+        self.assertEqual(run(maxDepth=1)[0], [files[0], files[1], files[4], files[5]])
+        self.assertEqual(run(maxDepth=None, include=["*.png"])[0], [files[3]])
+        self.assertEqual(run(maxDepth=None, exclude=["skip", "a"])[0], [files[0], files[4]])
+
+    def test_concurrentCopy(self):
+        shutil.rmtree(self.__target, ignore_errors=True)
+        contents = dict()
+        for f in range(0, 12):
+            filename = f"2000 09 30 15 34 {f:02d}.jpg"
+            contents[f"2000-09-30_15-34-{f:02d}.jpg"] = os.urandom(1000 * f)
+            Path(os.path.join(self.__source, filename)).write_bytes(contents[f"2000-09-30_15-34-{f:02d}.jpg"])
+
+        try:
+            for fsyncPolicy in autoImageRenamer.FsyncPolicy:
+                autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, autoImageRenamer.AutoImageRenamer.Action.copy,
+                    self.__interactive, self.__append, copyJobs=4, fsyncPolicy=fsyncPolicy
+                )
+                self.assertEqual(sorted(os.listdir(self.__target)), sorted(contents.keys()))
+                for name, content in contents.items():
+                    self.assertEqual(Path(os.path.join(self.__target, name)).read_bytes(), content)
+        finally:
+            shutil.rmtree(self.__target, ignore_errors=True)
+
+    def test_linkActions(self):
+        shutil.rmtree(self.__target, ignore_errors=True)
+        source = os.path.join(self.__source, "2000 09 30 15 34 55.jpg")
+        target = os.path.join(self.__target, "2000-09-30_15-34-55.jpg")
+        Path(source).write_bytes(os.urandom(5000))
+
+        def run(action):
+            shutil.rmtree(self.__target, ignore_errors=True)
+            autoImageRenamer.AutoImageRenamer(self.__source, self.__target, action, self.__interactive, self.__append)
+            self.assertEqual(Path(target).read_bytes(), Path(source).read_bytes())
+
+        try:
+            run(autoImageRenamer.AutoImageRenamer.Action.link)
+            self.assertTrue(os.path.samefile(source, target))
+
+            # whether the filesystem supports clones or not, the result is an independent copy
+            run(autoImageRenamer.AutoImageRenamer.Action.reflink)
+            self.assertFalse(os.path.samefile(source, target))
+
+            # across devices: fall back to a copy
+            crossDevice = OSError(errno.EXDEV, "Invalid cross-device link")
+            with mock.patch.object(os, "link", side_effect=crossDevice):
+                run(autoImageRenamer.AutoImageRenamer.Action.link)
+            self.assertFalse(os.path.samefile(source, target))
+        finally:
+            shutil.rmtree(self.__target, ignore_errors=True)
+
+    def test_linkActions_existingTarget(self):
+        # the collision handling keeps the name of an identical file in the target, it is replaced like by a copy
+        source = os.path.join(self.__source, "2000 09 30 15 34 55.jpg")
+        target = os.path.join(self.__target, "2000-09-30_15-34-55.jpg")
+        Path(source).write_bytes(os.urandom(5000))
+        os.makedirs(self.__target, exist_ok=True)
+        shutil.copyfile(source, target)
+        Action = autoImageRenamer.AutoImageRenamer.Action
+        try:
+            # the second link finds the link of the first one
+            for action in [Action.reflink, Action.reflink, Action.link, Action.link]:
+                renamer = autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, action, self.__interactive, self.__append, run=False
+                )
+                renamer.scan()
+                with mock.patch.object(autoImageRenamer.logger, "error", side_effect=AssertionError):
+                    self.assertEqual(renamer.takeAction(None, action), 1)
+                self.assertEqual(renamer.getFinalRenames(), {source: target})
+                self.assertEqual(Path(target).read_bytes(), Path(source).read_bytes())
+                self.assertEqual(os.path.samefile(source, target), action == Action.link)
+            self.assertEqual(os.listdir(self.__target), ["2000-09-30_15-34-55.jpg"])
+        finally:
+            shutil.rmtree(self.__target, ignore_errors=True)
+
     def test_emptyFolder_noException(self):
         ir = autoImageRenamer.AutoImageRenamer(
             self.__source, self.__target, self.__action, self.__interactive, self.__append
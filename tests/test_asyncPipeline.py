@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import shutil
+import asyncio
+from pathlib import Path
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.asyncPipeline import scan, apply
+
+Action = autoImageRenamer.AutoImageRenamer.Action
+
+
+class Test_AsyncPipeline(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        for f in range(0, 20):
+            Path(os.path.join(self.__source, f"2000 09 30 15 34 {f:02d}.jpg")).write_bytes(bytes([f]))
+        # same time as another file, different content
+        Path(os.path.join(self.__source, "20000930_153400.jpg")).write_bytes(b"other")
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def test_scanLikeDryrun(self):
+        expected = autoImageRenamer.AutoImageRenamer(self.__source, self.__target, Action.dryrun, False, False).getFinalRenames()
+
+        progress = list()
+
+        async def collect():
+            return [record async for record in scan(self.__source, self.__target, jobs=4, progress=lambda *p: progress.append(p))]
+
+        records = asyncio.run(collect())
+        self.assertEqual(
+            {r["source"]: r["target"] for r in records}, {os.path.abspath(k): os.path.abspath(v) for k, v in expected.items()}
+        )
+        self.assertEqual(progress[0], ("extract", 21, None))
+        self.assertEqual(progress[-1], ("collisions", 21, 21))
+
+    def test_apply(self):
+        progress = list()
+
+        async def run():
+            return await apply(
+                scan(self.__source, self.__target), Action.copy, jobs=4, progress=lambda *p: progress.append(p)
+            )
+
+        self.assertEqual(asyncio.run(run()), 21)
+        self.assertEqual(len(os.listdir(self.__target)), 21)
+        self.assertEqual(progress[-1], ("apply", 21, 21))
+
+    def test_cancel(self):
+        async def run():
+            task = None
+
+            def cancelEarly(stage, done, total):
+                if done == 2:
+                    task.cancel()
+
+            records = [record async for record in scan(self.__source, self.__target)]
+            task = asyncio.ensure_future(apply(records, Action.copy, jobs=2, progress=cancelEarly))
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        # the operations in flight are completed, no further ones are started
+        self.assertLess(len(os.listdir(self.__target)), 21)
+        self.assertGreaterEqual(len(os.listdir(self.__target)), 2)
+
+    def test_noRun(self):
+        renamer = autoImageRenamer.AutoImageRenamer(self.__source, self.__target, Action.copy, False, False, run=False)
+        self.assertEqual(renamer.getFinalRenames(), dict())
+        self.assertEqual(os.listdir(self.__target), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
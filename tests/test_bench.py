@@ -0,0 +1,59 @@
+import unittest
+import sys
+import os
+import shutil
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.bench import createCorpus, runBenchmark
+
+
+class Test_Bench(unittest.TestCase):
+    def setUp(self):
+        self.__work = os.path.join(os.getcwd(), "tests", "tempBench")
+        shutil.rmtree(self.__work, ignore_errors=True)
+        os.mkdir(self.__work)
+        self.__corpus = os.path.join(self.__work, "corpus")
+        self.__config = {
+            "files": 40,
+            "mix": {"jpg": 1.0, "arw": 1.0, "mov": 1.0},
+            "sizeMin": 1,
+            "sizeMax": 8,
+            "collisions": 0.2,
+            "duplicates": 0.1,
+            "named": 0.3,
+            "seed": 3,
+        }
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.__work, ignore_errors=True)
+        return super().tearDown()
+
+    def test_corpusIsDeterministicAndReadable(self):
+        stats = createCorpus(self.__corpus, self.__config)
+        self.assertEqual(stats["files"], 40)
+        names = sorted(os.listdir(self.__corpus))
+
+        other = os.path.join(self.__work, "other")
+        createCorpus(other, self.__config)
+        self.assertEqual(names, sorted(os.listdir(other)))
+
+        # every synthetic file carries a time readable by the regular extraction
+        x = autoImageRenamer.AutoImageRenamer(
+            self.__corpus, self.__corpus, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False
+        )
+        self.assertEqual(len(x.getFinalRenames()), 40)
+        for methods in x.getFromMethods().values():
+            self.assertTrue("EXIF DateTimeOriginal" in methods or "mov" in methods)
+
+    def test_runBenchmark(self):
+        createCorpus(self.__corpus, self.__config)
+        stages = runBenchmark(self.__corpus, self.__work)
+        for name in ["listing", "extract.filename", "extract.exif", "extract.movie", "extract.hachoir-fallback", "scan", "collisions", "hash.full", "action.copy"]:
+            self.assertIn(name, stages)
+            self.assertGreaterEqual(stages[name]["seconds"], 0)
+        self.assertEqual(stages["listing"]["items"], 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
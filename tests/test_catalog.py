@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import shutil
+import subprocess
+from datetime import date, datetime
+from pathlib import Path
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.bench import createJpeg
+from autoImageRenamer.catalog import Catalog
+from autoImageRenamer.hashing import getFileHash
+
+Action = autoImageRenamer.AutoImageRenamer.Action
+
+
+class Test_Catalog(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        self.__catalogFile = os.path.join(self.__target, "catalog.sqlite")
+        for f in range(0, 25):
+            Path(os.path.join(self.__source, f"2024 07 {13 + f % 2:02d} 10 00 {f:02d}.jpg")).write_bytes(bytes([f]) * 10)
+        # colliding with the first file with the same size, so both get hashed
+        Path(os.path.join(self.__source, "20240713_100000.jpg")).write_bytes(b"other" * 2)
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def copy(self, action=Action.copy, batchSize: int = 10):
+        with Catalog(self.__catalogFile) as catalog:
+            catalog.BATCH_SIZE = batchSize
+            autoImageRenamer.AutoImageRenamer(self.__source, self.__target, action, False, False, catalog=catalog)
+
+    def test_catalog(self):
+        self.copy()
+        with Catalog(self.__catalogFile) as catalog:
+            rows = list(catalog.query())
+            self.assertEqual(len(rows), 26)
+            self.assertEqual(len(list(catalog.query(taken="2024-07-13"))), 14)
+            self.assertEqual(len(list(catalog.query(taken="2024-07"))), 26)
+            self.assertEqual(list(catalog.query(taken="2024-07-15")), list())
+            self.assertEqual(len(list(catalog.query(imported=date.today().isoformat()))), 26)
+            self.assertEqual(len(list(catalog.query(only="filename"))), 26)
+            self.assertEqual(list(catalog.query(only="exif")), list())
+            self.assertEqual(len(list(catalog.query(timeOf="2024-07-14T10:00:01"))), 1)
+
+            source = os.path.join(self.__source, "20240713_100000.jpg")
+            (row,) = catalog.query(digest=getFileHash(source))
+            self.assertEqual(row["source"], source)
+            self.assertEqual(row["target"], os.path.join(self.__target, "2024-07-13_10-00-00_002.jpg"))
+            self.assertEqual(row["methods"], "filename")
+            self.assertEqual(row["size"], 10)
+
+    def test_selectedTime(self):
+        # the date in the name confirms the EXIF datetime of its day, which is the one selected.
+        # Listed after the other files, so the filename has the lower method bit
+        Path(os.path.join(self.__source, "scan 2010 01 01.jpg")).write_bytes(createJpeg(datetime(2010, 1, 1, 10, 0, 0), 1024))
+        self.copy()
+        with Catalog(self.__catalogFile) as catalog:
+            (row,) = catalog.query(taken="2010")
+        self.assertEqual(row["taken"], "2010-01-01T10:00:00")
+        self.assertEqual(row["target"], os.path.join(self.__target, "2010-01-01_10-00-00.jpg"))
+        self.assertIn("filename", row["methods"].split(","))
+
+    def test_runs(self):
+        # a dryrun is not cataloged, a second run adds its files
+        self.copy(Action.dryrun)
+        with Catalog(self.__catalogFile) as catalog:
+            self.assertEqual(list(catalog.query()), list())
+        self.copy(Action.rename, batchSize=1000)
+        with Catalog(self.__catalogFile) as catalog:
+            rows = list(catalog.query())
+        self.assertEqual(len(rows), 26)
+        self.assertEqual({row["action"] for row in rows}, {"rename"})
+        for row in rows:
+            self.assertTrue(os.path.exists(row["target"]))
+
+    def test_queryCommand(self):
+        self.copy()
+        env = dict(os.environ, PYTHONPATH=os.path.abspath("./src"))
+        result = subprocess.run(
+            [sys.executable, "-m", "autoImageRenamer", "query", self.__catalogFile, "--taken=2024-07-14", "--only=filename"],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        )
+        lines = result.stdout.splitlines()
+        self.assertEqual(len(lines), 12)
+        self.assertEqual(lines[0].split("\t")[0], "2024-07-14T10:00:01")
+
+
+if __name__ == "__main__":
+    unittest.main()
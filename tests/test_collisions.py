@@ -0,0 +1,94 @@
+import unittest
+import sys
+import os
+import shutil
+import time
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer.collisions import CollisionResolver
+
+
+class Test_CollisionResolver(unittest.TestCase):
+    def setUp(self):
+        self.folderIn = os.path.abspath("./tests/tempIn")
+        self.folderOut = os.path.abspath("./tests/tempOut")
+        for folder in [self.folderIn, self.folderOut]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.makedirs(folder)
+
+    def tearDown(self):
+        for folder in [self.folderIn, self.folderOut]:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    def writeFile(self, folder, name, content):
+        filename = os.path.join(folder, name)
+        with open(filename, "wb") as f:
+            f.write(content)
+        return filename
+
+    def resolve(self, proposals: dict) -> dict:
+        sources = list(proposals)
+        resolved = dict(proposals)
+        for index, target in CollisionResolver().resolve(
+            len(sources), sources.__getitem__, lambda i: os.path.split(proposals[sources[i]]), dict()
+        ):
+            resolved[sources[index]] = target
+        return resolved
+
+    def test_existingTargetFile(self):
+        # 2021.jpg and 2021_001.jpg are already in the output folder
+        self.writeFile(self.folderOut, "2021.jpg", b"old")
+        self.writeFile(self.folderOut, "2021_001.jpg", b"older")
+        source = self.writeFile(self.folderIn, "a.jpg", b"new")
+
+        resolved = self.resolve({source: os.path.join(self.folderOut, "2021.jpg")})
+        self.assertEqual(resolved[source], os.path.join(self.folderOut, "2021_002.jpg"))
+
+    def test_existingTargetSameContent(self):
+        self.writeFile(self.folderOut, "2021.jpg", b"same")
+        same = self.writeFile(self.folderIn, "a.jpg", b"same")
+        other = self.writeFile(self.folderIn, "b.jpg", b"other")
+        target = os.path.join(self.folderOut, "2021.jpg")
+
+        resolved = self.resolve({same: target, other: target})
+        self.assertEqual(resolved[same], target)
+        self.assertEqual(resolved[other], os.path.join(self.folderOut, "2021_001.jpg"))
+
+    def test_counterSkipsProposals(self):
+        # a file already proposed as 2021_001.jpg is not overwritten by the counter of 2021.jpg
+        sources = [self.writeFile(self.folderIn, f"{i}.jpg", bytes([i])) for i in range(3)]
+        proposals = {
+            sources[0]: os.path.join(self.folderOut, "2021.jpg"),
+            sources[1]: os.path.join(self.folderOut, "2021.jpg"),
+            sources[2]: os.path.join(self.folderOut, "2021_001.jpg"),
+        }
+        resolved = self.resolve(proposals)
+        self.assertEqual(len(set(resolved.values())), 3)
+        self.assertEqual(resolved[sources[2]], os.path.join(self.folderOut, "2021_001.jpg"))
+
+    def test_sourcesInTargetFolder(self):
+        # renaming in place: the sources themselves are no existing files to avoid
+        source = self.writeFile(self.folderOut, "2021.jpg", b"a")
+        resolved = self.resolve({source: os.path.join(self.folderOut, "2021.jpg")})
+        self.assertEqual(resolved[source], os.path.join(self.folderOut, "2021.jpg"))
+
+    def test_burstScalesLinearly(self):
+        # same-second burst shots: all proposals in one bucket, distinct sizes so no content is read
+        def burst(n):
+            sources = [self.writeFile(self.folderIn, f"{n}_{i}.jpg", b"x" * (i + 1)) for i in range(n)]
+            target = os.path.join(self.folderOut, "2021.jpg")
+            start = time.perf_counter()
+            resolved = self.resolve({source: target for source in sources})
+            seconds = time.perf_counter() - start
+            self.assertEqual(len(set(resolved.values())), n)
+            self.assertEqual(resolved[sources[-1]], os.path.join(self.folderOut, f"2021_{n:03d}.jpg"))
+            return seconds
+
+        small = burst(500)
+        large = burst(4000)
+        # quadratic behaviour would be 64 times slower, allow plenty of noise for linear
+        self.assertLess(large, max(small, 0.01) * 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import sys
+import os
+import shutil
+from pathlib import Path
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.contentIndex import ContentIndex, DedupMode
+
+Action = autoImageRenamer.AutoImageRenamer.Action
+
+
+class Test_ContentIndex(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def run_renamer(self, mode, action=Action.copy):
+        with ContentIndex(self.__target, mode) as contentIndex:
+            autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, action, False, False, contentIndex=contentIndex
+            )
+
+    def listTarget(self):
+        return sorted(name for name in os.listdir(self.__target) if not name.startswith("."))
+
+    def test_skipReimport(self):
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        self.run_renamer(DedupMode.skip)
+        self.assertEqual(self.listTarget(), ["2000-09-30_15-34-55.jpg"])
+
+        # the same photo with another name next month, and a new one of the same size
+        shutil.rmtree(self.__source)
+        os.mkdir(self.__source)
+        Path(os.path.join(self.__source, "2000 10 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "2000 11 30 15 34 55.jpg")).write_bytes(b"b")
+        self.run_renamer(DedupMode.skip)
+        self.assertEqual(self.listTarget(), ["2000-09-30_15-34-55.jpg", "2000-11-30_15-34-55.jpg"])
+
+    def test_nFiles(self):
+        # only the files acted on are counted, not the duplicates skipped or linked
+        Path(os.path.join(self.__target, "existing.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "2000 10 30 15 34 55.jpg")).write_bytes(b"b")
+        for mode, action, expected in [(DedupMode.skip, Action.dryrun, 1), (DedupMode.mark, Action.dryrun, 2), (DedupMode.link, Action.copy, 1)]:
+            with ContentIndex(self.__target, mode) as contentIndex:
+                renamer = autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, action, False, False, contentIndex=contentIndex, run=False
+                )
+                renamer.scan()
+                self.assertEqual(renamer.takeAction(None, action), expected)
+
+    def test_withinBatch(self):
+        # different times, same content: the second one is found in the index entries added by the first copy
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "2001 09 30 15 34 55.jpg")).write_bytes(b"a")
+        self.run_renamer(DedupMode.mark)
+        self.assertEqual(self.listTarget(), ["2000-09-30_15-34-55.jpg", "DUPLICATE_2001-09-30_15-34-55.jpg"])
+
+    def test_inPlace(self):
+        # target folder == source folder: the other incoming file is no library file yet, only one of both is kept
+        for mode, expected in [
+            (DedupMode.skip, ["2000-09-30_15-34-55.jpg", "2001 01 01 01 01 01.jpg"]),
+            (DedupMode.link, ["2000-09-30_15-34-55.jpg", "2001-01-01_01-01-01.jpg"]),
+        ]:
+            for name in os.listdir(self.__source):
+                os.remove(os.path.join(self.__source, name))
+            for name in ["2000 09 30 15 34 55.jpg", "2001 01 01 01 01 01.jpg"]:
+                Path(os.path.join(self.__source, name)).write_bytes(b"a")
+            with ContentIndex(self.__source, mode, rebuild=True) as contentIndex:
+                autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__source, Action.rename, False, False, contentIndex=contentIndex
+                )
+            self.assertEqual(sorted(name for name in os.listdir(self.__source) if not name.startswith(".")), expected)
+        # the second one is a link to the first, renamed before
+        self.assertTrue(os.path.samefile(*[os.path.join(self.__source, name) for name in expected]))
+
+    def test_link(self):
+        Path(os.path.join(self.__target, "existing.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        self.run_renamer(DedupMode.link, Action.rename)
+        target = os.path.join(self.__target, "2000-09-30_15-34-55.jpg")
+        self.assertTrue(os.path.samefile(target, os.path.join(self.__target, "existing.jpg")))
+        self.assertEqual(os.listdir(self.__source), [])
+
+    def test_dryrun(self):
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        self.run_renamer(DedupMode.skip, Action.dryrun)
+        # nothing has been written, so nothing must remain in the index
+        Path(os.path.join(self.__source, "2000 10 30 15 34 55.jpg")).write_bytes(b"a")
+        os.remove(os.path.join(self.__source, "2000 09 30 15 34 55.jpg"))
+        self.run_renamer(DedupMode.skip)
+        self.assertEqual(self.listTarget(), ["2000-10-30_15-34-55.jpg"])
+
+    def test_reindex(self):
+        os.mkdir(os.path.join(self.__target, "2000"))
+        Path(os.path.join(self.__target, "2000", "a.jpg")).write_bytes(b"a")
+        with ContentIndex(self.__target) as contentIndex:
+            self.assertEqual(contentIndex.find(os.path.join(self.__target, "2000", "a.jpg"), 1), (None, None))
+            source = os.path.join(self.__source, "x.jpg")
+            Path(source).write_bytes(b"a")
+            self.assertEqual(contentIndex.find(source, 1)[0], os.path.join(self.__target, "2000", "a.jpg"))
+
+            # changed behind the back of the index
+            Path(os.path.join(self.__target, "2000", "a.jpg")).write_bytes(b"c")
+            self.assertIsNone(contentIndex.find(source, 1)[0])
+
+            Path(os.path.join(self.__target, "b.jpg")).write_bytes(b"a")
+            self.assertIsNone(contentIndex.find(source, 1)[0])
+            self.assertEqual(contentIndex.reindex(), 2)
+            self.assertEqual(contentIndex.find(source, 1)[0], os.path.join(self.__target, "b.jpg"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import shutil
+import struct
+from datetime import datetime
+
+sys.path.append(os.path.abspath("./tests"))
+import TestHelpers
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer, exifReader
+
+
+class Test_ExifReader(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        try:
+            shutil.rmtree(self.__source)
+        except:
+            pass
+        os.mkdir(self.__source)
+        self.__ir = autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__source, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False
+        )
+        self.__tagIds = ["EXIF DateTimeOriginal", "EXIF DateTimeDigitized", "Image DateTime"]
+
+    def tearDown(self) -> None:
+        try:
+            shutil.rmtree(self.__source)
+        except:
+            pass
+        return super().tearDown()
+
+    def createImage(self, filename):
+        tagDict = dict()
+        tagDict["datetime_original"] = TestHelpers.getRandomDatetime(1900)
+        tagDict["datetime_digitized"] = TestHelpers.getRandomDatetime(1900)
+        tagDict["datetime"] = TestHelpers.getRandomDatetime(1900)
+        TestHelpers.FileCreator(filename, tagDict)
+
+    def test_fastPath_sameAsExifread(self):
+        for f in range(0, 10):
+            filename = os.path.join(self.__source, f"f{f}.jpg")
+            self.createImage(filename)
+
+            expected = self.__ir.getExifreadTags(filename, self.__tagIds)
+            actual = exifReader.readExifDates(filename)
+            self.assertEqual(len(actual), 3)
+            self.assertEqual(actual, expected)
+
+    def test_noExif_emptyResult(self):
+        filename = os.path.join(self.__source, "f.jpg")
+        TestHelpers.FileCreator(filename, dict())
+        with open(filename, "rb") as f:
+            data = f.read()
+        # strip the APP1 segment the exif module adds
+        pos = data.find(b"Exif\x00\x00")
+        if pos > 0:
+            length = struct.unpack(">H", data[pos - 2 : pos])[0]
+            data = data[: pos - 4] + data[pos - 2 + length :]
+        with open(filename, "wb") as f:
+            f.write(data)
+
+        self.assertEqual(exifReader.readExifDates(filename), dict())
+
+    def createTiff(self, filename, dateTime: str, ifdOffset: int):
+        ## Minimal little endian TIFF with a single IFD0 holding DateTime
+        value = dateTime.encode("ascii") + b"\x00"
+        ifd = struct.pack("<H", 1)
+        ifd += struct.pack("<HHII", 0x0132, 2, len(value), ifdOffset + 18)
+        ifd += struct.pack("<I", 0)
+        data = b"II*\x00" + struct.pack("<I", ifdOffset)
+        data += bytes(ifdOffset - len(data)) + ifd + value
+        with open(filename, "wb") as f:
+            f.write(data)
+
+    def test_tiff_fastPath(self):
+        filename = os.path.join(self.__source, "f.arw")
+        self.createTiff(filename, "2021:06:21 10:46:36", 8)
+
+        self.assertEqual(exifReader.readExifDates(filename), {"Image DateTime": "2021:06:21 10:46:36"})
+        self.assertEqual(
+            self.__ir.getExifreadTags(filename, self.__tagIds), {"Image DateTime": "2021:06:21 10:46:36"}
+        )
+
+    def test_headerTooLarge_fallbackToExifread(self):
+        filename = os.path.join(self.__source, "f.arw")
+        self.createTiff(filename, "2021:06:21 10:46:36", 2 * exifReader.MAX_HEADER_BYTES)
+
+        with self.assertRaises(exifReader.ExifHeaderError):
+            exifReader.readExifDates(filename)
+
+        exifReader.readStatistics.reset()
+        times = self.__ir.getExifTimes(filename)
+        self.assertEqual(times["Image DateTime"], datetime(2021, 6, 21, 10, 46, 36))
+        self.assertEqual(exifReader.readStatistics.files[(".arw", "exifread")], 1)
+        self.assertEqual(exifReader.readStatistics.files[(".arw", "fast path")], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+import unittest
+import sys
+import os
+import shutil
+import struct
+import zlib
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.bench import createIsoBmff, createJpeg, createTiff
+from autoImageRenamer.extractors import Extractor, ExtractorRegistry, ResolutionPolicy, dateOnly, defaultRegistry, extractExif, extractFilename
+from autoImageRenamer.metrics import metrics
+
+
+def createPng(exif: bytes = None) -> bytes:
+    def chunk(chunkType: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", zlib.crc32(chunkType + data))
+
+    data = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+    if exif is not None:
+        data += chunk(b"eXIf", exif)
+    return data + chunk(b"IDAT", zlib.compress(b"\x00\x00")) + chunk(b"IEND", b"")
+
+
+class Test_Extractors(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        shutil.rmtree(self.__source, ignore_errors=True)
+        os.mkdir(self.__source)
+        self.__time = datetime(2012, 3, 4, 5, 6, 7)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.__source, ignore_errors=True)
+        return super().tearDown()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.__source, name)
+        Path(path).write_bytes(content)
+        return path
+
+    def renamer(self, extractors=None, policy=None):
+        return autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__source, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False,
+            extractors=extractors, policy=policy
+        )
+
+    def test_mp4GoesToHachoir(self):
+        path = self.write("clip.mp4", createIsoBmff(self.__time, 4096, b"isom"))
+        with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getExifTimes", side_effect=AssertionError):
+            times = self.renamer().getTimes(path, ".mp4")
+        self.assertEqual(times, {"mov": self.__time})
+
+    def test_png(self):
+        withExif = self.write("exif.png", createPng(createTiff(self.__time)))
+        withoutExif = self.write("plain.png", createPng())
+        x = self.renamer()
+        # neither needs the exifread fallback
+        with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getExifreadTags", side_effect=AssertionError):
+            self.assertEqual(x.getTimes(withExif, ".png")["EXIF DateTimeOriginal"], self.__time)
+            self.assertEqual(x.getTimes(withoutExif, ".png"), dict())
+
+    def test_magicBytes(self):
+        # video with the extension of an image
+        path = self.write("clip.jpg", createIsoBmff(self.__time, 4096, b"qt  "))
+        self.assertEqual(self.renamer().getTimes(path, ".jpg"), {"mov": self.__time})
+
+    def test_trustedSourceSkipsExpensiveExtractors(self):
+        path = self.write("IMG_20100101_101010.jpg", createJpeg(self.__time, 1024))
+        expensive = mock.Mock(return_value={"expensive": datetime(1990, 1, 1)})
+        registry = ExtractorRegistry(
+            [
+                Extractor("exif", extractExif, frozenset([".jpg"]), (), 10, frozenset(["EXIF DateTimeOriginal"])),
+                Extractor("expensive", expensive, frozenset([".jpg"]), (), 1000),
+                Extractor("filename", extractFilename, None, (), 1),
+            ]
+        )
+        x = self.renamer(registry)
+        times = x.getTimes(path, ".jpg")
+        expensive.assert_not_called()
+        self.assertEqual(list(times.keys()), ["EXIF DateTimeOriginal", "EXIF DateTimeDigitized", "Image DateTime", "filename"])
+
+        # without a trusted answer the expensive extractor runs
+        noExif = self.write("2011 01 01.jpg", b"no metadata")
+        self.assertEqual(x.getTimes(noExif, ".jpg")["expensive"], datetime(1990, 1, 1))
+        expensive.assert_called_once()
+
+    def test_resolutionPolicies(self):
+        # full datetime in the name (older) and EXIF DateTimeOriginal
+        path = self.write("IMG_20100101_101010.jpg", createJpeg(self.__time, 1024))
+        exif = mock.Mock(side_effect=extractExif)
+        registry = ExtractorRegistry(
+            [
+                Extractor("exif", exif, frozenset([".jpg"]), (), 10, frozenset(["EXIF DateTimeOriginal"])),
+                Extractor("filename", extractFilename, None, (), 1),
+            ]
+        )
+        Mode = ResolutionPolicy.Mode
+        metrics.enable()
+        try:
+            x = self.renamer(registry, ResolutionPolicy(Mode.first, 1))
+            metrics.reset()
+            times = x.getTimes(path, ".jpg")
+            exif.assert_not_called()
+            self.assertEqual(x.findOldestTime(times), (datetime(2010, 1, 1, 10, 10, 10), ["filename"]))
+            self.assertEqual(list(times.keys()), ["filename"])
+            self.assertEqual(metrics.getStages()["exif"]["skipped"], 1)
+
+            filenameTime = datetime(2010, 1, 1, 10, 10, 10)
+            for mode, expected in [(Mode.oldest, filenameTime), (Mode.first, filenameTime), (Mode.priority, self.__time)]:
+                x = self.renamer(registry, ResolutionPolicy(mode, 2))
+                self.assertEqual(x.findOldestTime(x.getTimes(path, ".jpg"))[0], expected)
+
+            # priority: exif is registered first and wins, the filename is never parsed
+            x = self.renamer(registry, ResolutionPolicy(Mode.priority))
+            metrics.reset()
+            x.getTimes(path, ".jpg")
+            self.assertEqual(metrics.getStages()["filename"]["skipped"], 1)
+        finally:
+            metrics.enable(False)
+            metrics.reset()
+
+        self.assertEqual(ResolutionPolicy.parse("first:3").n, 3)
+        with self.assertRaises(KeyError):
+            ResolutionPolicy.parse("newest")
+
+    def test_resolvedSkipsMagicBytes(self):
+        # resolved by the name, the magic bytes of the JPEG must not bring EXIF back
+        path = self.write("IMG_20100101_101010.jpg", createJpeg(self.__time, 1024))
+        metrics.enable()
+        try:
+            x = self.renamer(defaultRegistry, ResolutionPolicy.parse("first:1"))
+            metrics.reset()
+            with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getExifTimes", return_value=dict()) as getExifTimes:
+                times = x.getTimes(path, ".jpg")
+            getExifTimes.assert_not_called()
+            self.assertEqual(times, {"filename": datetime(2010, 1, 1, 10, 10, 10)})
+            self.assertEqual(metrics.getStages()["exif"]["skipped"], 1)
+        finally:
+            metrics.enable(False)
+            metrics.reset()
+
+    def test_dateOnlySelection(self):
+        policy = ResolutionPolicy()
+        day = datetime(2010, 1, 1)
+        # a datetime of the same day is more precise, the date confirms it
+        times = {"EXIF DateTimeOriginal": datetime(2010, 1, 1, 23, 59, 59), "filename": dateOnly(day)}
+        self.assertEqual(policy.select(times), (datetime(2010, 1, 1, 23, 59, 59), ["EXIF DateTimeOriginal", "filename"]))
+        # an older date wins against a datetime of a later day
+        times = {"EXIF DateTimeOriginal": datetime(2010, 1, 2, 0, 0, 1), "filename": dateOnly(day)}
+        self.assertEqual(policy.select(times), (dateOnly(day), ["filename"]))
+        # a date alone does not end the search of first
+        self.assertFalse(
+            ResolutionPolicy(ResolutionPolicy.Mode.first).isResolved(None, {"filename": {"filename": dateOnly(day)}})
+        )
+
+    def test_produces(self):
+        # every method found by the default extractors is declared
+        path = self.write("IMG_20100101_101010.jpg", createJpeg(self.__time, 1024))
+        times = self.renamer(policy=ResolutionPolicy(ResolutionPolicy.Mode.oldest)).getTimes(path, ".jpg")
+        self.assertEqual(len(times), 4)
+        self.assertLessEqual(set(times), set(defaultRegistry.getMethods()))
+
+        with self.assertRaises(ValueError):
+            ExtractorRegistry([Extractor("exif", extractExif, frozenset([".jpg"]), (), 10, frozenset(["EXIF DateTimeOriginal"]), frozenset(["Image DateTime"]))])
+
+    def test_newFormat(self):
+        self.write("IMG_20100101_101010.heic", b"not parsed")
+        self.write("2011 01 01.jpg", b"no metadata")
+        self.assertNotIn(".heic", defaultRegistry.getExtensions())
+
+        registry = ExtractorRegistry()
+        registry.register(Extractor("heic", lambda renamer, filename: {"heic": None}, frozenset([".heic"]), (), 50))
+        registry.register(Extractor("filename", extractFilename, None, (), 1))
+        x = self.renamer(registry)
+        self.assertEqual(
+            sorted(os.path.basename(f) for f in x.getFinalRenames().values()), ["2010-01-01_10-10-10.heic"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer.fileTable import FileTable
+
+
+class Test_FileTable(unittest.TestCase):
+    def test_roundtrip(self):
+        table = FileTable()
+        times = {
+            "EXIF DateTimeOriginal": datetime(1901, 2, 3, 4, 5, 6),
+            "filename": datetime(2020, 1, 2, 23, 59, 59, 999),
+        }
+        first = table.add(os.path.join("in", "a.jpg"), os.path.join("out", "1901.jpg"), times, ["EXIF DateTimeOriginal"])
+        second = table.add(os.path.join("in", "b.mov"), os.path.join("out", "2021.mov"), {"mov": datetime(2021, 1, 1)}, ["mov"])
+
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.getSource(first), os.path.join("in", "a.jpg"))
+        self.assertEqual(table.getTarget(second), os.path.join("out", "2021.mov"))
+        self.assertEqual(table.getTimes(first), times)
+        self.assertEqual(table.getFromMethods(first), ["EXIF DateTimeOriginal"])
+        self.assertEqual(table.getFromMethods(second), ["mov"])
+        self.assertEqual(table.getSelected(first), datetime(1901, 2, 3, 4, 5, 6))
+        self.assertEqual(table.find(os.path.join("in", "b.mov")), second)
+        self.assertIsNone(table.find(os.path.join("in", "c.mov")))
+
+        # records added after the first lookup are found as well
+        third = table.add(os.path.join("in", "c.mov"), os.path.join("out", "2021.mov"), {"mov": datetime(2021, 1, 1)}, ["mov"])
+        self.assertEqual(table.find(os.path.join("in", "c.mov")), third)
+        self.assertEqual(table.getTargetKey(second), table.getTargetKey(third))
+
+        table.setTarget(third, os.path.join("out", "2021_001.mov"))
+        table.setHash(third, "00ff")
+        self.assertEqual(list(table.items())[2], (os.path.join("in", "c.mov"), os.path.join("out", "2021_001.mov"), ["mov"]))
+        self.assertEqual(table.getHashes(), {os.path.join("in", "c.mov"): "00ff"})
+        self.assertIsNone(table.getHash(first))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import sys
+import os
+import re
+import json
+import shutil
+from datetime import date, datetime
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer.filenameParser import FilenameParser, FilenameTime
+
+# Real-world file names from phones, cameras, messengers and exports
+FILENAME_CORPUS = [
+    "20000930-153429-98.jpg",
+    "2000 09 30 15 34 55.jpg",
+    "1940 01 02 01 02 03.jpg",
+    "Photo-2021-06-21-10-17-40_8255.JPG",
+    "Video-2021-06-22-10-12-58_8280.MOV",
+    "2000-09-30.arw",
+    "2021-01-12.jpg",
+    "20210605_153227.jpg",
+    "DSC07863.ARW",
+    "DSC07863-2.ARW",
+    "IMG_20210605_152957.jpeg",
+    "IMG_20210605_152957-0033.jpeg",
+    "IMG-20210605-WA0001.jpg",
+    "VID-20190101-WA0012.mp4",
+    "PXL_20230714_081530123.jpg",
+    "IMG_4827.MOV",
+    "IMG_4827 (1).JPG",
+    "Screenshot_2022-11-03-21-04-55-123_com.android.chrome.png",
+    "signal-2022-05-01-14-22-33-123.jpg",
+    "WhatsApp Image 2022-08-01 at 12.34.56.jpeg",
+    "20211399_250000.jpg",
+    "holiday_summer_2019_beach_party_with_friends_and_family_final_version.jpg",
+    "scan0001.png",
+    "2019_0704_some_event.jpg",
+]
+
+
+def legacyFilenameTime(filenameWithoutPath: str):
+    ## Reference implementation with the two separate matches used before the parser existed
+    datePattern = r"^.*?(\d{4})[-_ ]?(\d{2})[-_ ]?(\d{2}).*?"
+    timePattern = r"(\d{2})[-_: ]?(\d{2})[-_: ]?(\d{2})"
+    reDateTime = re.match(datePattern + "[-_ ]?" + timePattern, filenameWithoutPath)
+    try:
+        if reDateTime is not None:
+            return datetime(*[int(g) for g in reDateTime.groups()])
+        reDate = re.match(datePattern, filenameWithoutPath)
+        if reDate is not None:
+            return date(*[int(g) for g in reDate.groups()])
+    except ValueError:
+        pass
+    return None
+
+
+def toLegacy(result: FilenameTime):
+    if result.datetime is not None:
+        return result.datetime
+    return result.date
+
+
+class Test_FilenameParser(unittest.TestCase):
+    def test_sameAsLegacy(self):
+        parser = FilenameParser()
+        for filename in FILENAME_CORPUS:
+            self.assertEqual(toLegacy(parser.parse(filename)), legacyFilenameTime(filename), filename)
+
+    def test_genericOnly_sameAsLegacy(self):
+        parser = FilenameParser(dict())
+        for filename in FILENAME_CORPUS:
+            self.assertEqual(toLegacy(parser.parse(filename)), legacyFilenameTime(filename), filename)
+
+    def test_dateAndDatetime(self):
+        parser = FilenameParser()
+        self.assertEqual(
+            parser.parse("IMG_20210605_152957.jpeg"),
+            FilenameTime(date(2021, 6, 5), datetime(2021, 6, 5, 15, 29, 57)),
+        )
+        self.assertEqual(parser.parse("IMG-20210605-WA0001.jpg"), FilenameTime(date(2021, 6, 5), None))
+        self.assertEqual(parser.parse("DSC07863.ARW"), FilenameTime(None, None))
+
+    def test_loadConfig(self):
+        folder = os.path.join(os.getcwd(), "tests", "tempIn")
+        os.makedirs(folder, exist_ok=True)
+        try:
+            config = os.path.join(folder, "patterns.json")
+            with open(config, "w") as f:
+                json.dump({"dayFirst": r"^(?P<day>\d{2})\.(?P<month>\d{2})\.(?P<year>\d{4})"}, f)
+
+            parser = FilenameParser()
+            parser.loadConfig(config)
+            self.assertEqual(parser.getPatternNames()[0], "dayFirst")
+            self.assertEqual(parser.parse("13.07.2024 party.jpg"), FilenameTime(date(2024, 7, 13), None))
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    unittest.main()
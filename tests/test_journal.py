@@ -0,0 +1,106 @@
+import unittest
+import sys
+import os
+import shutil
+from pathlib import Path
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.contentIndex import ContentIndex, DedupMode
+from autoImageRenamer.journal import Journal, readJournal, resumeJournal, rollbackJournal
+
+Action = autoImageRenamer.AutoImageRenamer.Action
+
+
+class Test_Journal(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        self.__journal = os.path.join(self.__target, "journal.jsonl")
+        self.__names = dict()
+        for f in range(0, 10):
+            name = f"2000 09 30 15 34 {f:02d}.jpg"
+            Path(os.path.join(self.__source, name)).write_bytes(bytes([f]) * 100)
+            self.__names[os.path.join(self.__source, name)] = os.path.join(self.__target, f"2000-09-30_15-34-{f:02d}.jpg")
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def test_runAndRollback(self):
+        with Journal(self.__journal) as journal:
+            autoImageRenamer.AutoImageRenamer(self.__source, self.__target, Action.rename, False, False, journal=journal)
+        (intents, done, undone) = readJournal(self.__journal)
+        self.assertEqual(len(intents), 10)
+        self.assertEqual(done, set(range(10)))
+        self.assertEqual(os.listdir(self.__source), [])
+
+        self.assertEqual(rollbackJournal(self.__journal), 10)
+        for source, target in self.__names.items():
+            self.assertTrue(os.path.exists(source))
+            self.assertFalse(os.path.exists(target))
+        # a second rollback has nothing left to do
+        self.assertEqual(rollbackJournal(self.__journal), 0)
+
+    def test_resumeRename(self):
+        # crash after the intents and 4 renames, before any done marker reached the disk
+        items = [(source, target, ["filename"]) for source, target in self.__names.items()]
+        journal = Journal(self.__journal)
+        journal.begin(items, Action.rename)
+        for source, target, _ in items[0:4]:
+            os.rename(source, target)
+        with open(self.__journal, "a") as f:
+            f.write('{"type": "do')
+        journal.close()
+
+        self.assertEqual(resumeJournal(self.__journal), 6)
+        for source, target in self.__names.items():
+            self.assertFalse(os.path.exists(source))
+            self.assertTrue(os.path.exists(target))
+        self.assertEqual(readJournal(self.__journal)[1], set(range(4, 10)))
+
+    def test_resumeCopy(self):
+        items = [(source, target, ["filename"]) for source, target in self.__names.items()]
+        with Journal(self.__journal) as journal:
+            journal.begin(items, Action.copy)
+            shutil.copyfile(items[0][0], items[0][1])
+            journal.markDone(items[0][0], items[0][1])
+            # interrupted in the middle of the second copy
+            Path(items[1][1]).write_bytes(b"\x01" * 10)
+
+        self.assertEqual(resumeJournal(self.__journal), 9)
+        for source, target in self.__names.items():
+            self.assertEqual(Path(source).read_bytes(), Path(target).read_bytes())
+
+        # copies are removed by a rollback, the sources are kept
+        self.assertEqual(rollbackJournal(self.__journal), 10)
+        self.assertEqual(sorted(os.listdir(self.__target)), ["journal.jsonl"])
+        self.assertEqual(len(os.listdir(self.__source)), 10)
+
+    def test_duplicates(self):
+        # the first file is already in the library: it is journaled with its final target or not at all
+        existing = os.path.join(self.__target, "existing.jpg")
+        Path(existing).write_bytes(bytes([0]) * 100)
+        first = os.path.join(self.__source, "2000 09 30 15 34 00.jpg")
+        for mode, expected in [(DedupMode.skip, None), (DedupMode.mark, os.path.join(self.__target, "DUPLICATE_2000-09-30_15-34-00.jpg"))]:
+            for name in os.listdir(self.__target):
+                if name != "existing.jpg":
+                    os.remove(os.path.join(self.__target, name))
+            with ContentIndex(self.__target, mode) as contentIndex, Journal(self.__journal) as journal:
+                autoImageRenamer.AutoImageRenamer(
+                    self.__source, self.__target, Action.copy, False, False, contentIndex=contentIndex, journal=journal
+                )
+            (intents, done, undone) = readJournal(self.__journal)
+            targets = {intent["source"]: intent["target"] for intent in intents}
+            self.assertEqual(targets.get(first), expected)
+            self.assertEqual(done, {intent["id"] for intent in intents})
+            self.assertEqual(resumeJournal(self.__journal), 0)
+            self.assertFalse(os.path.exists(self.__names[first]))
+
+
+if __name__ == "__main__":
+    unittest.main()
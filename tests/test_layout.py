@@ -0,0 +1,84 @@
+import unittest
+import sys
+import os
+import shutil
+from datetime import date, datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.extractors import dateOnly
+from autoImageRenamer.layout import OutputLayout
+
+Action = autoImageRenamer.AutoImageRenamer.Action
+MONTHLY = "{year}/{year}-{month}/{name}"
+
+
+class Test_Layout(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        for name in ["2000 09 30 15 34 00.jpg", "20000930_153400.jpg", "2000 10 01 08 00 00.JPG", "2001 01 01 00 00 00.jpg"]:
+            Path(os.path.join(self.__source, name)).write_bytes(name.encode())
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def test_format(self):
+        value = datetime(2021, 12, 31, 23, 5, 9)
+        self.assertEqual(OutputLayout().format(value, "IMG_1", ".JPG", "", False), "2021-12-31_23-05-09.jpg")
+        self.assertEqual(
+            OutputLayout().format(value, "IMG_1", ".jpg", "trip", True), os.path.join("trip", "2021-12-31_23-05-09-IMG_1.jpg")
+        )
+        self.assertEqual(
+            OutputLayout(MONTHLY).format(value, "IMG_1", ".jpg", "", False), os.path.join("2021", "2021-12", "2021-12-31_23-05-09.jpg")
+        )
+        self.assertEqual(
+            OutputLayout("{folder}/{date}/{hour}{minute}{second}_{stem}{ext}").format(value, "IMG_1", ".jpg", "", False),
+            os.path.join("2021-12-31", "230509_IMG_1.jpg"),
+        )
+        self.assertEqual(
+            OutputLayout(MONTHLY).format(dateOnly(date(2021, 12, 31)), "a", ".jpg", "", False), os.path.join("2021", "2021-12", "2021-12-31.jpg")
+        )
+        for invalid in ["{year}/{unknown}", "{year}/", "{folder}", "{year", "/{name}"]:
+            with self.assertRaises(ValueError):
+                OutputLayout(invalid)
+
+    def test_shardedCopy(self):
+        # the collision of 2000-09-30 is resolved within its shard, a file of the same name in another shard does not count
+        os.makedirs(os.path.join(self.__target, "2001", "2001-01"))
+        Path(os.path.join(self.__target, "2001", "2001-01", "2000-09-30_15-34-00.jpg")).write_bytes(b"unrelated")
+
+        listed = list()
+        listdir = os.listdir
+        with mock.patch("os.listdir", side_effect=lambda folder: listed.append(folder) or listdir(folder)):
+            renamer = autoImageRenamer.AutoImageRenamer(
+                self.__source, self.__target, Action.copy, False, False, layout=OutputLayout(MONTHLY)
+            )
+        september = os.path.join(self.__target, "2000", "2000-09")
+        self.assertEqual(sorted(os.listdir(september)), ["2000-09-30_15-34-00_001.jpg", "2000-09-30_15-34-00_002.jpg"])
+        self.assertEqual(os.listdir(os.path.join(self.__target, "2000", "2000-10")), ["2000-10-01_08-00-00.jpg"])
+        self.assertEqual(len(os.listdir(os.path.join(self.__target, "2001", "2001-01"))), 2)
+        # only the shards receiving files are looked at, never the library root
+        self.assertNotIn(self.__target, listed)
+        self.assertEqual(len(renamer.getTable().getTargetFolders()), 3)
+
+    def test_foldersMadeOnce(self):
+        made = list()
+        makedirs = os.makedirs
+        with mock.patch("os.makedirs", side_effect=lambda folder, **kwargs: made.append(folder) or makedirs(folder, **kwargs)):
+            autoImageRenamer.AutoImageRenamer(self.__source, self.__target, Action.copy, False, False, layout=OutputLayout(MONTHLY))
+        # os.makedirs calls itself for missing parents
+        self.assertEqual(sorted(made), sorted(set(made)))
+        for shard in [("2000", "2000-09"), ("2000", "2000-10"), ("2001", "2001-01")]:
+            self.assertIn(os.path.join(self.__target, *shard), made)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+from pathlib import Path
+from loguru import logger
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+
+
+class Test_Logging(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        shutil.rmtree(self.__source, ignore_errors=True)
+        os.mkdir(self.__source)
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "20000930_153455.jpg")).write_bytes(b"b")
+        self.__messages = list()
+        self.__sink = logger.add(self.__messages.append, level="DEBUG", serialize=True)
+
+    def tearDown(self) -> None:
+        logger.remove(self.__sink)
+        autoImageRenamer.setDebugLogging(True)
+        shutil.rmtree(self.__source, ignore_errors=True)
+        return super().tearDown()
+
+    def events(self):
+        records = [json.loads(m)["record"] for m in self.__messages]
+        return [r["extra"] for r in records if "event" in r["extra"]]
+
+    def run_dryrun(self):
+        autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__source, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False
+        )
+
+    def test_structuredEvents(self):
+        self.run_dryrun()
+        events = self.events()
+        filenameEvents = [e for e in events if e["event"] == "filename"]
+        self.assertEqual(len(filenameEvents), 2)
+        self.assertTrue(all(e["file"].startswith(self.__source) for e in filenameEvents))
+        collisions = [e for e in events if e["event"] == "collision"]
+        self.assertEqual(sorted(os.path.basename(e["target"]) for e in collisions),
+                         ["2000-09-30_15-34-55_001.jpg", "2000-09-30_15-34-55_002.jpg"])
+
+    def test_gatedDebugMessages(self):
+        autoImageRenamer.setDebugLogging(False)
+        self.run_dryrun()
+        self.assertEqual([e for e in self.events() if e["event"] in ["filename", "exif", "collision"]], list())
+        # the rest of the logging is not affected
+        self.assertTrue(any(json.loads(m)["record"]["level"]["name"] == "INFO" for m in self.__messages))
+
+
+if __name__ == "__main__":
+    unittest.main()
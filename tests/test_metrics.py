@@ -0,0 +1,120 @@
+import unittest
+import sys
+import os
+import json
+import shutil
+from pathlib import Path
+
+sys.path.append(os.path.abspath("./tests"))
+import TestHelpers
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.metrics import StageMetrics, metrics
+
+
+class Test_Metrics(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        metrics.reset()
+
+    def tearDown(self) -> None:
+        metrics.enable(False)
+        metrics.reset()
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def createFiles(self):
+        tagDict = dict()
+        tagDict["datetime_original"] = TestHelpers.getRandomDatetime(1900)
+        TestHelpers.FileCreator(os.path.join(self.__source, "exif.jpg"), tagDict)
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "20000930_153455.jpg")).write_bytes(b"b")
+        Path(os.path.join(self.__source, "nothing.jpg")).write_bytes(b"c")
+
+    def run_copy(self, jobs=1, executor=autoImageRenamer.AutoImageRenamer.Executor.thread):
+        return autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__target, autoImageRenamer.AutoImageRenamer.Action.copy, False, False, jobs, executor
+        )
+
+    def test_measure(self):
+        stageMetrics = StageMetrics()
+
+        @stageMetrics.measure("stage")
+        def function(value):
+            if value < 0:
+                raise ValueError()
+            return value or None
+
+        function(1)
+        self.assertEqual(stageMetrics.getStages(), {})
+
+        stageMetrics.enable()
+        function(1)
+        function(0)
+        with self.assertRaises(ValueError):
+            function(-1)
+        stageMetrics.addBytes("stage", 10)
+        stage = stageMetrics.getStages()["stage"]
+        self.assertEqual((stage["calls"], stage["failures"], stage["bytes"]), (3, 2, 10))
+
+        drained = stageMetrics.drain()
+        self.assertEqual(stageMetrics.getStages(), {})
+        stageMetrics.merge(drained)
+        stageMetrics.merge(drained)
+        self.assertEqual(stageMetrics.getStages()["stage"]["calls"], 6)
+
+    def test_disabledRecordsNothing(self):
+        self.createFiles()
+        self.run_copy()
+        self.assertEqual(metrics.getStages(), {})
+
+    def test_stages(self):
+        self.createFiles()
+        metrics.enable()
+        self.run_copy()
+        stages = metrics.getStages()
+        self.assertEqual(stages["filename"]["calls"], 4)
+        self.assertEqual(stages["filename"]["failures"], 2)
+        self.assertEqual(stages["exif"]["calls"], 4)
+        self.assertEqual(stages["exif"]["failures"], 3)
+        self.assertGreater(stages["exif"]["bytes"], 0)
+        # the two files with the same time but different content are hashed
+        self.assertEqual(stages["hash"]["calls"], 2)
+        self.assertEqual(stages["action"]["calls"], 1)
+        self.assertEqual(
+            stages["action"]["bytes"],
+            sum(os.path.getsize(os.path.join(self.__target, f)) for f in os.listdir(self.__target)),
+        )
+
+    def test_processWorkers(self):
+        self.createFiles()
+        metrics.enable()
+        self.run_copy(2, autoImageRenamer.AutoImageRenamer.Executor.process)
+        self.assertEqual(metrics.getStages()["filename"]["calls"], 4)
+
+    def test_export(self):
+        self.createFiles()
+        metrics.enable()
+        self.run_copy()
+
+        jsonFile = os.path.join(self.__target, "metrics.json")
+        metrics.export(jsonFile)
+        with open(jsonFile) as f:
+            self.assertEqual(json.load(f)["stages"]["filename"]["calls"], 4)
+
+        promFile = os.path.join(self.__target, "metrics.prom")
+        metrics.export(promFile)
+        with open(promFile) as f:
+            content = f.read()
+        self.assertIn('autoimagerenamer_stage_calls_total{stage="filename"} 4', content)
+        self.assertIn("# TYPE autoimagerenamer_stage_seconds_total counter", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
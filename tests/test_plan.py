@@ -0,0 +1,83 @@
+import unittest
+import sys
+import os
+import shutil
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(os.path.abspath("./tests"))
+import TestHelpers
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.plan import readPlan, applyPlan
+
+
+class Test_Plan(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def createFiles(self):
+        dtime = TestHelpers.getRandomDatetime(1900)
+        tagDict = dict()
+        tagDict["datetime_original"] = dtime
+        TestHelpers.FileCreator(os.path.join(self.__source, "exif.jpg"), tagDict)
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "20000930_153455.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__source, "2001 01 01 01 01 01.jpg")).write_bytes(b"b")
+
+    def plan(self, planFile):
+        return autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__target, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False,
+            planFile=planFile
+        )
+
+    def test_planRecords(self):
+        self.createFiles()
+        for name in ["plan.jsonl", "plan.csv"]:
+            planFile = os.path.join(self.__target, name)
+            ir = self.plan(planFile)
+            records = list(readPlan(planFile))
+
+            self.assertEqual([r["source"] for r in records], [os.path.abspath(k) for k in ir.getFinalRenames().keys()])
+            self.assertEqual([r["target"] for r in records], [os.path.abspath(v) for v in ir.getFinalRenames().values()])
+            self.assertEqual([r["methods"] for r in records], list(ir.getFromMethods().values()))
+            exifRecord = [r for r in records if r["source"].endswith("exif.jpg")][0]
+            self.assertIn("EXIF DateTimeOriginal", exifRecord["times"])
+            # the colliding files with same content have been hashed
+            self.assertTrue(records[0]["hash"].startswith("md5:"))
+            self.assertEqual(records[0]["hash"], records[1]["hash"])
+            self.assertIsNone(records[2]["hash"])
+
+    def test_apply(self):
+        self.createFiles()
+        planFile = os.path.join(self.__target, "plan.jsonl")
+        ir = self.plan(planFile)
+        expected = dict(ir.getFinalRenames())
+
+        # a changed file must not be applied
+        changed = os.path.join(self.__source, "2001 01 01 01 01 01.jpg")
+        Path(changed).write_bytes(b"changed")
+        del expected[changed]
+
+        # no metadata must be extracted again
+        with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getTimes", side_effect=AssertionError):
+            applyPlan(planFile, autoImageRenamer.AutoImageRenamer.Action.rename)
+
+        for source, target in expected.items():
+            self.assertFalse(os.path.exists(source))
+            self.assertTrue(os.path.exists(target))
+        self.assertTrue(os.path.exists(changed))
+
+
+if __name__ == "__main__":
+    unittest.main()
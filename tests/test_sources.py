@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+import shutil
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.metadataCache import MetadataCache
+from autoImageRenamer.sources import Source, groupByDevice, parseOffset, parseSource
+
+Action = autoImageRenamer.AutoImageRenamer.Action
+
+
+class Test_Sources(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+        # a phone, a camera with a clock one hour behind and a partner's export
+        self.__phone = self.createSource("phone", {"IMG_20000930_153400.jpg": b"a", "IMG_20000930_160000.jpg": b"x"})
+        self.__camera = self.createSource("camera", {"2000 09 30 14 34 00.jpg": b"b"})
+        self.__export = self.createSource("export", {"20000930_153400.jpg": b"a", "20000930_170000.jpg": b"y"})
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def createSource(self, name: str, files: dict) -> str:
+        folder = os.path.join(self.__source, name)
+        os.mkdir(folder)
+        for filename, content in files.items():
+            Path(os.path.join(folder, filename)).write_bytes(content)
+        return folder
+
+    def target(self, name: str) -> str:
+        return os.path.join(self.__target, name)
+
+    def merge(self, **options) -> dict:
+        sources = [Source(self.__export), Source(self.__camera, offset=timedelta(hours=1)), Source(self.__phone, priority=1)]
+        return autoImageRenamer.AutoImageRenamer(sources, self.__target, Action.dryrun, False, False, **options).getFinalRenames()
+
+    def test_parse(self):
+        self.assertEqual(parseSource("/data/phone"), Source("/data/phone"))
+        self.assertEqual(
+            parseSource("/data/cam,offset=-1h30m,priority=2"), Source("/data/cam", timedelta(hours=-1, minutes=-30), 2)
+        )
+        self.assertEqual(parseSource("/data/a,b,priority=1"), Source("/data/a,b", priority=1))
+        self.assertEqual(parseOffset("+2d"), timedelta(days=2))
+        self.assertEqual(parseOffset("-3600"), timedelta(hours=-1))
+        for invalid in ["x", "", "+"]:
+            with self.assertRaises(ValueError):
+                parseOffset(invalid)
+        with self.assertRaises(ValueError):
+            parseSource("/data/a,priority=high")
+
+    def test_merge(self):
+        renames = self.merge()
+        # one namespace for all sources: the phone has the higher priority and keeps its file of equal content,
+        # the camera's file is an hour later than its clock says and collides too
+        self.assertEqual(renames[os.path.join(self.__phone, "IMG_20000930_153400.jpg")], self.target("2000-09-30_15-34-00_001.jpg"))
+        self.assertEqual(renames[os.path.join(self.__export, "20000930_153400.jpg")], self.target("DUPLICATE_20000930_153400.jpg"))
+        self.assertEqual(renames[os.path.join(self.__camera, "2000 09 30 14 34 00.jpg")], self.target("2000-09-30_15-34-00_002.jpg"))
+        self.assertEqual(renames[os.path.join(self.__phone, "IMG_20000930_160000.jpg")], self.target("2000-09-30_16-00-00.jpg"))
+        self.assertEqual(renames[os.path.join(self.__export, "20000930_170000.jpg")], self.target("2000-09-30_17-00-00.jpg"))
+
+    def test_devices(self):
+        expected = self.merge()
+        self.assertEqual(len(groupByDevice([Source(self.__phone), Source(self.__camera)])), 1)
+
+        # pretend every source is on a device of its own, so each one gets its worker thread
+        cacheFile = os.path.join(self.__target, "cache.sqlite")
+        separate = lambda sources: [[i] for i in range(len(sources))]
+        with mock.patch.object(autoImageRenamer, "groupByDevice", side_effect=separate):
+            for jobs in [1, 2]:
+                with MetadataCache(cacheFile) as cache:
+                    self.assertEqual(self.merge(jobs=jobs, cache=cache), expected)
+
+            with self.assertRaises(FileNotFoundError):
+                autoImageRenamer.AutoImageRenamer(
+                    [self.__phone, os.path.join(self.__source, "missing")], self.__target, Action.dryrun, False, False
+                )
+
+    def test_nestedSources(self):
+        # the camera folder is below the source folder, but only renamed as a source of its own with its offset
+        sources = [Source(self.__source), Source(self.__camera, offset=timedelta(hours=1))]
+        renames = autoImageRenamer.AutoImageRenamer(sources, self.__target, Action.dryrun, False, False, maxDepth=None).getFinalRenames()
+        self.assertEqual(len(renames), 5)
+        self.assertEqual(renames[os.path.join(self.__camera, "2000 09 30 14 34 00.jpg")], self.target("2000-09-30_15-34-00.jpg"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+import shutil
+import subprocess
+
+# Budgets for the summed import time (python -X importtime) of a cold start, in microseconds.
+# Generous against the measured values (~30 ms for --help, ~190 ms for an empty run) to not fail on slow machines.
+HELP_IMPORT_BUDGET = 100_000
+EMPTY_RUN_IMPORT_BUDGET = 600_000
+
+
+def runImportTime(*args, environment: dict = None) -> dict:
+    ## Run autoImageRenamer with -X importtime, return the cumulative import time of each module in microseconds
+    env = dict(os.environ, PYTHONPATH=os.path.abspath("./src"), **(environment or dict()))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "autoImageRenamer", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+        check=True,
+    )
+    modules = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # nested imports keep their indentation
+        (_, cumulative, name) = line[len("import time:"):].split("|")
+        modules[name[1:].rstrip()] = int(cumulative)
+    return modules
+
+
+def totalImportTime(modules: dict) -> int:
+    ## Sum of the top level imports, nested ones are part of their cumulative time
+    return sum(t for name, t in modules.items() if not name.startswith(" "))
+
+
+class Test_Startup(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        shutil.rmtree(self.__source, ignore_errors=True)
+        os.mkdir(self.__source)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.__source, ignore_errors=True)
+        return super().tearDown()
+
+    def test_help(self):
+        modules = runImportTime("--help")
+        names = {name.strip() for name in modules}
+        for heavy in ["loguru", "exifread", "hachoir", "sqlite3", "autoImageRenamer.autoImageRenamer"]:
+            self.assertNotIn(heavy, names)
+        self.assertLess(totalImportTime(modules), HELP_IMPORT_BUDGET)
+
+    def test_emptyRun(self):
+        # the default command line with the metadata cache, kept out of the user's cache folder
+        cacheHome = os.path.join(self.__source, "cache")
+        modules = runImportTime("dryrun", self.__source, environment={"XDG_CACHE_HOME": cacheHome, "LOCALAPPDATA": cacheHome})
+        names = {name.strip() for name in modules}
+        self.assertIn("autoImageRenamer.autoImageRenamer", names)
+        # only loaded once a file needs them
+        for heavy in ["exifread", "hachoir", "hachoir.parser", "sqlite3"]:
+            self.assertNotIn(heavy, names)
+        self.assertFalse(os.path.exists(cacheHome))
+        self.assertLess(totalImportTime(modules), EMPTY_RUN_IMPORT_BUDGET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import unittest
+import sys
+import os
+import shutil
+import struct
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.bench import createIsoBmff
+from autoImageRenamer.metrics import metrics
+from autoImageRenamer.videoReader import VideoHeaderError, readMovieDates
+
+_QUICKTIME_EPOCH_OFFSET = 2082844800
+
+
+def box(boxType: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload) + 8) + boxType + payload
+
+
+def mvhd(dateTime: datetime, version: int = 0) -> bytes:
+    seconds = 0 if dateTime is None else int((dateTime - datetime(1970, 1, 1)).total_seconds()) + _QUICKTIME_EPOCH_OFFSET
+    if version == 1:
+        payload = struct.pack(">B3xQQIQ", 1, seconds, seconds, 1000, 1000)
+    else:
+        payload = struct.pack(">B3xIIII", 0, seconds, seconds, 1000, 1000)
+    return box(b"mvhd", payload + bytes(80))
+
+
+def appleMeta(value: str) -> bytes:
+    hdlr = box(b"hdlr", bytes(8) + b"mdta" + bytes(13))
+    names = [b"com.apple.quicktime.make", b"com.apple.quicktime.creationdate"]
+    keys = box(b"keys", struct.pack(">II", 0, len(names)) + b"".join(struct.pack(">I", len(n) + 8) + b"mdta" + n for n in names))
+    data = box(b"data", struct.pack(">II", 1, 0) + value.encode())
+    ilst = box(b"ilst", struct.pack(">I", len(data) + 8) + struct.pack(">I", 2) + data)
+    return box(b"meta", hdlr + keys + ilst)
+
+
+class Test_VideoReader(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        shutil.rmtree(self.__source, ignore_errors=True)
+        os.mkdir(self.__source)
+        self.__time = datetime(2021, 6, 22, 8, 12, 58)
+
+    def tearDown(self) -> None:
+        metrics.enable(False)
+        metrics.reset()
+        shutil.rmtree(self.__source, ignore_errors=True)
+        return super().tearDown()
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.__source, name)
+        Path(path).write_bytes(content)
+        return path
+
+    def test_mvhd(self):
+        path = self.write("v0.mp4", createIsoBmff(self.__time, 4096, b"isom"))
+        self.assertEqual(readMovieDates(path), {"mvhd": self.__time, "creationdate": None})
+        path = self.write("v1.mov", box(b"ftyp", b"qt  " * 2) + box(b"moov", mvhd(self.__time, 1)))
+        self.assertEqual(readMovieDates(path)["mvhd"], self.__time)
+
+    def test_appleCreationDate(self):
+        path = self.write("apple.mov", box(b"moov", mvhd(None) + appleMeta("2021-06-22T10:12:58+0200")))
+        self.assertEqual(readMovieDates(path), {"mvhd": None, "creationdate": datetime(2021, 6, 22, 10, 12, 58)})
+
+        # only a fallback for missing mvhd times
+        x = autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__source, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False
+        )
+        self.assertEqual(x.getTimes(path, ".mov"), {"mov": datetime(2021, 6, 22, 10, 12, 58)})
+        both = self.write("both.mov", box(b"moov", mvhd(self.__time) + box(b"udta", appleMeta("2021-06-22T10:12:58+0200"))))
+        self.assertEqual(readMovieDates(both)["creationdate"], datetime(2021, 6, 22, 10, 12, 58))
+        self.assertEqual(x.getTimes(both, ".mov"), {"mov": self.__time})
+
+    def test_moovAtEndIsReachedBySeeking(self):
+        path = os.path.join(self.__source, "large.mp4")
+        mdatSize = 5 * 1024 ** 3
+        with open(path, "wb") as f:
+            f.write(box(b"ftyp", b"isom" * 2))
+            f.write(struct.pack(">I4sQ", 1, b"mdat", mdatSize))
+            # sparse mdat
+            f.seek(mdatSize - 16, os.SEEK_CUR)
+            f.write(box(b"moov", mvhd(self.__time)))
+
+        metrics.enable()
+        self.assertEqual(readMovieDates(path)["mvhd"], self.__time)
+        self.assertLess(metrics.getStages()["movie"]["bytes"], 1024)
+
+    def test_fallbackToHachoir(self):
+        x = autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__source, autoImageRenamer.AutoImageRenamer.Action.dryrun, False, False
+        )
+        noMoov = self.write("broken.mov", box(b"ftyp", b"qt  " * 2) + box(b"mdat", bytes(100)))
+        with self.assertRaises(VideoHeaderError):
+            readMovieDates(noMoov)
+        with mock.patch.object(autoImageRenamer.AutoImageRenamer, "getFileHachoir", return_value=self.__time) as hachoir:
+            self.assertEqual(x.getTimes(noMoov, ".mov"), {"mov": self.__time})
+            hachoir.assert_called_once()
+
+            valid = self.write("valid.mov", createIsoBmff(self.__time, 4096, b"qt  "))
+            x.getTimes(valid, ".mov")
+            hachoir.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
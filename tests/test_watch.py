@@ -0,0 +1,119 @@
+import unittest
+import sys
+import os
+import time
+import shutil
+import threading
+from pathlib import Path
+
+sys.path.append(os.path.abspath("./src"))
+from autoImageRenamer import autoImageRenamer
+from autoImageRenamer.layout import OutputLayout
+from autoImageRenamer.watch import FolderWatcher
+
+
+class Test_Watch(unittest.TestCase):
+    def setUp(self):
+        self.__source = os.path.join(os.getcwd(), "tests", "tempIn")
+        self.__target = os.path.join(os.getcwd(), "tests", "tempOut")
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+            os.mkdir(folder)
+
+    def tearDown(self) -> None:
+        for folder in [self.__source, self.__target]:
+            shutil.rmtree(folder, ignore_errors=True)
+        return super().tearDown()
+
+    def waitFor(self, condition, timeout=10):
+        end = time.monotonic() + timeout
+        while time.monotonic() < end:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def runWatcher(self, usePolling):
+        # existing files are handled by the initial batch run
+        Path(os.path.join(self.__source, "2000 09 30 15 34 55.jpg")).write_bytes(b"a")
+        Path(os.path.join(self.__target, "2000-09-30_15-34-56.jpg")).write_bytes(b"existing")
+        renamer = autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__target, autoImageRenamer.AutoImageRenamer.Action.rename, False, False
+        )
+        watcher = FolderWatcher(
+            renamer,
+            self.__source,
+            self.__target,
+            autoImageRenamer.AutoImageRenamer.Action.rename,
+            settleSeconds=0.3,
+            pollInterval=0.05,
+            usePolling=usePolling,
+        )
+        stop = threading.Event()
+        thread = threading.Thread(target=watcher.run, args=(stop,))
+        thread.start()
+        try:
+            # new file colliding with the initial run, with an existing file and a content duplicate
+            Path(os.path.join(self.__source, "20000930_153455.jpg")).write_bytes(b"b")
+            Path(os.path.join(self.__source, "2000-09-30 15-34-56.jpg")).write_bytes(b"c")
+            Path(os.path.join(self.__source, "20000930153455.jpg")).write_bytes(b"b")
+            Path(os.path.join(self.__source, "ignored.txt")).write_bytes(b"x")
+
+            # either of the files with the same content may be the duplicate
+            expected = [
+                "2000-09-30_15-34-55.jpg",
+                "2000-09-30_15-34-55_001.jpg",
+                "2000-09-30_15-34-56.jpg",
+                "2000-09-30_15-34-56_001.jpg",
+            ]
+
+            def isDone():
+                names = sorted(os.listdir(self.__target))
+                return len(names) == 5 and names[:4] == expected and names[4].startswith("DUPLICATE_20000930")
+
+            self.assertTrue(self.waitFor(isDone), os.listdir(self.__target))
+            self.assertEqual(os.listdir(self.__source), ["ignored.txt"])
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_inotify(self):
+        if not sys.platform.startswith("linux"):
+            self.skipTest("inotify is only available on Linux")
+        self.runWatcher(False)
+
+    def test_polling(self):
+        self.runWatcher(True)
+
+    def test_inPlace(self):
+        # target folder == source folder: a file with its target name keeps it, a new one is numbered
+        Action = autoImageRenamer.AutoImageRenamer.Action
+        renamer = autoImageRenamer.AutoImageRenamer(self.__source, self.__source, Action.rename, False, False)
+        watcher = FolderWatcher(renamer, self.__source, self.__source, Action.rename, usePolling=True)
+        named = os.path.join(self.__source, "2021-01-01_10-00-00.jpg")
+        Path(named).write_bytes(b"a")
+        self.assertEqual(watcher.processFile(named), named)
+        other = os.path.join(self.__source, "IMG_20210101_100000.jpg")
+        Path(other).write_bytes(b"b")
+        self.assertEqual(watcher.processFile(other), os.path.join(self.__source, "2021-01-01_10-00-00_001.jpg"))
+        self.assertEqual(sorted(os.listdir(self.__source)), ["2021-01-01_10-00-00.jpg", "2021-01-01_10-00-00_001.jpg"])
+        self.assertEqual(Path(named).read_bytes(), b"a")
+
+    def test_shardedLayout(self):
+        # the target folder of the layout is looked at, not only the top level of the output folder
+        shard = os.path.join(self.__target, "2000", "2000-09")
+        os.makedirs(shard)
+        Path(os.path.join(shard, "2000-09-30_15-34-55.jpg")).write_bytes(b"existing")
+        Action = autoImageRenamer.AutoImageRenamer.Action
+        renamer = autoImageRenamer.AutoImageRenamer(
+            self.__source, self.__target, Action.copy, False, False, layout=OutputLayout("{year}/{year}-{month}/{name}")
+        )
+        watcher = FolderWatcher(renamer, self.__source, self.__target, Action.copy, usePolling=True)
+        path = os.path.join(self.__source, "2000 09 30 15 34 55.jpg")
+        Path(path).write_bytes(b"new")
+        self.assertEqual(watcher.processFile(path), os.path.join(shard, "2000-09-30_15-34-55_001.jpg"))
+        self.assertEqual(Path(os.path.join(shard, "2000-09-30_15-34-55.jpg")).read_bytes(), b"existing")
+
+
+if __name__ == "__main__":
+    unittest.main()